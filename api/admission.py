@@ -0,0 +1,213 @@
+"""
+Admission control: per-client rate limits and in-flight caps per router.
+
+Each router (pets, store, user) has its own policy, plus one global
+in-flight cap over all of them. A request first takes a token from its
+client's bucket for the router, or is rejected with 429. It then takes an
+in-flight slot for the router and a global one. When no slot is free it
+waits in a queue, and once the queue is full it is rejected with 503 at
+once instead of adding to the latency of everyone already waiting. Both
+rejections carry Retry-After.
+
+Everything is off unless configured, per router with
+PET_STORE_<ROUTER>_RATE_LIMIT, _BURST, _MAX_IN_FLIGHT and _MAX_QUEUE, and
+globally with PET_STORE_MAX_IN_FLIGHT and PET_STORE_MAX_QUEUE. A limit of 0
+means unlimited.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from util.logging_config import logger
+
+# Path prefix of each router's routes
+ROUTER_PREFIXES = {"pets": "/pet", "store": "/store", "user": "/user"}
+# Seconds a client is told to wait after a 503
+OVERLOAD_RETRY_AFTER = 1
+# Token buckets kept before the least recently seen client is forgotten
+MAX_CLIENTS = 100_000
+
+
+def _env_number(name, default=0):
+    return float(os.environ.get(name, default))
+
+
+class Policy:
+    def __init__(self, rate_limit=0, burst=0, max_in_flight=0, max_queue=0):
+        # Requests per second per client, and how many may come at once
+        self.rate_limit = rate_limit
+        self.burst = burst or max(rate_limit, 1)
+        # Requests handled at the same time, and how many may wait for that
+        self.max_in_flight = int(max_in_flight)
+        self.max_queue = int(max_queue)
+
+    @classmethod
+    def from_env(cls, prefix):
+        return cls(
+            rate_limit=_env_number(f"{prefix}_RATE_LIMIT"),
+            burst=_env_number(f"{prefix}_BURST"),
+            max_in_flight=_env_number(f"{prefix}_MAX_IN_FLIGHT"),
+            max_queue=_env_number(f"{prefix}_MAX_QUEUE"),
+        )
+
+
+class RateLimiter:
+    """
+    Token bucket per client.
+
+    A bucket holds up to `burst` tokens and refills at `rate` per second; it
+    is topped up lazily when its client next shows up. Only MAX_CLIENTS
+    buckets are kept, dropping the least recently seen, whose bucket would
+    mostly have refilled anyway. Used from the event loop only.
+    """
+
+    def __init__(self, rate, burst, max_clients=MAX_CLIENTS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        # client -> [tokens, time of last refill]
+        self.buckets = OrderedDict()
+
+    def acquire(self, client):
+        """Take a token. Returns 0, or the seconds until one is available."""
+        now = self.clock()
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = [self.burst, now]
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.rate
+
+
+class ConcurrencyLimiter:
+    """
+    At most max_in_flight holders, with up to max_queue more waiting in
+    arrival order. A released slot is handed straight to the first waiter.
+    Used from the event loop only.
+    """
+
+    def __init__(self, max_in_flight, max_queue=0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiters = deque()
+
+    async def acquire(self):
+        """Take a slot, waiting if needed. False if the queue is full."""
+        if self.in_flight < self.max_in_flight and not self.waiters:
+            self.in_flight += 1
+            return True
+        if len(self.waiters) >= self.max_queue:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if not waiter.cancelled():
+                # The slot was handed over just as the request went away
+                self.release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            raise
+        return True
+
+    def release(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    """The admission control middleware, see the module docstring."""
+
+    def __init__(self, policies, global_policy):
+        self.rate_limiters = {}
+        self.limiters = {}
+        for router, policy in policies.items():
+            if policy.rate_limit > 0:
+                self.rate_limiters[router] = RateLimiter(
+                    policy.rate_limit, policy.burst
+                )
+            if policy.max_in_flight > 0:
+                self.limiters[router] = ConcurrencyLimiter(
+                    policy.max_in_flight, policy.max_queue
+                )
+        self.global_limiter = None
+        if global_policy.max_in_flight > 0:
+            self.global_limiter = ConcurrencyLimiter(
+                global_policy.max_in_flight, global_policy.max_queue
+            )
+        self.rejected = {429: 0, 503: 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            {
+                router: Policy.from_env(f"PET_STORE_{router.upper()}")
+                for router in ROUTER_PREFIXES
+            },
+            Policy.from_env("PET_STORE"),
+        )
+
+    @staticmethod
+    def router_for(path):
+        for router, prefix in ROUTER_PREFIXES.items():
+            if path == prefix or path.startswith(prefix + "/"):
+                return router
+        return None
+
+    def reject(self, status_code, detail, retry_after, **fields):
+        self.rejected[status_code] += 1
+        logger.warning("Request rejected", status_code=status_code, **fields)
+        return JSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def __call__(self, request: Request, call_next):
+        router = self.router_for(request.url.path)
+        rate_limiter = self.rate_limiters.get(router)
+        if rate_limiter is not None:
+            client = request.client.host if request.client else None
+            wait = rate_limiter.acquire(client)
+            if wait:
+                return self.reject(
+                    429, "Too many requests", wait, router=router, client=client
+                )
+
+        acquired = []
+        try:
+            for limiter in (self.limiters.get(router), self.global_limiter):
+                if limiter is None:
+                    continue
+                if not await limiter.acquire():
+                    return self.reject(
+                        503, "Server overloaded", OVERLOAD_RETRY_AFTER, router=router
+                    )
+                acquired.append(limiter)
+            return await call_next(request)
+        finally:
+            for limiter in acquired:
+                limiter.release()
+
+
+admission_control = AdmissionController.from_env()
@@ -1,9 +1,16 @@
+import logging
+
 from fastapi import FastAPI, Request
 
+from api.admission import AdmissionController, admission_control
+from api.metrics_api import request_metrics
+from api.metrics_api import router as metrics_router
 from api.pets_api import router as pets_router
 from api.store_api import router as store_router
 from api.user_api import router as user_router
 from util.logging_config import logger
+from util.metrics import MetricsMiddleware
+from util.profiling import ProfilingMiddleware, RequestProfiler
 
 app = FastAPI()
 
@@ -11,17 +18,31 @@ app = FastAPI()
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all incoming requests"""
-    logger.info(
-        "Incoming request",
-        method=request.method,
-        url=str(request.url),
-        headers=dict(request.headers),
-    )
+    logger.info("Incoming request", method=request.method, url=str(request.url))
+    # Copying every header is only worth it when someone reads debug output
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers", headers=dict(request.headers))
     response = await call_next(request)
     return response
 
 
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=request_metrics,
+    router_for=AdmissionController.router_for,
+)
+# Runs before the middleware above, so a rejected request costs no more work
+app.middleware("http")(admission_control)
+
+request_profiler = RequestProfiler()
+if request_profiler.enabled:
+    # Outside the others, so writing a profile out after the response does
+    # not count towards the request's metrics
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+
 # Connect routers
 app.include_router(pets_router)
 app.include_router(store_router)
 app.include_router(user_router)
+app.include_router(metrics_router)
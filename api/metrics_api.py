@@ -0,0 +1,60 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from api.admission import admission_control
+from api.pets_api import pet_store
+from api.store_api import order_store
+from api.user_api import user_store
+from util.metrics import MetricsWriter, RequestMetrics
+
+router = APIRouter()
+
+request_metrics = RequestMetrics()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def store_stats():
+    # Blocking: SQLite queries, or calls to the shared state process
+    return {
+        "pets": pet_store.stats(),
+        "users": user_store.stats(),
+        "orders": order_store.stats(),
+    }
+
+
+def write_store_stats(writer, stats):
+    writer.family("pet_store_records", "gauge", "Records held, by store.")
+    for store, values in stats.items():
+        writer.sample("pet_store_records", values["records"], store=store)
+
+    for name, key, kind, help_text in (
+        ("pet_store_body_cache_entries", "cache_entries", "gauge", "Bodies cached"),
+        ("pet_store_body_cache_hits_total", "cache_hits", "counter", "Hits"),
+        ("pet_store_body_cache_misses_total", "cache_misses", "counter", "Misses"),
+    ):
+        writer.family(name, kind, f"{help_text} in the body LRU, by store.")
+        for store, values in stats.items():
+            if key in values:
+                writer.sample(name, values[key], store=store)
+
+    writer.family("pet_store_sessions", "gauge", "Live login sessions.")
+    writer.sample("pet_store_sessions", stats["users"]["sessions"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    writer = MetricsWriter()
+    # Request counters are only touched on the event loop, so they are
+    # written out here, before handing over to a thread
+    request_metrics.write(writer)
+    writer.family(
+        "pet_store_admission_rejected_total",
+        "counter",
+        "Requests shed by admission control, by status code.",
+    )
+    for status, count in admission_control.rejected.items():
+        writer.sample("pet_store_admission_rejected_total", count, status=status)
+    write_store_stats(writer, await run_in_threadpool(store_stats))
+    return PlainTextResponse(writer.text(), media_type=CONTENT_TYPE)
@@ -1,10 +1,34 @@
+import json
+import os
+from urllib.parse import quote, unquote
 from util.logging_config import logger
-from fastapi import APIRouter, HTTPException, Form
+from fastapi import APIRouter, Body, HTTPException, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
-from data.pets_data import pets as init_pets
+from typing import List, Dict, Literal
+from storage import get_backend
+from storage.base import PetRepository, pet_sort_key
+from api.state import shared
+from util.etag import (
+    BODY_CACHE_SIZE,
+    VersionTable,
+    conditional_body_response,
+    json_body,
+)
+from util.lru import LRUCache
+from util.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Largest page findByStatus returns, and the page size used when streaming
+MAX_PAGE_SIZE = 1000
+STREAM_PAGE_SIZE = 500
+# Page size of /pet/search when no limit is given
+SEARCH_PAGE_SIZE = 100
+# Largest number of pets a single batch request may touch
+MAX_BATCH_SIZE = 50_000
+# Version table key of the inventory; pet keys are their integer IDs
+INVENTORY = "inventory"
 # logger = structlog.get_logger(__name__)
 
 
@@ -23,104 +47,463 @@ class NewPet(BaseModel):
 
 
 class PetStore:
-    def __init__(self, init_pets):
-        self.pets = init_pets
+    def __init__(
+        self,
+        repository: PetRepository,
+        check_inventory=False,
+        body_cache_size=BODY_CACHE_SIZE,
+    ):
+        self.repository = repository
+        # When enabled, every inventory read is checked against a full
+        # recount. Meant for tests, it makes /store/inventory O(n) again.
+        self.check_inventory = check_inventory
+        # Pet IDs are never reused, so only updates bump a pet's version
+        self.versions = VersionTable()
+        # pet_id -> (ETag, JSON body) of recently read pets
+        self.bodies = LRUCache(body_cache_size)
+
+    def _changed(self, pet_id, status=None):
+        self.versions.bump(pet_id)
+        self.bodies.invalidate(pet_id)
+        if status is not None:
+            self.versions.bump(INVENTORY)
+
+    def _removed(self, pet_id):
+        self.versions.forget(pet_id)
+        self.bodies.invalidate(pet_id)
+        self.versions.bump(INVENTORY)
 
-    def find_pets_by_status(self, status):
-        logger.info("Finding pets with status", status=status)
-        pets = [pet for pet in self.pets if pet["status"] == status]
+    def has_pets_with_status(self, status):
+        return self.repository.has_status(status)
+
+    def find_pets_by_status(self, status, limit=None, cursor=None):
+        """Pets with the given status in ID order, after the cursor ID if set."""
+        logger.info(
+            "Finding pets with status", status=status, limit=limit, cursor=cursor
+        )
+        pets = self.repository.find_by_status(status, limit=limit, cursor=cursor)
         logger.info("Found pets with status", status=status, count=len(pets))
         return pets
 
+    def find_pets_by_statuses(
+        self, statuses, sort="id", order="asc", limit=None, cursor=None
+    ):
+        """
+        Pets with any of the statuses, sorted by ID or name, after the
+        cursor, a pet_sort_key() in that order, if set.
+        """
+        logger.info(
+            "Finding pets with statuses",
+            statuses=statuses,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+        )
+        pets = self.repository.find_by_statuses(
+            statuses, sort, order == "desc", limit=limit, cursor=cursor
+        )
+        logger.info("Found pets with statuses", statuses=statuses, count=len(pets))
+        return pets
+
+    def has_pets_in_category(self, category_id=None, category_name=None):
+        return self.repository.has_category(category_id, category_name)
+
+    def find_pets_by_category(
+        self, category_id=None, category_name=None, status=None, limit=None, cursor=None
+    ):
+        """Pets in the category, with the status if set, in ID order."""
+        logger.info(
+            "Finding pets in category",
+            category_id=category_id,
+            category_name=category_name,
+            status=status,
+            limit=limit,
+            cursor=cursor,
+        )
+        pets = self.repository.find_by_category(
+            category_id, category_name, status, limit=limit, cursor=cursor
+        )
+        logger.info(
+            "Found pets in category",
+            category_id=category_id,
+            category_name=category_name,
+            status=status,
+            count=len(pets),
+        )
+        return pets
+
+    def search_pets(self, query, limit=None, cursor=None):
+        """Pets whose name words start with the query's, in ID order."""
+        logger.info("Searching pets", query=query, limit=limit, cursor=cursor)
+        pets = self.repository.search(query, limit=limit, cursor=cursor)
+        logger.info("Found pets matching search", query=query, count=len(pets))
+        return pets
+
     def get_pet_by_id(self, pet_id):
         logger.info("Getting pet by ID", pet_id=pet_id)
-        pet = next((pet for pet in self.pets if pet["id"] == pet_id), None)
-        if not pet:
+        pet = self.repository.get(pet_id)
+        if pet is None:
             logger.warning("Pet with ID not found", pet_id=pet_id)
             raise HTTPException(status_code=404, detail="Pet not found")
         return pet
 
+    def get_pet_body(self, pet_id):
+        """ETag and JSON body of the pet, from the body cache when present."""
+        cached = self.bodies.get(pet_id)
+        if cached is not None:
+            logger.info("Serving cached pet", pet_id=pet_id)
+            return cached
+        # Both are read before the record, see LRUCache and VersionTable
+        generation = self.bodies.generation
+        etag = self.versions.etag(pet_id)
+        pet = self.get_pet_by_id(pet_id)
+        entry = (etag, json_body(pet))
+        self.bodies.put(pet_id, entry, generation)
+        return entry
+
     def add_pet(self, pet: NewPet):
         logger.info("Adding new pet", pet=pet.model_dump())
-        new_id = max([p["id"] for p in self.pets]) + 1 if self.pets else 1
-        pet_data = pet.model_dump()
-        pet_data["id"] = new_id
-        self.pets.append(pet_data)
-        logger.info("Added new pet with ID", pet_id=new_id)
+        pet_data = self.repository.insert(pet.model_dump())
+        self.versions.bump(INVENTORY)
+        logger.info("Added new pet with ID", pet_id=pet_data["id"])
         return pet_data
 
     def update_pet(self, pet: Pet):
         logger.info("Updating pet", pet_id=pet.id, pet=pet.model_dump())
-        existing_pet = self.get_pet_by_id(pet.id)
-        existing_pet.update({"name": pet.name, "status": pet.status})
+        existing_pet = self.repository.update(pet.id, pet.name, pet.status)
+        if existing_pet is None:
+            logger.warning("Pet with ID not found", pet_id=pet.id)
+            raise HTTPException(status_code=404, detail="Pet not found")
+        self._changed(pet.id, pet.status)
         logger.info("Pet updated successfully", pet_id=pet.id, pet=existing_pet)
         return existing_pet
 
     def update_pet_with_form(self, pet_id: int, name: str = None, status: str = None):
-        logger.info("Updating pet with ID using form data", pet_id=pet_id, name=name, status=status)
-        existing_pet = self.get_pet_by_id(pet_id)
-        if name is not None:
-            existing_pet["name"] = name
-        if status is not None:
-            existing_pet["status"] = status
-        logger.info("Pet updated successfully with form", pet_id=pet_id, pet=existing_pet)
+        logger.info(
+            "Updating pet with ID using form data",
+            pet_id=pet_id,
+            name=name,
+            status=status,
+        )
+        existing_pet = self.repository.update(pet_id, name, status)
+        if existing_pet is None:
+            logger.warning("Pet with ID not found", pet_id=pet_id)
+            raise HTTPException(status_code=404, detail="Pet not found")
+        self._changed(pet_id, status)
+        logger.info(
+            "Pet updated successfully with form", pet_id=pet_id, pet=existing_pet
+        )
         return existing_pet
 
+    def add_pets(self, pets: List[NewPet]):
+        logger.info("Adding pets in batch", count=len(pets))
+        pets_data = self.repository.insert_many([pet.model_dump() for pet in pets])
+        if pets_data:
+            self.versions.bump(INVENTORY)
+        results = [{"status": 201, "pet": pet_data} for pet_data in pets_data]
+        logger.info("Added pets in batch", count=len(results))
+        return results
+
+    def update_pets(self, pets: List[Pet]):
+        logger.info("Updating pets in batch", count=len(pets))
+        updated = self.repository.update_many(
+            [{"id": pet.id, "name": pet.name, "status": pet.status} for pet in pets]
+        )
+        results = []
+        for pet, existing_pet in zip(pets, updated):
+            if existing_pet is None:
+                results.append({"id": pet.id, "status": 404, "detail": "Pet not found"})
+            else:
+                self._changed(pet.id, pet.status)
+                results.append({"status": 200, "pet": existing_pet})
+        logger.info("Updated pets in batch", count=len(results))
+        return results
+
+    def delete_pets(self, pet_ids: List[int]):
+        logger.info("Deleting pets in batch", count=len(pet_ids))
+        deleted = self.repository.delete_many(pet_ids)
+        results = []
+        for pet_id, was_deleted in zip(pet_ids, deleted):
+            if not was_deleted:
+                results.append({"id": pet_id, "status": 404, "detail": "Pet not found"})
+            else:
+                self._removed(pet_id)
+                results.append(
+                    {
+                        "id": pet_id,
+                        "status": 200,
+                        "message": f"Pet with ID {pet_id} has been deleted",
+                    }
+                )
+        logger.info("Deleted pets in batch", count=len(results))
+        return results
+
+    def inventory_etag(self):
+        return self.versions.etag(INVENTORY)
+
+    def get_inventory(self):
+        logger.info("Calculating inventory")
+        inventory = self.repository.count_by_status()
+        if self.check_inventory:
+            recount = self.repository.recount_by_status()
+            if recount != inventory:
+                logger.error(
+                    "Inventory counters out of sync",
+                    inventory=inventory,
+                    recount=recount,
+                )
+                raise HTTPException(
+                    status_code=500, detail="Inventory counters out of sync"
+                )
+        logger.info("Inventory calculated", inventory=inventory)
+        return inventory
+
     def delete_pet(self, pet_id):
         logger.info("Deleting pet", pet_id=pet_id)
-        pet = self.get_pet_by_id(pet_id)
-        self.pets = [p for p in self.pets if p["id"] != pet_id]
+        if not self.repository.delete(pet_id):
+            logger.warning("Pet with ID not found", pet_id=pet_id)
+            raise HTTPException(status_code=404, detail="Pet not found")
+        self._removed(pet_id)
         logger.info("Pet deleted successfully", pet_id=pet_id)
         return {"message": f"Pet with ID {pet_id} has been deleted"}
 
+    def stats(self):
+        """Live counters for /metrics."""
+        return {
+            "records": self.repository.count(),
+            "cache_entries": len(self.bodies),
+            "cache_hits": self.bodies.hits,
+            "cache_misses": self.bodies.misses,
+        }
+
 
-pet_store = PetStore(init_pets)
+pet_store = shared(
+    "pet_store",
+    lambda: PetStore(
+        get_backend().pets,
+        check_inventory=os.environ.get("PET_STORE_CHECK_INVENTORY") == "1",
+    ),
+)
+
+
+def encode_cursor(pet, sort):
+    """The X-Next-Cursor value resuming a findByStatus listing after pet."""
+    if sort == "id":
+        return str(pet["id"])
+    # Quoted, as names can hold anything and header values must be Latin-1
+    return quote(f"{pet['id']}:{pet['name']}")
+
+
+def decode_cursor(cursor, sort):
+    """The pet_sort_key() an encode_cursor() value stands for."""
+    try:
+        if sort == "id":
+            pet_id = int(cursor)
+            name = None
+        else:
+            pet_id, name = unquote(cursor).split(":", 1)
+            pet_id = int(pet_id)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    if pet_id < 0:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    return pet_sort_key({"id": pet_id, "name": name}, sort)
+
+
+def stream_pets_by_status(statuses, sort, order, page_size, cursor):
+    # Pages are fetched one at a time, each resuming after the last pet sent,
+    # so only one page is held in memory and writes between pages are safe.
+    # A plain generator, like the routes being plain functions, so Starlette
+    # runs the blocking store calls in its threadpool, off the event loop.
+    yield b"["
+    separator = b""
+    while True:
+        pets = pet_store.find_pets_by_statuses(
+            statuses, sort, order, limit=page_size, cursor=cursor
+        )
+        if not pets:
+            break
+        yield separator + b",".join(json.dumps(pet).encode() for pet in pets)
+        separator = b","
+        if len(pets) < page_size:
+            break
+        cursor = pet_sort_key(pets[-1], sort)
+    yield b"]"
 
 
 @router.get("/pet/findByStatus", response_model=List[Dict])
-async def find_pets_by_status(status: str):
-    logger.info("Received request to find pets by status", status=status)
-    pets = pet_store.find_pets_by_status(status)
-    if not pets:
+def find_pets_by_status(
+    response: Response,
+    status: List[str] = Query(...),
+    sort: Literal["id", "name"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    stream: bool = False,
+):
+    """
+    Pets with any of the given statuses, ordered by ID or by name (then ID),
+    ascending or descending. Repeat status to ask for several.
+
+    With limit set, returns one page and puts the cursor for the next page in
+    the X-Next-Cursor header. With stream=true, writes every match after the
+    cursor as a JSON array, fetching limit (default STREAM_PAGE_SIZE) pets at
+    a time.
+    """
+    logger.info(
+        "Received request to find pets by status",
+        status=status,
+        sort=sort,
+        order=order,
+        limit=limit,
+        cursor=cursor,
+        stream=stream,
+    )
+    if not any(pet_store.has_pets_with_status(s) for s in status):
+        raise HTTPException(status_code=404, detail="Pets not found")
+    if cursor is not None:
+        cursor = decode_cursor(cursor, sort)
+    if stream:
+        return StreamingResponse(
+            stream_pets_by_status(
+                status, sort, order, limit or STREAM_PAGE_SIZE, cursor
+            ),
+            media_type="application/json",
+        )
+    if limit is None:
+        return pet_store.find_pets_by_statuses(status, sort, order, cursor=cursor)
+    pets = pet_store.find_pets_by_statuses(
+        status, sort, order, limit=limit + 1, cursor=cursor
+    )
+    if len(pets) > limit:
+        pets = pets[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(pets[-1], sort)
+    return pets
+
+
+@router.get("/pet/findByCategory", response_model=List[Dict])
+def find_pets_by_category(
+    response: Response,
+    category_id: int = None,
+    category_name: str = None,
+    status: str = None,
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int = Query(None, ge=0),
+):
+    """
+    Pets whose category has the given ID and/or name, and with the status
+    if one is given, ordered by ID.
+
+    With limit set, returns one page and puts the cursor for the next page in
+    the X-Next-Cursor header.
+    """
+    logger.info(
+        "Received request to find pets by category",
+        category_id=category_id,
+        category_name=category_name,
+        status=status,
+        limit=limit,
+        cursor=cursor,
+    )
+    if category_id is None and category_name is None:
+        raise HTTPException(
+            status_code=400, detail="category_id or category_name is required"
+        )
+    if not pet_store.has_pets_in_category(category_id, category_name) or (
+        status is not None and not pet_store.has_pets_with_status(status)
+    ):
         raise HTTPException(status_code=404, detail="Pets not found")
+    if limit is None:
+        return pet_store.find_pets_by_category(
+            category_id, category_name, status, cursor=cursor
+        )
+    pets = pet_store.find_pets_by_category(
+        category_id, category_name, status, limit=limit + 1, cursor=cursor
+    )
+    if len(pets) > limit:
+        pets = pets[:limit]
+        response.headers["X-Next-Cursor"] = str(pets[-1]["id"])
     return pets
 
 
+@router.get("/pet/search", response_model=List[Dict])
+def search_pets(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int = Query(None, ge=0),
+):
+    """
+    Pets with a name word starting with each word of q, ignoring case,
+    ordered by ID.
+
+    Returns one page of up to limit pets and puts the cursor for the next
+    page in the X-Next-Cursor header.
+    """
+    logger.info("Received request to search pets", q=q, limit=limit, cursor=cursor)
+    pets = pet_store.search_pets(q, limit=limit + 1, cursor=cursor)
+    if len(pets) > limit:
+        pets = pets[:limit]
+        response.headers["X-Next-Cursor"] = str(pets[-1]["id"])
+    return pets
+
+
+@router.post("/pet/batch", response_model=List[Dict])
+def add_pets(pets: List[NewPet] = Body(..., max_length=MAX_BATCH_SIZE)):
+    logger.info("Received request to add pets in batch", count=len(pets))
+    return pet_store.add_pets(pets)
+
+
+@router.put("/pet/batch", response_model=List[Dict])
+def update_pets(pets: List[Pet] = Body(..., max_length=MAX_BATCH_SIZE)):
+    logger.info("Received request to update pets in batch", count=len(pets))
+    return pet_store.update_pets(pets)
+
+
+@router.post("/pet/batchDelete", response_model=List[Dict])
+def delete_pets(pet_ids: List[int] = Body(..., max_length=MAX_BATCH_SIZE)):
+    logger.info("Received request to delete pets in batch", count=len(pet_ids))
+    return pet_store.delete_pets(pet_ids)
+
+
 @router.get("/pet/{pet_id}", response_model=Dict)
-async def get_pet_by_id(pet_id: int):
+def get_pet_by_id(pet_id: int, request: Request):
     logger.info("Received request to get pet by ID", pet_id=pet_id)
-    pet = pet_store.get_pet_by_id(pet_id)
-    return pet
+    etag, body = pet_store.get_pet_body(pet_id)
+    return conditional_body_response(request, etag, body)
 
 
 @router.post("/pet", response_model=Dict, status_code=201)
-async def add_pet(pet: NewPet):
+def add_pet(pet: NewPet):
     logger.info("Received request to add new pet", pet=pet.model_dump())
     return pet_store.add_pet(pet)
 
 
 @router.put("/pet", response_model=Dict)
-async def update_pet(pet: Pet):
+def update_pet(pet: Pet):
     logger.info("Received request to update pet", pet=pet.model_dump())
     return pet_store.update_pet(pet)
 
 
 @router.post("/pet/{pet_id}")
-async def update_pet_with_form(
-    pet_id: int,
-    name: str = Form(None),
-    status: str = Form(None)
-):
-    logger.info("Received request to update pet with ID using form data", pet_id=pet_id, name=name, status=status)
+def update_pet_with_form(pet_id: int, name: str = Form(None), status: str = Form(None)):
+    logger.info(
+        "Received request to update pet with ID using form data",
+        pet_id=pet_id,
+        name=name,
+        status=status,
+    )
     updated_pet = pet_store.update_pet_with_form(pet_id, name, status)
     return {"message": "Pet updated successfully", "pet": updated_pet}
 
 
 @router.delete("/pet/{pet_id}")
-async def delete_pet(pet_id: int):
+def delete_pet(pet_id: int):
     logger.info("Received request to delete pet", pet_id=pet_id)
     return pet_store.delete_pet(pet_id)
 
+
 # import logging
 # from fastapi import APIRouter, HTTPException, Form
 # from pydantic import BaseModel
@@ -0,0 +1,67 @@
+"""
+Run the API in several uvicorn workers that share one state process.
+
+    python -m api.serve --workers 4 --port 8000
+
+With --state-only just the state process is run, at PET_STORE_STATE_ADDRESS
+(default 127.0.0.1:8765); servers started with the same address and
+PET_STORE_STATE_AUTHKEY, which must then be set, share it, however they are
+launched.
+"""
+
+import argparse
+import os
+import secrets
+
+import uvicorn
+
+from api.state import (
+    STATE_ADDRESS,
+    STATE_AUTHKEY,
+    StateServer,
+    format_address,
+    init_state_process,
+    parse_address,
+    start_state_server,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--state-only", action="store_true", help="run only the state process"
+    )
+    args = parser.parse_args()
+
+    if args.state_only:
+        if not STATE_AUTHKEY:
+            parser.error("--state-only requires PET_STORE_STATE_AUTHKEY")
+        address = parse_address(STATE_ADDRESS or "127.0.0.1:8765")
+        init_state_process()
+        server = StateServer(address, STATE_AUTHKEY.encode()).get_server()
+        print(f"State process listening on {format_address(address)}", flush=True)
+        server.serve_forever()
+        return
+
+    # Without an address of our own, listen on a free local port with a key
+    # only this deployment knows
+    address = parse_address(STATE_ADDRESS or "127.0.0.1:0")
+    authkey = STATE_AUTHKEY or secrets.token_hex(16)
+    server = start_state_server(address, authkey.encode())
+    # Inherited by the workers, which connect to the state process on import
+    os.environ["PET_STORE_STATE_ADDRESS"] = format_address(server.address)
+    os.environ["PET_STORE_STATE_AUTHKEY"] = authkey
+    # The state process owns the journal and is the only one to load the
+    # backend; workers only hold proxies to its stores
+    os.environ.pop("PET_STORE_JOURNAL_DIR", None)
+    try:
+        uvicorn.run("api.app:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Shared state for running the API in several worker processes.
+
+Every worker process builds its own stores, so with `uvicorn --workers N`
+a pet added through one worker would be missing from the others. In
+shared-state mode one state process holds the only pet_store, user_store
+and order_store, and each worker talks to them through multiprocessing
+manager proxies. The workers still parse, validate and answer requests in
+parallel; store methods run in the state process, one thread per worker
+connection.
+
+api.serve starts a state process and the workers together.
+"""
+
+import copyreg
+import multiprocessing
+import os
+from multiprocessing.managers import BaseManager
+
+from fastapi import HTTPException
+
+# host:port (or a Unix socket path) of the state process. Unset means every
+# process keeps its own stores.
+STATE_ADDRESS = os.environ.get("PET_STORE_STATE_ADDRESS")
+# Secret shared by the state process and its workers. The manager unpickles
+# whatever a connection that knows it sends, so there is no default.
+STATE_AUTHKEY = os.environ.get("PET_STORE_STATE_AUTHKEY")
+
+# True inside the state process, whose modules build the real stores
+serving = False
+
+# HTTPException has no args to rebuild it from, so a store error raised in
+# the state process could not be unpickled in the worker without this.
+copyreg.pickle(
+    HTTPException, lambda e: (HTTPException, (e.status_code, e.detail, e.headers))
+)
+
+
+def parse_address(address):
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def format_address(address):
+    if isinstance(address, tuple):
+        return f"{address[0]}:{address[1]}"
+    return address
+
+
+class StateManager(BaseManager):
+    """Worker side: proxies for the stores of the state process."""
+
+
+class StateServer(BaseManager):
+    """State process side: serves the real stores."""
+
+
+def _pet_store():
+    from api.pets_api import pet_store
+
+    return pet_store
+
+
+def _user_store():
+    from api.user_api import user_store
+
+    return user_store
+
+
+def _order_store():
+    from api.store_api import order_store
+
+    return order_store
+
+
+# Name -> function returning the real store, imported lazily so that only
+# the state process builds stores through them
+STORES = {
+    "pet_store": _pet_store,
+    "user_store": _user_store,
+    "order_store": _order_store,
+}
+
+for name, build in STORES.items():
+    StateManager.register(name)
+    StateServer.register(name, callable=build)
+
+_manager = None
+
+
+def shared(name, build):
+    """
+    The store build() returns, or in a worker process a proxy to the state
+    process's store with this name. Workers never call build(), so they
+    neither load the backend nor build stores of their own.
+    """
+    global _manager
+    if STATE_ADDRESS is None or serving:
+        return build()
+    if not STATE_AUTHKEY:
+        raise ValueError("PET_STORE_STATE_AUTHKEY is required with a state address")
+    if _manager is None:
+        _manager = StateManager(parse_address(STATE_ADDRESS), STATE_AUTHKEY.encode())
+        _manager.connect()
+    return getattr(_manager, name)()
+
+
+def init_state_process():
+    global serving
+    serving = True
+    # Build the stores, seeding the backend, before taking any connection
+    for build in STORES.values():
+        build()
+
+
+def start_state_server(address, authkey):
+    """Start the state process and return its manager, already listening."""
+    server = StateServer(address, authkey, ctx=multiprocessing.get_context("spawn"))
+    server.start(init_state_process)
+    return server
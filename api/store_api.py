@@ -1,55 +1,88 @@
 from util.logging_config import logger
-from fastapi import APIRouter, HTTPException
-from data.store_data import orders, order_id_counter
-from data.pets_data import pets
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from storage import get_backend
+from storage.base import OrderRepository
+from api.pets_api import pet_store
+from api.state import shared
+from util.etag import VersionTable, conditional_response, etag_matches, not_modified
+from util.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 # logger = structlog.get_logger(__name__)
 
 
+class OrderStore:
+    def __init__(self, repository: OrderRepository):
+        self.repository = repository
+        # Orders are never changed and their IDs never reused, so an order
+        # stays at its first version until deleted
+        self.versions = VersionTable()
+
+    def place_order(self, order: dict):
+        logger.info("Placing new order", order=order)
+        order = self.repository.insert(order)
+        logger.info("Order placed successfully", order_id=order["id"])
+        return order
+
+    def get_order(self, order_id: int):
+        logger.info("Getting order by ID", order_id=order_id)
+        order = self.repository.get(order_id)
+        if order is None:
+            logger.warning("Order not found", order_id=order_id)
+            raise HTTPException(status_code=404, detail="Order not found")
+        logger.info("Order found", order_id=order_id)
+        return order
+
+    def order_etag(self, order_id: int):
+        return self.versions.etag(order_id)
+
+    def delete_order(self, order_id: int):
+        logger.info("Deleting order", order_id=order_id)
+        if not self.repository.delete(order_id):
+            logger.warning("Order not found", order_id=order_id)
+            raise HTTPException(status_code=404, detail="Order not found")
+        self.versions.forget(order_id)
+        logger.info("Order deleted successfully", order_id=order_id)
+        return {"message": f"Order with ID {order_id} has been deleted"}
+
+    def stats(self):
+        """Live counters for /metrics."""
+        return {"records": self.repository.count()}
+
+
+order_store = shared("order_store", lambda: OrderStore(get_backend().orders))
+
+
 @router.post("/store/order", status_code=201)
 def place_order(order: dict):
-    global order_id_counter
-    logger.info("Placing new order", order=order)
-    order["id"] = order_id_counter
-    order_id_counter += 1
-    orders.append(order)
-    logger.info("Order placed successfully", order_id=order["id"])
-    return order
+    logger.info("Received request to place order", order=order)
+    return order_store.place_order(order)
 
 
 @router.get("/store/order/{order_id}")
-def get_order(order_id: int):
-    logger.info("Getting order by ID", order_id=order_id)
-    for order in orders:
-        if order["id"] == order_id:
-            logger.info("Order found", order_id=order_id)
-            return order
-    logger.warning("Order not found", order_id=order_id)
-    raise HTTPException(status_code=404, detail="Order not found")
+def get_order(order_id: int, request: Request):
+    logger.info("Received request to get order by ID", order_id=order_id)
+    etag = order_store.order_etag(order_id)
+    return conditional_response(request, etag, order_store.get_order(order_id))
 
 
 @router.delete("/store/order/{order_id}")
 def delete_order(order_id: int):
-    logger.info("Deleting order", order_id=order_id)
-    for order in orders:
-        if order["id"] == order_id:
-            orders.remove(order)
-            logger.info("Order deleted successfully", order_id=order_id)
-            return {"message": f"Order with ID {order_id} has been deleted"}
-    logger.warning("Order not found", order_id=order_id)
-    raise HTTPException(status_code=404, detail="Order not found")
+    logger.info("Received request to delete order", order_id=order_id)
+    return order_store.delete_order(order_id)
 
 
 @router.get("/store/inventory")
-def get_inventory():
-    logger.info("Calculating inventory")
-    inventory = {}
-    for pet in pets:
-        status = pet["status"]
-        inventory[status] = inventory.get(status, 0) + 1
-    logger.info("Inventory calculated", inventory=inventory)
-    return inventory
+def get_inventory(request: Request):
+    logger.info("Received request to get inventory")
+    # The inventory always exists, so an unchanged one is not even read
+    etag = pet_store.inventory_etag()
+    if etag_matches(request, etag):
+        logger.info("Inventory not modified")
+        return not_modified(etag)
+    return JSONResponse(pet_store.get_inventory(), headers={"ETag": etag})
+
 
 # from fastapi import APIRouter, HTTPException
 # from data.store_data import orders, order_id_counter
@@ -104,4 +137,3 @@ def get_inventory():
 #         inventory[status] = inventory.get(status, 0) + 1
 #     logger.info(f"Inventory calculated: {inventory}")
 #     return inventory
-
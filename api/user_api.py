@@ -1,12 +1,28 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 
-from data.user_data import users as init_users
+from api.state import shared
+from storage import get_backend
+from storage.base import DuplicateKeyError, UserRepository
+from util.etag import (
+    BODY_CACHE_SIZE,
+    VersionTable,
+    conditional_body_response,
+    json_body,
+)
 from util.logging_config import logger
+from util.lru import LRUCache
+from util.passwords import PasswordHasher
+from util.profiling import ProfiledRoute
+from util.sessions import SessionStore
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Page size of /user/search when no limit is given, and the largest allowed
+SEARCH_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
 
 # User data model
@@ -30,44 +46,109 @@ class NewUser(BaseModel):
     phone: str
 
 
+def public_user(user: Dict):
+    """The user as the API shows it, without the password hash."""
+    return {key: value for key, value in user.items() if key != "password"}
+
+
 # User storage structure
 class UserStore:
-    def __init__(self, init_users):
-        self.users = init_users
+    def __init__(
+        self,
+        repository: UserRepository,
+        body_cache_size=BODY_CACHE_SIZE,
+        hasher: PasswordHasher = None,
+    ):
+        self.repository = repository
+        # Only password hashes are stored; hashing and verification run in
+        # the hasher's process pool
+        self.hasher = hasher or PasswordHasher()
+        # Login session tokens, expired by a timer wheel
+        self.sessions = SessionStore()
+        # Usernames can be reused after a delete, so creating a user bumps
+        # its version too
+        self.versions = VersionTable()
+        # username -> (ETag, JSON body) of recently read users
+        self.bodies = LRUCache(body_cache_size)
+
+    def _changed(self, username):
+        self.versions.bump(username)
+        self.bodies.invalidate(username)
+
+    def _removed(self, username):
+        self.versions.forget(username)
+        self.bodies.invalidate(username)
+        # A deleted or renamed user's tokens must not keep authenticating
+        self.sessions.revoke_user(username)
 
     def add_user(self, user: NewUser):
-        logger.info("Adding new user", user=user.model_dump())
-        new_id = max([u["id"] for u in self.users]) + 1 if self.users else 1
+        logger.info("Adding new user", user=user.model_dump(exclude={"password"}))
         user_data = user.model_dump()
-        user_data["id"] = new_id
-        self.users.append(user_data)
-        logger.info("Added new user with ID", user_id=new_id)
-        return user_data
+        user_data["password"] = self.hasher.hash(user.password)
+        try:
+            user_data = self.repository.insert(user_data)
+        except DuplicateKeyError:
+            logger.error("Username already exists", username=user.username)
+            raise HTTPException(status_code=409, detail="Username already exists")
+        self._changed(user_data["username"])
+        logger.info("Added new user with ID", user_id=user_data["id"])
+        return public_user(user_data)
 
     def get_user_by_username(self, username: str):
         logger.info("Searching for user", username=username)
-        user = next((u for u in self.users if u["username"] == username), None)
+        user = self.repository.get(username)
         if not user:
             logger.warning("User not found", username=username)
         return user
 
+    def get_user_body(self, username: str):
+        """
+        ETag and JSON body of the user, from the body cache when present.
+
+        None if there is no such user.
+        """
+        cached = self.bodies.get(username)
+        if cached is not None:
+            logger.info("Serving cached user", username=username)
+            return cached
+        # Both are read before the record, see LRUCache and VersionTable
+        generation = self.bodies.generation
+        etag = self.versions.etag(username)
+        user = self.get_user_by_username(username)
+        if not user:
+            return None
+        entry = (etag, json_body(public_user(user)))
+        self.bodies.put(username, entry, generation)
+        return entry
+
     def update_user(self, username: str, user: User):
-        logger.info("Updating user", username=username, user=user.model_dump())
-        existing_user = self.get_user_by_username(username)
+        logger.info(
+            "Updating user",
+            username=username,
+            user=user.model_dump(exclude={"password"}),
+        )
+        user_data = user.model_dump()
+        user_data["password"] = self.hasher.hash(user.password)
+        try:
+            existing_user = self.repository.update(username, user_data)
+        except DuplicateKeyError:
+            logger.error("Username already exists", username=user.username)
+            raise HTTPException(status_code=409, detail="Username already exists")
         if not existing_user:
             logger.error("User not found", username=username)
             raise HTTPException(status_code=404, detail="User not found")
-        existing_user.update(user.model_dump())
+        if existing_user["username"] != username:
+            self._removed(username)
+        self._changed(existing_user["username"])
         logger.info("User updated successfully", username=username)
-        return existing_user
+        return public_user(existing_user)
 
     def delete_user(self, username: str):
         logger.info("Deleting user", username=username)
-        existing_user = self.get_user_by_username(username)
-        if not existing_user:
+        if not self.repository.delete(username):
             logger.error("User not found", username=username)
             raise HTTPException(status_code=404, detail="User not found")
-        self.users = [u for u in self.users if u["username"] != username]
+        self._removed(username)
         logger.info("User deleted successfully", username=username)
         return {"message": f"User with username {username} has been deleted"}
 
@@ -77,34 +158,79 @@ class UserStore:
         if not user:
             logger.error("User not found", username=username)
             raise HTTPException(status_code=404, detail="User not found")
-        if user["password"] != password:
+        if not self.hasher.verify(password, user["password"]):
             logger.error("Invalid username or password", username=username)
             raise HTTPException(status_code=401, detail="Invalid username or password")
+        token = self.sessions.create(user["username"])
         logger.info("User logged in successfully", username=username)
-        return {"message": "Login successful", "username": username}
+        return {
+            "message": "Login successful",
+            "username": username,
+            "token": token,
+            "expires_in": self.sessions.ttl,
+        }
 
-    def logout_user(self):
-        logger.info("User logged out successfully")
-        return {"message": "Logout successful"}
+    def logout_user(self, token: Optional[str] = None):
+        if token is None:
+            logger.info("User logged out successfully")
+            return {"message": "Logout successful"}
+        username = self.sessions.revoke(token)
+        if username is None:
+            logger.warning("Session not found")
+            raise HTTPException(status_code=401, detail="Invalid or expired session")
+        logger.info("User logged out successfully", username=username)
+        return {"message": "Logout successful", "username": username}
 
     def create_users(self, users: List[NewUser]):
         logger.info("Creating multiple users", count=len(users))
-        new_users = []
-        for user in users:
-            new_users.append(self.add_user(user))
+        # The repository rejects the whole batch if any username is taken, so
+        # a duplicate never leaves it half applied.
+        users_data = [user.model_dump() for user in users]
+        hashes = self.hasher.hash_many([user.password for user in users])
+        for user_data, password_hash in zip(users_data, hashes):
+            user_data["password"] = password_hash
+        try:
+            new_users = self.repository.insert_many(users_data)
+        except DuplicateKeyError as e:
+            logger.error("Username already exists", error=str(e))
+            raise HTTPException(status_code=409, detail="Username already exists")
+        for user_data in new_users:
+            self._changed(user_data["username"])
         logger.info("Users created successfully", count=len(new_users))
         return {
             "message": f"{len(new_users)} users created successfully",
-            "users": new_users,
+            "users": [public_user(user_data) for user_data in new_users],
         }
 
+    def search_users(self, query: str, limit=None, cursor=None):
+        """
+        Users whose username starts with the query or whose names match it,
+        in username order.
+        """
+        logger.info("Searching users", query=query, limit=limit, cursor=cursor)
+        users = self.repository.search(query, limit=limit, cursor=cursor)
+        logger.info("Found users matching search", query=query, count=len(users))
+        return [public_user(user) for user in users]
+
+    def stats(self):
+        """Live counters for /metrics."""
+        return {
+            "records": self.repository.count(),
+            "cache_entries": len(self.bodies),
+            "cache_hits": self.bodies.hits,
+            "cache_misses": self.bodies.misses,
+            "sessions": len(self.sessions),
+        }
 
-user_store = UserStore(init_users)
+
+user_store = shared("user_store", lambda: UserStore(get_backend().users))
 
 
 @router.post("/user", response_model=Dict, status_code=201)
 def add_user(user: NewUser):
-    logger.info("Received request to add new user", user=user.model_dump())
+    logger.info(
+        "Received request to add new user", user=user.model_dump(exclude={"password"})
+    )
     return user_store.add_user(user)
 
 
@@ -115,24 +241,54 @@ def login_user(username: str, password: str):
 
 
 @router.get("/user/logout", response_model=Dict)
-def logout_user():
+def logout_user(authorization: Optional[str] = Header(None)):
+    """Revoke the session given as `Authorization: Bearer <token>`, if any."""
     logger.info("Received request to logout user")
-    return user_store.logout_user()
+    token = None
+    if authorization is not None:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return user_store.logout_user(token)
+
+
+@router.get("/user/search", response_model=List[Dict])
+def search_users(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Users whose username starts with q, or whose first and last names have a
+    word starting with each word of q, ignoring case, ordered by username.
+
+    Returns one page of up to limit users and puts the cursor for the next
+    page in the X-Next-Cursor header.
+    """
+    logger.info("Received request to search users", q=q, limit=limit, cursor=cursor)
+    users = user_store.search_users(q, limit=limit + 1, cursor=cursor)
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = users[-1]["username"]
+    return users
 
 
 @router.get("/user/{username}", response_model=Dict)
-def get_user(username: str):
+def get_user(username: str, request: Request):
     logger.info("Received request to get user by username", username=username)
-    user = user_store.get_user_by_username(username)
-    if not user:
+    entry = user_store.get_user_body(username)
+    if not entry:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return conditional_body_response(request, *entry)
 
 
 @router.put("/user/{username}", response_model=Dict)
-async def update_user(username: str, user: User):
+def update_user(username: str, user: User):
     logger.info(
-        "Received request to update user", username=username, user=user.model_dump()
+        "Received request to update user",
+        username=username,
+        user=user.model_dump(exclude={"password"}),
     )
     return user_store.update_user(username, user)
 
@@ -144,13 +300,13 @@ def delete_user(username: str):
 
 
 @router.post("/user/createWithList", response_model=Dict)
-async def create_users_with_list(users: List[NewUser]):
+def create_users_with_list(users: List[NewUser]):
     logger.info("Received request to create users with list", count=len(users))
     return user_store.create_users(users)
 
 
 @router.post("/user/createWithArray", response_model=Dict)
-async def create_users_with_array(users: List[NewUser]):
+def create_users_with_array(users: List[NewUser]):
     logger.info("Received request to create users with array", count=len(users))
     return user_store.create_users(users)
 
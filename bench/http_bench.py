@@ -0,0 +1,256 @@
+"""
+HTTP load and latency benchmark for every API route.
+
+Starts the app with uvicorn in a background thread, the same way the test
+suite does, unless --url points at a running server. Each worker is an
+httpx.AsyncClient that repeats a scenario touching every route and cleaning
+up after itself. Per-route throughput and latency percentiles are written
+as JSON so runs from different commits can be compared.
+
+    python -m bench.http_bench --workers 16 --duration 30 --output run.json
+    python -m bench.http_bench --url http://127.0.0.1:8000 --workers 64
+    python -m bench.http_bench --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+
+class Recorder:
+    """Latencies and error counts per route template."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, route, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+
+async def scenario(client, recorder, worker, iteration):
+    """One pass over every route. Everything it creates, it deletes."""
+    call = recorder.call
+    tag = f"w{worker}i{iteration}"
+
+    pet = {"name": f"pet-{tag}", "category": {"id": 1}, "status": "available"}
+    response = await call(client, "POST /pet", "POST", "/pet", json=pet)
+    pet_id = response.json()["id"]
+    await call(client, "GET /pet/{pet_id}", "GET", f"/pet/{pet_id}")
+    await call(
+        client,
+        "PUT /pet",
+        "PUT",
+        "/pet",
+        json={"id": pet_id, "name": f"pet-{tag}", "status": "pending"},
+    )
+    await call(
+        client,
+        "POST /pet/{pet_id}",
+        "POST",
+        f"/pet/{pet_id}",
+        data={"status": "available"},
+    )
+    await call(
+        client,
+        "GET /pet/findByStatus",
+        "GET",
+        "/pet/findByStatus",
+        params={"status": "available", "limit": 50},
+    )
+    await call(client, "DELETE /pet/{pet_id}", "DELETE", f"/pet/{pet_id}")
+
+    response = await call(
+        client, "POST /pet/batch", "POST", "/pet/batch", json=[pet] * 5
+    )
+    ids = [result["pet"]["id"] for result in response.json()]
+    updates = [{"id": i, "name": f"pet-{tag}", "status": "sold"} for i in ids]
+    await call(client, "PUT /pet/batch", "PUT", "/pet/batch", json=updates)
+    await call(client, "POST /pet/batchDelete", "POST", "/pet/batchDelete", json=ids)
+
+    order = {"pet_id": 2, "quantity": 1, "status": "placed", "complete": False}
+    response = await call(
+        client, "POST /store/order", "POST", "/store/order", json=order
+    )
+    order_id = response.json()["id"]
+    await call(client, "GET /store/order/{order_id}", "GET", f"/store/order/{order_id}")
+    await call(
+        client, "DELETE /store/order/{order_id}", "DELETE", f"/store/order/{order_id}"
+    )
+    await call(client, "GET /store/inventory", "GET", "/store/inventory")
+
+    def new_user(username):
+        return {
+            "username": username,
+            "firstName": "Bench",
+            "lastName": tag,
+            "email": f"{username}@example.com",
+            "password": "benchpass",
+            "phone": "000-000-0000",
+        }
+
+    username = f"user-{tag}"
+    await call(client, "POST /user", "POST", "/user", json=new_user(username))
+    await call(
+        client,
+        "GET /user/login",
+        "GET",
+        "/user/login",
+        params={"username": username, "password": "benchpass"},
+    )
+    await call(client, "GET /user/{username}", "GET", f"/user/{username}")
+    await call(
+        client,
+        "PUT /user/{username}",
+        "PUT",
+        f"/user/{username}",
+        json={"id": 0, **new_user(username), "userStatus": 1},
+    )
+    await call(client, "GET /user/logout", "GET", "/user/logout")
+    await call(client, "DELETE /user/{username}", "DELETE", f"/user/{username}")
+
+    for route in ("createWithList", "createWithArray"):
+        usernames = [f"{route}-{tag}-{i}" for i in range(2)]
+        await call(
+            client,
+            f"POST /user/{route}",
+            "POST",
+            f"/user/{route}",
+            json=[new_user(name) for name in usernames],
+        )
+        for name in usernames:
+            await client.delete(f"/user/{name}")
+
+
+async def worker_loop(base_url, recorder, worker, deadline, iterations):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        iteration = 0
+        while time.perf_counter() < deadline and (
+            iterations is None or iteration < iterations
+        ):
+            await scenario(client, recorder, worker, iteration)
+            iteration += 1
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for route, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        routes[route] = {
+            "count": len(latencies),
+            "errors": recorder.errors[route],
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1e3, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1e3, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1e3, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1e3, 3),
+        }
+    total = sum(route["count"] for route in routes.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": total,
+        "total_errors": sum(route["errors"] for route in routes.values()),
+        "throughput_rps": round(total / elapsed, 1),
+        "routes": routes,
+    }
+
+
+def start_local_server():
+    # Keep server logging off unless the caller asked for it, so the log
+    # pipeline is not what gets measured.
+    os.environ.setdefault("PET_STORE_LOG_MODE", "off")
+    from api.app import app
+    from util.server import start_server_thread
+
+    return start_server_thread(app, random.randint(10000, 60000), log_level="warning")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)["results"]["routes"]
+    with open(after_path) as f:
+        after = json.load(f)["results"]["routes"]
+    print(f"{'route':<34}{'rps':>20}{'p50 ms':>20}{'p99 ms':>20}")
+    for route in sorted(set(before) | set(after)):
+        cells = []
+        for key in ("throughput_rps", "p50_ms", "p99_ms"):
+            old = before.get(route, {}).get(key)
+            new = after.get(route, {}).get(key)
+            if old is None or new is None:
+                cells.append(f"{'-':>20}")
+            else:
+                change = (new - old) / old * 100 if old else 0.0
+                cells.append(f"{old:>8} -> {new:<8}{change:+.0f}%".rjust(20))
+        print(f"{route:<34}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running server instead")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--iterations", type=int, help="scenario passes per worker")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two reports"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    base_url = args.url or start_local_server()
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    async def drive():
+        await asyncio.gather(
+            *(
+                worker_loop(base_url, recorder, worker, deadline, args.iterations)
+                for worker in range(args.workers)
+            )
+        )
+
+    start = time.perf_counter()
+    asyncio.run(drive())
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "config": {
+            "url": base_url,
+            "workers": args.workers,
+            "duration_s": args.duration,
+            "iterations": args.iterations,
+            "backend": os.environ.get("PET_STORE_BACKEND", "memory"),
+            "log_mode": os.environ.get("PET_STORE_LOG_MODE"),
+        },
+        "results": summarize(recorder, elapsed),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Write throughput of the journal under each fsync policy, and recovery time.
+
+Writes: threads update pets of a journaled memory backend as fast as they
+can for a few seconds, under each fsync policy and without a journal, and
+the writes per second and per fsync are reported. Under "always" every
+write waits for its fsync, so more threads means more writes per fsync
+(group commit).
+
+Recovery: a catalog of data.generate records is written to a journal
+directory two ways, as a snapshot plus a tail of updates and as a journal
+of inserts with no snapshot, and reopening each is timed.
+
+    python -m bench.journal_bench
+    python -m bench.journal_bench --threads 1 16 64 --records 1000000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from data.generate import generate
+from storage import bulk_load
+from storage.journal import FSYNC_POLICIES, JournaledMemoryBackend
+from storage.memory import MemoryBackend
+
+SEED_PETS = 10_000
+
+
+def seed_tables():
+    pets, users, orders = generate(SEED_PETS, 0, 0)
+    return list(pets), list(users), list(orders)
+
+
+def write_rate(backend, threads, duration):
+    done = [0] * threads
+    start = time.perf_counter()
+    # Each writer checks the time itself: with many threads queued on the
+    # store's lock, a main thread waiting to signal them can be starved
+    deadline = start + duration
+
+    def writer(worker):
+        i = worker
+        while time.perf_counter() < deadline:
+            backend.pets.update(1 + i % SEED_PETS, name=f"Pet {i}")
+            done[worker] += 1
+            i += threads
+
+    pool = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(done), time.perf_counter() - start
+
+
+def throughput(policy, threads, duration, directory):
+    if policy is None:
+        backend = MemoryBackend(*seed_tables())
+        writes, elapsed = write_rate(backend, threads, duration)
+        return writes / elapsed, None
+    path = os.path.join(directory, f"{policy}-{threads}")
+    backend = JournaledMemoryBackend(
+        path, seed_tables, fsync=policy, snapshot_every=10**9
+    )
+    writes, elapsed = write_rate(backend, threads, duration)
+    backend.close()
+    syncs = backend.journal.syncs
+    return writes / elapsed, writes / syncs if syncs else None
+
+
+def directory_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+    )
+
+
+def reopen(directory):
+    start = time.perf_counter()
+    with bulk_load():
+        backend = JournaledMemoryBackend(directory, None)
+    elapsed = time.perf_counter() - start
+    records = backend.pets.count() + backend.users.count() + backend.orders.count()
+    backend.close()
+    del backend
+    gc.unfreeze()
+    gc.collect()
+    return elapsed, records
+
+
+def recovery(records, tail, directory):
+    n_pets = records * 10 // 12
+    n_users = n_orders = records // 12
+
+    def tables():
+        return generate(n_pets, n_users, n_orders, iterations=1_000)
+
+    rows = {}
+    snapshotted = os.path.join(directory, "snapshot")
+    with bulk_load():
+        backend = JournaledMemoryBackend(
+            snapshotted, tables, fsync="off", snapshot_every=10**9
+        )
+    for i in range(tail):
+        backend.pets.update(1 + i * 7919 % n_pets, status="sold")
+    backend.close()
+    del backend
+    elapsed, count = reopen(snapshotted)
+    rows[f"snapshot + {tail:,} updates"] = (elapsed, count, snapshotted)
+
+    journaled = os.path.join(directory, "journal")
+    backend = JournaledMemoryBackend(
+        journaled, lambda: ((), (), ()), fsync="off", snapshot_every=10**9
+    )
+    pets, users, orders = tables()
+    batch = []
+    for pet in pets:
+        batch.append(pet)
+        if len(batch) == 1000:
+            backend.pets.insert_many(batch)
+            batch = []
+    backend.pets.insert_many(batch)
+    backend.users.insert_many(list(users))
+    for order in orders:
+        backend.orders.insert(order)
+    backend.close()
+    del backend
+    gc.collect()
+    elapsed, count = reopen(journaled)
+    rows["journal only"] = (elapsed, count, journaled)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--records", type=int, default=1_200_000)
+    parser.add_argument("--tail", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'fsync':<12}{'threads':>8}{'writes/s':>12}{'writes/fsync':>14}")
+        for policy in (None, *FSYNC_POLICIES):
+            for threads in args.threads:
+                rate, per_sync = throughput(policy, threads, args.duration, directory)
+                if per_sync is None or policy == "off":
+                    per_sync = f"{'-':>14}"
+                else:
+                    per_sync = f"{per_sync:>14.1f}"
+                name = policy or "no journal"
+                print(f"{name:<12}{threads:>8}{rate:>12,.0f}{per_sync}")
+
+        print()
+        print(f"{'recovery':<28}{'records':>12}{'size (MB)':>12}{'seconds':>10}")
+        for name, (elapsed, count, path) in recovery(
+            args.records, args.tail, directory
+        ).items():
+            size = directory_size(path) / 1e6
+            print(f"{name:<28}{count:>12,}{size:>12.1f}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
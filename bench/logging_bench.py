@@ -0,0 +1,82 @@
+"""
+Request throughput with the different logging modes.
+
+Each mode runs in a fresh interpreter, because util.logging_config reads
+PET_STORE_LOG_MODE at import time. Requests go through the full ASGI stack,
+including the log_requests middleware, via httpx's in-process transport.
+
+    python -m bench.logging_bench
+    python -m bench.logging_bench --requests 20000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODES = ["off", "sync", "queue"]
+
+
+async def drive(total, concurrency):
+    import httpx
+
+    from api.app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        per_worker = total // concurrency
+
+        async def worker(n):
+            for i in range(n):
+                response = await client.get(f"/pet/{i % 3 + 1}")
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return per_worker * concurrency / elapsed
+
+
+def child(args):
+    rps = asyncio.run(drive(args.requests, args.concurrency))
+    sys.stderr.write(json.dumps({"rps": rps}) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    results = {}
+    for mode in args.modes:
+        env = dict(os.environ, PET_STORE_LOG_MODE=mode)
+        command = [sys.executable, "-m", "bench.logging_bench", "--child"]
+        command += ["--requests", str(args.requests)]
+        command += ["--concurrency", str(args.concurrency)]
+        # Log output goes to /dev/null so the terminal is not the bottleneck
+        proc = subprocess.run(
+            command,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        results[mode] = json.loads(proc.stderr.strip().splitlines()[-1])["rps"]
+
+    for mode, rps in results.items():
+        print(f"{mode:<8}{rps:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+/user/login throughput at different password hashing costs and pool sizes.
+
+Logins go through the full ASGI stack via httpx's in-process transport, so
+the login route runs in the server's threadpool exactly as it does under
+uvicorn. A pool size of 0 verifies on those threadpool threads instead of
+in worker processes.
+
+    python -m bench.login_bench
+    python -m bench.login_bench --costs 10000 100000 --workers 0 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from api.user_api import NewUser, user_store
+from util.passwords import PasswordHasher
+
+
+def make_users(n):
+    return [
+        NewUser(
+            username=f"login_bench_{i}",
+            firstName="Login",
+            lastName="Bench",
+            email=f"login_bench_{i}@example.com",
+            password=f"password{i}",
+            phone="000-000-0000",
+        )
+        for i in range(n)
+    ]
+
+
+async def drive(users, total, concurrency):
+    import httpx
+
+    from api.app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        per_worker = total // concurrency
+
+        async def worker(offset):
+            for i in range(per_worker):
+                n = (offset + i) % users
+                response = await client.get(
+                    "/user/login",
+                    params={"username": f"login_bench_{n}", "password": f"password{n}"},
+                )
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(w * per_worker) for w in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return per_worker * concurrency / elapsed
+
+
+def run(cost, workers, args):
+    user_store.hasher = PasswordHasher(iterations=cost, workers=workers)
+    try:
+        # Warm the pool up so process start-up is not measured
+        user_store.hasher.verify("warm", "warm")
+        return asyncio.run(drive(args.users, args.requests, args.concurrency))
+    finally:
+        user_store.hasher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    cpus = os.cpu_count() or 1
+    parser.add_argument("--costs", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({0, 1, max(cpus // 2, 1), cpus}),
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    users = make_users(args.users)
+    rows = {}
+    for cost in args.costs:
+        # Hash the users at this cost with every core
+        user_store.hasher = PasswordHasher(iterations=cost, workers=cpus)
+        user_store.create_users(users)
+        user_store.hasher.close()
+        rows[cost] = {workers: run(cost, workers, args) for workers in args.workers}
+        for user in users:
+            user_store.delete_user(user.username)
+
+    print(f"{'logins/s':<16}" + "".join(f"{f'pool {w}':>12}" for w in args.workers))
+    for cost, row in rows.items():
+        line = "".join(f"{row[w]:>12.1f}" for w in args.workers)
+        print(f"{f'cost {cost:,}':<16}{line}")
+
+
+if __name__ == "__main__":
+    main()
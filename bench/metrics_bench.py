@@ -0,0 +1,108 @@
+"""
+Overhead of request metrics on the full app.
+
+Drives a mix of routes through the whole ASGI stack with httpx's in-process
+transport, alternating rounds with metrics recording on and off so drift in
+machine load hits both equally, and reports throughput and the relative
+cost. Also times the recording middleware on its own around an empty app,
+and rendering /metrics.
+
+    python -m bench.metrics_bench
+    python -m bench.metrics_bench --rounds 20 --requests 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+
+from api.app import app
+from api.metrics_api import request_metrics
+from util.metrics import MetricsMiddleware, MetricsWriter, RequestMetrics
+
+PATHS = ["/pet/1", "/pet/2", "/store/inventory", "/store/order/1", "/pet/999999"]
+
+
+async def requests_per_second(client, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        await client.get(PATHS[i % len(PATHS)])
+    return requests / (time.perf_counter() - start)
+
+
+async def app_overhead(rounds, requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await requests_per_second(client, requests)
+        results = {False: [], True: []}
+        for i in range(rounds * 2):
+            # Alternate which setting goes first so neither is always warmer
+            enabled = (i % 2 == 0) == (i // 2 % 2 == 0)
+            request_metrics.enabled = enabled
+            results[enabled].append(await requests_per_second(client, requests))
+    request_metrics.enabled = True
+    return statistics.median(results[False]), statistics.median(results[True])
+
+
+async def middleware_cost(calls):
+    async def empty_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    wrapped = MetricsMiddleware(empty_app, RequestMetrics(), lambda path: "pets")
+    timings = {}
+    for name, asgi_app in (("bare", empty_app), ("wrapped", wrapped)):
+        start = time.perf_counter()
+        for _ in range(calls):
+            scope = {"type": "http", "method": "GET", "path": "/pet/1"}
+            await asgi_app(scope, receive, send)
+        timings[name] = (time.perf_counter() - start) / calls
+    return (timings["wrapped"] - timings["bare"]) * 1e6
+
+
+def render_cost(routes):
+    metrics = RequestMetrics()
+    for i in range(routes):
+        for status in (200, 404):
+            metrics.observe("GET", f"/route/{i}", status, 0.001 * (i % 100))
+    start = time.perf_counter()
+    writer = MetricsWriter()
+    metrics.write(writer)
+    text = writer.text()
+    return (time.perf_counter() - start) * 1e3, len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--routes", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    off, on = asyncio.run(app_overhead(args.rounds, args.requests))
+    print(f"{'metrics off (req/s)':<28}{off:>12.1f}")
+    print(f"{'metrics on (req/s)':<28}{on:>12.1f}")
+    print(f"{'overhead':<28}{(off - on) / off * 100:>11.2f}%")
+
+    cost = asyncio.run(middleware_cost(args.calls))
+    print(f"{'middleware (us/request)':<28}{cost:>12.2f}")
+
+    ms, size = render_cost(args.routes)
+    print(f"{f'render {args.routes} routes (ms)':<28}{ms:>12.2f}  ({size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
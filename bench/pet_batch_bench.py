@@ -0,0 +1,73 @@
+"""
+Per-change cost of single pet requests versus the batch endpoints.
+
+Requests go through the full ASGI stack via httpx's in-process transport,
+so the numbers cover routing, validation and serialization but not the
+network round trip a real client would also save.
+
+    python -m bench.pet_batch_bench
+    python -m bench.pet_batch_bench --changes 20000 --batch-size 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from api.app import app
+
+
+def new_pet(i):
+    return {"name": f"bench-{i}", "category": {"id": 1}, "status": "bench"}
+
+
+async def run(changes, batch_size):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        results = {}
+
+        start = time.perf_counter()
+        ids = []
+        for i in range(changes):
+            response = await client.post("/pet", json=new_pet(i))
+            ids.append(response.json()["id"])
+        for pet_id in ids:
+            await client.put(
+                "/pet", json={"id": pet_id, "name": "x", "status": "bench"}
+            )
+        for pet_id in ids:
+            await client.delete(f"/pet/{pet_id}")
+        results["single"] = (time.perf_counter() - start) / (3 * changes) * 1e6
+
+        start = time.perf_counter()
+        for offset in range(0, changes, batch_size):
+            count = min(batch_size, changes - offset)
+            response = await client.post(
+                "/pet/batch", json=[new_pet(i) for i in range(count)]
+            )
+            ids = [result["pet"]["id"] for result in response.json()]
+            updates = [{"id": pet_id, "name": "x", "status": "bench"} for pet_id in ids]
+            await client.put("/pet/batch", json=updates)
+            await client.post("/pet/batchDelete", json=ids)
+        results["batch"] = (time.perf_counter() - start) / (3 * changes) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--changes", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = asyncio.run(run(args.changes, args.batch_size))
+    for mode, us in results.items():
+        print(f"{mode:<8}{us:>10.1f} us/change")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark for PetStore lookups and mutations.
+
+Builds stores of growing size and reports the mean latency of each operation,
+which should stay flat as the catalog grows.
+
+    python -m bench.pet_store_bench
+    python -m bench.pet_store_bench --sizes 1000 1000000 --ops 20000
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from api.pets_api import NewPet, Pet, PetStore
+from storage.memory import MemoryPetRepository
+
+STATUSES = ["available", "pending", "sold"]
+
+
+def make_pets(n):
+    return [
+        {
+            "id": i,
+            "name": f"pet-{i}",
+            "category": {"id": i % 10, "name": f"category-{i % 10}"},
+            "status": STATUSES[i % len(STATUSES)],
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def measure(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(*arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def run(size, ops, seed):
+    rnd = random.Random(seed)
+    store = PetStore(MemoryPetRepository(make_pets(size)))
+    # A rare status keeps findByStatus results small, so its cost reflects the
+    # index lookup rather than the size of the returned list.
+    store.add_pet(NewPet(name="rare", category={"id": 0}, status="quarantine"))
+    ids = [(rnd.randint(1, size),) for _ in range(ops)]
+    # Updates draw new names and statuses at random, as with a fixed one the
+    # small catalog's pets, each updated many times, soon stop changing and
+    # its updates skip most of the index work the large catalog's still do
+    updates = [
+        (
+            Pet(
+                id=pet_id,
+                name=f"pet-{rnd.randint(1, size)}",
+                status=rnd.choice(STATUSES),
+            ),
+        )
+        for (pet_id,) in ids
+    ]
+    forms = [(pet_id, None, rnd.choice(STATUSES)) for (pet_id,) in ids]
+    renames = [(pet_id, f"pet-{rnd.randint(1, size)}") for (pet_id,) in ids]
+    new_pets = [(NewPet(name="new", category={"id": 1}, status="available"),)] * ops
+
+    results = {
+        "get_pet_by_id": measure(store.get_pet_by_id, ids),
+        "find_pets_by_status": measure(
+            store.find_pets_by_status, [("quarantine",)] * ops
+        ),
+        "update_pet": measure(store.update_pet, updates),
+        # One page of every status in name order, read from the name index
+        "find_pets_by_name": measure(
+            store.find_pets_by_statuses, [(STATUSES, "name", "asc", 100)] * ops
+        ),
+        "update_pet_with_form": measure(store.update_pet_with_form, forms),
+        # A rename only changes the name index and the name search index
+        "rename_pet": measure(store.update_pet_with_form, renames),
+        "add_pet": measure(store.add_pet, new_pets),
+    }
+    added = [(pet_id,) for pet_id in range(size + 2, size + 2 + ops)]
+    results["delete_pet"] = measure(store.delete_pet, added)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--ops", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    rows = {size: run(size, args.ops, args.seed) for size in args.sizes}
+
+    operations = list(next(iter(rows.values())))
+    print(f"{'operation (us/op)':<24}" + "".join(f"{size:>12,}" for size in rows))
+    for operation in operations:
+        line = "".join(f"{rows[size][operation]:>12.2f}" for size in rows)
+        print(f"{operation:<24}{line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Memory per record of plain dicts versus storage.records' compact tuples.
+
+Each table is filled two ways: with the data.generate records as they are
+made, which already share their category dicts and status strings, and
+with the same records parsed back from JSON one by one, as records written
+through the API or replayed from a journal arrive, each with its own copy
+of every value. Each is stored keyed as the memory backend keys it, either
+as the dict or packed by a CompactTable. tracemalloc reports the bytes the
+stored records hold per record, and the time to read one back into a dict
+is measured for both.
+
+    python -m bench.records_bench
+    python -m bench.records_bench --records 1000000
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from data.generate import generate_orders, generate_pets, generate_users
+from storage.records import CompactTable
+
+KEYS = {"pets": "id", "users": "username", "orders": "id"}
+
+
+def sources(table, records):
+    def generated():
+        if table == "pets":
+            return generate_pets(records)
+        if table == "users":
+            return generate_users(records, iterations=1_000)
+        return generate_orders(records, records)
+
+    # Serialised before tracing starts, so only what a store keeps of each
+    # record is counted
+    lines = [json.dumps(record) for record in generated()]
+    return {
+        "generated": generated,
+        "from JSON": lambda: map(json.loads, lines),
+    }
+
+
+def stored_size(records, key, pack):
+    gc.collect()
+    tracemalloc.start()
+    store = {record[key]: pack(record) for record in records}
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, size
+
+
+def read_time(store, unpack):
+    keys = list(store)
+    start = time.perf_counter()
+    for key in keys:
+        unpack(store[key])
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'table':<8}{'source':<11}{'dict B':>8}{'compact B':>11}{'saved':>7}"
+        f"{'dict read us':>14}{'compact read us':>17}"
+    )
+    for table, key in KEYS.items():
+        for source, records in sources(table, args.records).items():
+            # Reads copy the stored dict, as callers get a dict either way
+            store, dict_size = stored_size(records(), key, lambda record: record)
+            dict_read = read_time(store, dict)
+            del store
+            compact = CompactTable(table)
+            store, compact_size = stored_size(records(), key, compact.pack)
+            compact_read = read_time(store, compact.unpack)
+            del store
+            dict_size /= args.records
+            compact_size /= args.records
+            saved = 1 - compact_size / dict_size
+            print(
+                f"{table:<8}{source:<11}{dict_size:>8.0f}{compact_size:>11.0f}"
+                f"{saved:>7.0%}{dict_read:>14.2f}{compact_read:>17.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
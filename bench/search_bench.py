@@ -0,0 +1,89 @@
+"""
+Latency of pet and user name search on large catalogs.
+
+Each backend is loaded with data.generate pets and users, then every query
+is run repeatedly for one page of results and its median and p99 latency
+reported. Queries cover common and rare words, short prefixes that match
+many distinct words, several words at once and no match at all.
+
+    python -m bench.search_bench
+    python -m bench.search_bench --records 1000000 --backend memory sqlite
+"""
+
+import argparse
+import gc
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from data.generate import generate_pets, generate_users
+from storage import bulk_load
+from storage.memory import MemoryBackend
+from storage.sqlite import SqliteBackend
+
+PET_QUERIES = ["bella", "b", "luna 42", "whisk 7", "1", "buddy 999", "nomatch"]
+USER_QUERIES = ["ada", "ada.smith1", "ada smith", "k", "quinn okafor", "nomatch"]
+
+
+def load(kind, records, directory):
+    pets = generate_pets(records)
+    users = generate_users(records, iterations=1_000)
+    start = time.perf_counter()
+    with bulk_load():
+        if kind == "memory":
+            backend = MemoryBackend(pets, users)
+        else:
+            path = os.path.join(directory, "search.db")
+            backend = SqliteBackend(path, 4, pets, users)
+    return backend, time.perf_counter() - start
+
+
+def latency(search, query, limit, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        results = search(query, limit=limit)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    p99 = times[min(len(times) - 1, len(times) * 99 // 100)]
+    return len(results), statistics.median(times) * 1e6, p99 * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--backend", nargs="+", default=["memory", "sqlite"])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in args.backend:
+            backend, elapsed = load(kind, args.records, directory)
+            print(
+                f"{kind}: {args.records:,} pets and users loaded and indexed "
+                f"in {elapsed:.1f}s"
+            )
+            print(f"{'query':<20}{'results':>8}{'p50 (us)':>12}{'p99 (us)':>12}")
+            for table, queries in (
+                ("pets", PET_QUERIES),
+                ("users", USER_QUERIES),
+            ):
+                search = getattr(backend, table).search
+                for query in queries:
+                    count, p50, p99 = latency(search, query, args.limit, args.runs)
+                    name = f"{table}: {query}"
+                    print(f"{name:<20}{count:>8}{p50:>12.0f}{p99:>12.0f}")
+            print()
+            if kind == "sqlite":
+                backend.close()
+            del backend
+            gc.unfreeze()
+            gc.collect()
+
+
+if __name__ == "__main__":
+    main()
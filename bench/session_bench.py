@@ -0,0 +1,98 @@
+"""
+Cost of the session table at up to a million live sessions.
+
+Reports per-operation time for create, get and revoke, the memory each live
+session takes, and how long the sweeper needs to expire a whole table. A
+fake clock stands in for time so expiry can be triggered on demand.
+
+    python -m bench.session_bench
+    python -m bench.session_bench --sizes 10000 1000000
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from util.sessions import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fill(size):
+    clock = FakeClock()
+    sessions = SessionStore(ttl=3600, clock=clock, background=False)
+    usernames = [f"user{i}" for i in range(1000)]
+    tokens = []
+    for i in range(size):
+        # Spread expiry over an hour's worth of wheel buckets
+        clock.now = i * 3600 / size
+        tokens.append(sessions.create(usernames[i % 1000]))
+    return clock, sessions, tokens
+
+
+def run(size, ops, seed):
+    rnd = random.Random(seed)
+
+    tracemalloc.start()
+    _, sessions, tokens = fill(size)
+    # The token list belongs to the benchmark, the tokens to the table
+    table_bytes = tracemalloc.get_traced_memory()[0] - sys.getsizeof(tokens)
+    tracemalloc.stop()
+    del sessions, tokens
+
+    start = time.perf_counter()
+    clock, sessions, tokens = fill(size)
+    create_us = (time.perf_counter() - start) / size * 1e6
+
+    picks = [tokens[rnd.randrange(size)] for _ in range(ops)]
+    start = time.perf_counter()
+    for token in picks:
+        sessions.get(token)
+    get_us = (time.perf_counter() - start) / ops * 1e6
+
+    start = time.perf_counter()
+    for token in tokens[:ops]:
+        sessions.revoke(token)
+    revoke_us = (time.perf_counter() - start) / ops * 1e6
+
+    clock.now += 2 * 3600
+    start = time.perf_counter()
+    sessions.sweep()
+    sweep_ms = (time.perf_counter() - start) * 1e3
+    assert len(sessions) == 0
+    return {
+        "create (us)": create_us,
+        "get (us)": get_us,
+        "revoke (us)": revoke_us,
+        "bytes/session": table_bytes / size,
+        "sweep all (ms)": sweep_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--ops", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = {size: run(size, min(args.ops, size), args.seed) for size in args.sizes}
+    metrics = list(next(iter(rows.values())))
+    print(f"{'live sessions':<18}" + "".join(f"{size:>14,}" for size in rows))
+    for metric in metrics:
+        line = "".join(f"{rows[size][metric]:>14.2f}" for size in rows)
+        print(f"{metric:<18}{line}")
+
+
+if __name__ == "__main__":
+    main()
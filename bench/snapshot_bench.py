@@ -0,0 +1,126 @@
+"""
+Seeding the stores from a binary snapshot, up to millions of records.
+
+For each catalog size, writes a snapshot of data.generate records with that
+many pets and a tenth as many users and orders, then reports its size and
+the time to write it, to decode it, and to seed a memory backend from it. The same records
+loaded from a JSON file are timed for comparison. Startup is the wall time
+of a fresh interpreter importing api.app with PET_STORE_SNAPSHOT set,
+against the same import seeded from data/.
+
+    python -m bench.snapshot_bench
+    python -m bench.snapshot_bench --sizes 100000 1000000 2000000 --sqlite
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import storage
+from data.generate import generate
+from storage import bulk_load, create_backend
+from storage.memory import MemoryBackend
+from storage.snapshot import Snapshot, write_snapshot
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def release():
+    gc.unfreeze()
+    gc.collect()
+
+
+def startup(snapshot):
+    env = {**os.environ, "PET_STORE_LOG_MODE": "off"}
+    env.pop("PET_STORE_SNAPSHOT", None)
+    if snapshot:
+        env["PET_STORE_SNAPSHOT"] = snapshot
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import api.app"], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def run(size, directory, sqlite):
+    n_users = n_orders = max(size // 10, 1)
+    path = os.path.join(directory, f"{size}.snap")
+    json_path = os.path.join(directory, f"{size}.json")
+    records = size + n_users + n_orders
+    row = {"records": records}
+
+    def tables():
+        return generate(size, n_users, n_orders, iterations=1_000)
+
+    row["write (s)"], _ = timed(lambda: write_snapshot(path, *tables()))
+    row["size (MB)"] = os.path.getsize(path) / 1e6
+    row["bytes/record"] = os.path.getsize(path) / records
+
+    snapshot = Snapshot(path)
+    row["decode (s)"], _ = timed(
+        lambda: [
+            sum(1 for _ in table)
+            for table in (snapshot.pets(), snapshot.users(), snapshot.orders())
+        ]
+    )
+    row["seed memory (s)"], backend = timed(
+        lambda: create_backend("memory", snapshot=path)
+    )
+    assert backend.pets.count() == size
+    del backend
+    release()
+
+    with open(json_path, "w") as f:
+        json.dump([list(table) for table in tables()], f)
+
+    def from_json():
+        with bulk_load():
+            with open(json_path) as f:
+                return MemoryBackend(*json.load(f))
+
+    row["seed from JSON (s)"], backend = timed(from_json)
+    del backend
+    release()
+    os.remove(json_path)
+
+    if sqlite:
+        storage.SQLITE_PATH = os.path.join(directory, f"{size}.db")
+        row["seed SQLite (s)"], backend = timed(
+            lambda: create_backend("sqlite", snapshot=path)
+        )
+        backend.close()
+        del backend
+        release()
+
+    row["startup (s)"] = startup(path)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--sqlite", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        rows = {size: run(size, directory, args.sqlite) for size in args.sizes}
+    metrics = list(next(iter(rows.values())))
+    print(f"{'pets':<20}" + "".join(f"{size:>14,}" for size in rows))
+    for metric in metrics:
+        values = [rows[size][metric] for size in rows]
+        line = "".join(
+            f"{v:>14,}" if isinstance(v, int) else f"{v:>14.2f}" for v in values
+        )
+        print(f"{metric:<20}{line}")
+    print(f"{'startup, data/ (s)':<20}{startup(None):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Repository-level comparison of the memory and SQLite storage backends.
+
+Each backend is preloaded with the same pets and users, then every operation
+is timed on its own. Logging and HTTP are left out so the numbers show the
+storage cost alone.
+
+    python -m bench.storage_bench
+    python -m bench.storage_bench --size 1000000 --ops 20000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from storage.memory import MemoryBackend
+from storage.sqlite import SqliteBackend
+
+STATUSES = ["available", "pending", "sold"]
+
+
+def make_pet(i):
+    return {
+        "name": f"pet-{i}",
+        "category": {"id": i % 10, "name": f"category-{i % 10}"},
+        "status": STATUSES[i % len(STATUSES)],
+    }
+
+
+def make_user(i):
+    return {
+        "username": f"user{i}",
+        "firstName": "First",
+        "lastName": "Last",
+        "email": f"user{i}@example.com",
+        "password": f"password{i}",
+        "phone": "000-000-0000",
+    }
+
+
+def measure(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(*arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def run(backend, size, ops, seed):
+    rnd = random.Random(seed)
+    start = time.perf_counter()
+    for offset in range(0, size, 10_000):
+        batch = range(offset, min(offset + 10_000, size))
+        backend.pets.insert_many([make_pet(i) for i in batch])
+        backend.users.insert_many([make_user(i) for i in batch])
+    load = time.perf_counter() - start
+
+    pet_ids = [(rnd.randint(1, size),) for _ in range(ops)]
+    usernames = [(f"user{rnd.randrange(size)}",) for _ in range(ops)]
+    results = {
+        "load (s total)": load,
+        "pets.get": measure(backend.pets.get, pet_ids),
+        "pets.find_by_status": measure(
+            lambda cursor: backend.pets.find_by_status("sold", 100, cursor), pet_ids
+        ),
+        "pets.find_by_statuses": measure(
+            lambda cursor: backend.pets.find_by_statuses(
+                STATUSES, limit=100, cursor=cursor
+            ),
+            pet_ids,
+        ),
+        "  by name, descending": measure(
+            lambda pet_id: backend.pets.find_by_statuses(
+                STATUSES, "name", True, 100, (f"pet-{pet_id}", pet_id)
+            ),
+            pet_ids,
+        ),
+        "pets.find_by_category": measure(
+            lambda cursor: backend.pets.find_by_category(3, limit=100, cursor=cursor),
+            pet_ids,
+        ),
+        "  with status": measure(
+            lambda cursor: backend.pets.find_by_category(
+                3, status="sold", limit=100, cursor=cursor
+            ),
+            pet_ids,
+        ),
+        "pets.update": measure(
+            lambda pet_id: backend.pets.update(pet_id, status=rnd.choice(STATUSES)),
+            pet_ids,
+        ),
+        "pets.insert": measure(
+            backend.pets.insert, [(make_pet(i),) for i in range(ops)]
+        ),
+        "pets.count_by_status": measure(backend.pets.count_by_status, [()] * ops),
+        "users.get": measure(backend.users.get, usernames),
+        "orders.insert": measure(
+            backend.orders.insert, [({"pet_id": i, "quantity": 1},) for i in range(ops)]
+        ),
+        "orders.get": measure(backend.orders.get, [(i,) for i in range(1, ops + 1)]),
+    }
+    new_ids = [(pet_id,) for pet_id in range(size + 1, size + ops + 1)]
+    results["pets.delete"] = measure(backend.pets.delete, new_ids)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_backend = SqliteBackend(os.path.join(tmp, "bench.db"))
+        rows = {
+            "memory": run(MemoryBackend(), args.size, args.ops, args.seed),
+            "sqlite": run(sqlite_backend, args.size, args.ops, args.seed),
+        }
+        sqlite_backend.close()
+
+    print(f"{'operation (us/op)':<24}" + "".join(f"{name:>12}" for name in rows))
+    for operation in rows["memory"]:
+        line = "".join(f"{rows[name][operation]:>12.2f}" for name in rows)
+        print(f"{operation:<24}{line}")
+
+
+if __name__ == "__main__":
+    main()
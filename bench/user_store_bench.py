@@ -0,0 +1,79 @@
+"""
+Micro-benchmark for UserStore bulk creation and login lookups.
+
+Per-record cost of create_users and login_user should not depend on how many
+users the store already holds.
+
+    python -m bench.user_store_bench
+    python -m bench.user_store_bench --sizes 1000 100000 --ops 20000
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from api.user_api import NewUser, UserStore
+from storage.memory import MemoryUserRepository
+from util.passwords import PasswordHasher
+
+
+def make_users(start, n):
+    return [
+        NewUser(
+            username=f"user{i}",
+            firstName="First",
+            lastName="Last",
+            email=f"user{i}@example.com",
+            password=f"password{i}",
+            phone="000-000-0000",
+        )
+        for i in range(start, start + n)
+    ]
+
+
+def run(size, ops, seed):
+    rnd = random.Random(seed)
+    # Store overhead only; bench.login_bench measures password hashing
+    store = UserStore(
+        MemoryUserRepository(), hasher=PasswordHasher(iterations=1, workers=0)
+    )
+    batch = make_users(0, size)
+    start = time.perf_counter()
+    store.create_users(batch)
+    create_us = (time.perf_counter() - start) / size * 1e6
+
+    picks = [rnd.randrange(size) for _ in range(ops)]
+    start = time.perf_counter()
+    for i in picks:
+        store.login_user(f"user{i}", f"password{i}")
+    login_us = (time.perf_counter() - start) / ops * 1e6
+
+    start = time.perf_counter()
+    for i in range(ops):
+        store.delete_user(f"user{i}")
+    delete_us = (time.perf_counter() - start) / ops * 1e6
+    return {"create_users": create_us, "login_user": login_us, "delete_user": delete_us}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--ops", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    rows = {size: run(size, min(args.ops, size), args.seed) for size in args.sizes}
+
+    operations = list(next(iter(rows.values())))
+    print(f"{'operation (us/record)':<24}" + "".join(f"{size:>12,}" for size in rows))
+    for operation in operations:
+        line = "".join(f"{rows[size][operation]:>12.2f}" for size in rows)
+        print(f"{operation:<24}{line}")
+
+
+if __name__ == "__main__":
+    main()
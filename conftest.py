@@ -1,14 +1,13 @@
 import os
 import random
-import threading
-import time
 
-import httpx
 import pytest
-from uvicorn import run
 
 from api.app import app
+from api.pets_api import pet_store
+from api.user_api import user_store
 from util.logging_config import logger
+from util.server import start_server_thread
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -18,39 +17,12 @@ def start_server():
     """
     server_port = random.randint(10000, 60000)
     os.environ["PET_STORE_PORT"] = str(server_port)
+    # Cross-check inventory counters against a full recount on every read
+    pet_store.check_inventory = True
+    # Cheap password hashes keep the bulk user tests fast
+    user_store.hasher.iterations = 1_000
 
-    def run_server():
-        logger.info("Starting server", server_port=server_port)
-        try:
-            run(
-                app,
-                host="127.0.0.1",
-                port=server_port,
-                log_level="info",
-                loop="asyncio",
-            )
-        except Exception as e:
-            logger.error("Failed to start server", error=str(e))
-            raise
-
-    server_thread = threading.Thread(target=run_server, daemon=True)
-    server_thread.start()
-    logger.info("Server thread started", port=server_port)
-
-    # Wait for server to be ready
-    server_url = f"http://127.0.0.1:{server_port}/docs"
-    for _ in range(10):
-        try:
-            response = httpx.get(server_url, timeout=1.0)
-            if response.status_code == 200:
-                logger.info("Server is up and running", url=server_url)
-                break
-        except httpx.RequestError:
-            logger.warning("Attempt to connect to server failed", attempt=_ + 1)
-            time.sleep(0.5)
-    else:
-        logger.error("Server didn't start", url=server_url)
-        raise RuntimeError("Mock server failed to start")
+    start_server_thread(app, server_port)
 
     yield
 
@@ -0,0 +1,210 @@
+"""
+Deterministic synthetic pets, users and orders for load tests.
+
+Every table is drawn from its own random.Random seeded with the seed and
+the table name, so a seed always gives the same records, and changing the
+size of one table leaves the others unchanged. Records are generated one at
+a time and written as they are made, so memory use does not grow with the
+dataset.
+
+Pets get Zipf-distributed categories and statuses drawn by STATUS_WEIGHTS.
+Orders reference pets that exist in the generated catalog. All users share
+one password, "password" unless --password is given, hashed once with a
+seeded salt so the hash is reproducible too.
+
+    python -m data.generate --pets 1000000 --format snapshot -o big.snap
+    python -m data.generate --pets 1000 --users 100 --orders 500 -o out/
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+CATEGORY_NAMES = [
+    "Dogs",
+    "Cats",
+    "Fish",
+    "Birds",
+    "Rabbits",
+    "Hamsters",
+    "Reptiles",
+    "Guinea Pigs",
+    "Ferrets",
+    "Turtles",
+    "Lizards",
+    "Snakes",
+    "Frogs",
+    "Horses",
+    "Chinchillas",
+    "Hedgehogs",
+]
+# Shared by every pet in the category, as the API never changes them in place
+CATEGORIES = [{"id": i, "name": name} for i, name in enumerate(CATEGORY_NAMES, 1)]
+# Category k is picked with weight 1 / k
+CATEGORY_WEIGHTS = [1 / k for k in range(1, len(CATEGORIES) + 1)]
+STATUS_WEIGHTS = {"available": 0.6, "pending": 0.25, "sold": 0.15}
+ORDER_STATUS_WEIGHTS = {"placed": 0.3, "approved": 0.3, "delivered": 0.4}
+
+PET_NAMES = [
+    "Buddy", "Max", "Bella", "Luna", "Charlie", "Lucy", "Cooper", "Daisy",
+    "Milo", "Bailey", "Rocky", "Molly", "Bear", "Sadie", "Tucker", "Lola",
+    "Oliver", "Zoe", "Leo", "Nala", "Whiskers", "Shadow", "Pepper", "Ginger",
+    "Simba", "Coco", "Oscar", "Rosie", "Jasper", "Willow", "Harvey", "Maple",
+]  # fmt: skip
+FIRST_NAMES = [
+    "Ada", "Ben", "Cleo", "Dan", "Eva", "Finn", "Gia", "Hugo", "Iris",
+    "Jack", "Kira", "Liam", "Maya", "Noah", "Olga", "Paul", "Quinn", "Rosa",
+    "Sam", "Tara", "Umar", "Vera", "Will", "Xena", "Yuri", "Zara",
+]  # fmt: skip
+LAST_NAMES = [
+    "Smith", "Jones", "Garcia", "Chen", "Khan", "Novak", "Silva", "Muller",
+    "Rossi", "Kim", "Sato", "Ivanov", "Dubois", "Larsen", "Okafor", "Walsh",
+]  # fmt: skip
+# Ship dates fall within a year of this date
+BASE_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def table_random(seed, table):
+    # String seeds are hashed with SHA-512, the same on every platform
+    return random.Random(f"{seed}:{table}")
+
+
+def weighted_picker(rnd, values, weights):
+    """A function returning one of values per call, drawn by the weights."""
+    cumulative = list(accumulate(weights))
+    total = cumulative[-1]
+    draw = rnd.random
+    return lambda: values[bisect(cumulative, draw() * total)]
+
+
+def generate_pets(n, seed=0):
+    rnd = table_random(seed, "pets")
+    category = weighted_picker(rnd, CATEGORIES, CATEGORY_WEIGHTS)
+    status = weighted_picker(rnd, list(STATUS_WEIGHTS), STATUS_WEIGHTS.values())
+    for pet_id in range(1, n + 1):
+        yield {
+            "id": pet_id,
+            "name": f"{rnd.choice(PET_NAMES)} {rnd.randrange(1000)}",
+            "category": category(),
+            "status": status(),
+        }
+
+
+def generate_users(n, seed=0, password="password", iterations=None):
+    from util.passwords import PASSWORD_ITERATIONS, hash_password
+
+    rnd = table_random(seed, "users")
+    password_hash = hash_password(
+        password, iterations or PASSWORD_ITERATIONS, salt=rnd.randbytes(16)
+    )
+    for user_id in range(1, n + 1):
+        first = rnd.choice(FIRST_NAMES)
+        last = rnd.choice(LAST_NAMES)
+        # The ID keeps usernames unique
+        username = f"{first}.{last}{user_id}".lower()
+        yield {
+            "id": user_id,
+            "username": username,
+            "firstName": first,
+            "lastName": last,
+            "email": f"{username}@example.com",
+            "password": password_hash,
+            "phone": f"{rnd.randrange(200, 1000)}-{rnd.randrange(10**7):07d}",
+            "userStatus": 1 if rnd.random() < 0.1 else 0,
+        }
+
+
+def generate_orders(n, n_pets, seed=0):
+    if n and not n_pets:
+        raise ValueError("Orders need at least one pet to reference")
+    rnd = table_random(seed, "orders")
+    status = weighted_picker(
+        rnd, list(ORDER_STATUS_WEIGHTS), ORDER_STATUS_WEIGHTS.values()
+    )
+    for order_id in range(1, n + 1):
+        order_status = status()
+        ship_date = BASE_DATE + timedelta(seconds=rnd.randrange(365 * 24 * 3600))
+        yield {
+            "id": order_id,
+            "pet_id": rnd.randint(1, n_pets),
+            "quantity": rnd.randint(1, 5),
+            "shipDate": ship_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "status": order_status,
+            "complete": order_status == "delivered",
+        }
+
+
+def generate(pets, users, orders, seed=0, password="password", iterations=None):
+    """The three tables as generators, in the order a backend takes them."""
+    return (
+        generate_pets(pets, seed),
+        generate_users(users, seed, password, iterations),
+        generate_orders(orders, pets, seed),
+    )
+
+
+def write_jsonl(directory, tables):
+    """Write each table to <directory>/<table>.jsonl, one record per line."""
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for name, records in zip(("pets", "users", "orders"), tables):
+        count = 0
+        with open(os.path.join(directory, f"{name}.jsonl"), "w") as f:
+            for record in records:
+                f.write(json.dumps(record))
+                f.write("\n")
+                count += 1
+        counts[name] = count
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pets", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["jsonl", "snapshot"], default="jsonl")
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Directory for jsonl, file for a snapshot (see storage/snapshot.py)",
+    )
+    parser.add_argument("--password", default="password")
+    parser.add_argument(
+        "--password-iterations",
+        type=int,
+        help="PBKDF2 cost of the shared password hash, "
+        "PET_STORE_PASSWORD_ITERATIONS by default",
+    )
+    args = parser.parse_args()
+
+    tables = generate(
+        args.pets,
+        args.users,
+        args.orders,
+        args.seed,
+        args.password,
+        args.password_iterations,
+    )
+    start = time.perf_counter()
+    if args.format == "jsonl":
+        counts = write_jsonl(args.output, tables)
+    else:
+        from storage.snapshot import write_snapshot
+
+        counts = write_snapshot(args.output, *tables)
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{count} {table}" for table, count in counts.items())
+    print(f"Wrote {summary} to {args.output} in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
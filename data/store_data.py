@@ -18,5 +18,3 @@ orders = [
         "complete": False,
     },
 ]
-
-order_id_counter = len(orders) + 1
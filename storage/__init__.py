@@ -0,0 +1,97 @@
+import gc
+import os
+from contextlib import contextmanager
+
+from data.pets_data import pets as init_pets
+from data.store_data import orders as init_orders
+from data.user_data import users as init_users
+from storage.base import Backend, DuplicateKeyError
+from storage.journal import JournaledMemoryBackend
+from storage.memory import MemoryBackend
+from storage.snapshot import Snapshot
+from storage.sqlite import SqliteBackend
+from util.passwords import hash_password
+
+# Storage backend: "memory" (default) or "sqlite"
+STORAGE_BACKEND = os.environ.get("PET_STORE_BACKEND", "memory")
+SQLITE_PATH = os.environ.get("PET_STORE_SQLITE_PATH", "pet_store.db")
+SQLITE_POOL_SIZE = int(os.environ.get("PET_STORE_SQLITE_POOL_SIZE", "4"))
+# Snapshot file to seed a new backend from instead of data/
+SNAPSHOT_PATH = os.environ.get("PET_STORE_SNAPSHOT")
+# Directory to journal memory backend writes to and recover them from
+JOURNAL_DIR = os.environ.get("PET_STORE_JOURNAL_DIR")
+
+
+@contextmanager
+def bulk_load():
+    """
+    Pause the garbage collector while seeding millions of records.
+
+    Every few hundred new dicts would otherwise set off a collection that
+    walks the records loaded so far, roughly doubling load time. The loaded
+    records are then frozen out of later full collections as well.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+        gc.freeze()
+
+
+def create_backend(
+    kind=STORAGE_BACKEND, snapshot=SNAPSHOT_PATH, journal=JOURNAL_DIR
+) -> Backend:
+    """
+    Build a backend of the given kind. A new one is seeded from the snapshot
+    file if given, else from data/. A memory backend with a journal
+    directory is instead restored from it, once it has been seeded there.
+    """
+    if journal:
+        if kind != "memory":
+            raise ValueError("The journal is only for the memory backend")
+        with bulk_load():
+            return JournaledMemoryBackend(journal, lambda: _seed(snapshot))
+    if snapshot:
+        with bulk_load():
+            return _build(kind, *_seed(snapshot))
+    return _build(kind, *_seed(snapshot))
+
+
+def _seed(snapshot):
+    if snapshot:
+        # Streamed, so a large snapshot is never all in memory twice
+        seed = Snapshot(snapshot)
+        return seed.pets(), seed.users(), seed.orders()
+    # Seed passwords are plaintext in data/; stores only ever hold hashes
+    users = [
+        {**user, "password": hash_password(user["password"])} for user in init_users
+    ]
+    return init_pets, users, init_orders
+
+
+def _build(kind, pets, users, orders):
+    if kind == "memory":
+        return MemoryBackend(pets, users, orders)
+    if kind == "sqlite":
+        return SqliteBackend(SQLITE_PATH, SQLITE_POOL_SIZE, pets, users, orders)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+_backend = None
+
+
+def get_backend() -> Backend:
+    """
+    The backend of this process, created on first use, so that processes
+    using another process's stores never load one.
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+__all__ = ["Backend", "DuplicateKeyError", "create_backend", "get_backend"]
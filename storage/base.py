@@ -0,0 +1,179 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+# Orders pets can be listed in by find_by_statuses()
+PET_SORTS = ("id", "name")
+
+
+class DuplicateKeyError(Exception):
+    """Raised when a write would break a unique key, such as a username."""
+
+
+def pet_sort_key(pet: Dict, sort: str):
+    """
+    The pet's position in the given order, as find_by_statuses() takes it
+    for a cursor. Names repeat, so they are ordered by ID after the name.
+    """
+    return pet["id"] if sort == "id" else (pet["name"], pet["id"])
+
+
+class PetRepository(ABC):
+    """Pet records keyed by ID with status and category indexes."""
+
+    @abstractmethod
+    def get(self, pet_id: int) -> Optional[Dict]:
+        """The pet with this ID, or None."""
+
+    @abstractmethod
+    def insert(self, pet_data: Dict) -> Dict:
+        """Store a new pet under the next free ID and return it."""
+
+    @abstractmethod
+    def update(self, pet_id: int, name=None, status=None) -> Optional[Dict]:
+        """Change the given fields and return the pet, or None if missing."""
+
+    @abstractmethod
+    def delete(self, pet_id: int) -> bool:
+        """Remove the pet. False if it did not exist."""
+
+    @abstractmethod
+    def insert_many(self, pets_data: List[Dict]) -> List[Dict]:
+        """Insert all pets in one transaction."""
+
+    @abstractmethod
+    def update_many(self, updates: List[Dict]) -> List[Optional[Dict]]:
+        """Apply {"id", "name", "status"} updates in one transaction."""
+
+    @abstractmethod
+    def delete_many(self, pet_ids: List[int]) -> List[bool]:
+        """Delete all IDs in one transaction."""
+
+    @abstractmethod
+    def find_by_status(self, status: str, limit=None, cursor=None) -> List[Dict]:
+        """Pets with the status in ID order, starting after the cursor ID."""
+
+    @abstractmethod
+    def find_by_statuses(
+        self, statuses: List[str], sort="id", descending=False, limit=None, cursor=None
+    ) -> List[Dict]:
+        """
+        Pets with any of the statuses, ordered by one of PET_SORTS, starting
+        after the cursor, a pet_sort_key() in that order.
+        """
+
+    @abstractmethod
+    def find_by_category(
+        self, category_id=None, category_name=None, status=None, limit=None, cursor=None
+    ) -> List[Dict]:
+        """
+        Pets whose category has the given ID and name, and with the status,
+        leaving out any that is None, in ID order, starting after the cursor
+        ID. At least one of the category ID and name must be given.
+        """
+
+    @abstractmethod
+    def search(self, query: str, limit=None, cursor=None) -> List[Dict]:
+        """
+        Pets whose name has a word starting with each word of the query,
+        ignoring case, in ID order, starting after the cursor ID.
+        """
+
+    @abstractmethod
+    def has_status(self, status: str) -> bool:
+        """Whether any pet currently has the status."""
+
+    @abstractmethod
+    def has_category(self, category_id=None, category_name=None) -> bool:
+        """Whether any pet has a category with the given ID, and any the name."""
+
+    @abstractmethod
+    def count_by_status(self) -> Dict[str, int]:
+        """Maintained per-status counts."""
+
+    @abstractmethod
+    def recount_by_status(self) -> Dict[str, int]:
+        """Per-status counts computed from the records themselves."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of pets stored."""
+
+
+class UserRepository(ABC):
+    """User records keyed by username."""
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[Dict]:
+        """The user with this username, or None."""
+
+    @abstractmethod
+    def insert(self, user_data: Dict) -> Dict:
+        """
+        Store a new user under the next free ID and return it.
+
+        Raises DuplicateKeyError if the username is taken.
+        """
+
+    @abstractmethod
+    def insert_many(self, users_data: List[Dict]) -> List[Dict]:
+        """
+        Insert all users in one transaction.
+
+        Raises DuplicateKeyError, without storing anything, if a username is
+        taken or repeated.
+        """
+
+    @abstractmethod
+    def update(self, username: str, user_data: Dict) -> Optional[Dict]:
+        """
+        Merge user_data into the user and return it, or None if missing.
+
+        Raises DuplicateKeyError if it renames the user to a taken username.
+        """
+
+    @abstractmethod
+    def delete(self, username: str) -> bool:
+        """Remove the user. False if it did not exist."""
+
+    @abstractmethod
+    def search(self, query: str, limit=None, cursor=None) -> List[Dict]:
+        """
+        Users whose username starts with the query, or whose first and last
+        names have a word starting with each word of it, ignoring case, in
+        username order, starting after the cursor username.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of users stored."""
+
+
+class OrderRepository(ABC):
+    """Order records keyed by ID."""
+
+    @abstractmethod
+    def get(self, order_id: int) -> Optional[Dict]:
+        """The order with this ID, or None."""
+
+    @abstractmethod
+    def insert(self, order: Dict) -> Dict:
+        """Store a new order under the next free ID and return it."""
+
+    @abstractmethod
+    def delete(self, order_id: int) -> bool:
+        """Remove the order. False if it did not exist."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of orders stored."""
+
+
+class Backend:
+    """The three repositories the API works with."""
+
+    def __init__(
+        self, pets: PetRepository, users: UserRepository, orders: OrderRepository
+    ):
+        self.pets = pets
+        self.users = users
+        self.orders = orders
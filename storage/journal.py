@@ -0,0 +1,500 @@
+"""
+Write-ahead journal and periodic snapshots for the memory backend.
+
+Every write to a JournaledMemoryBackend appends the records it stored or
+deleted to a journal file, and restarting with the same directory restores
+the stores from the latest snapshot plus the journal written since.
+
+The directory holds:
+
+- snapshot-K.snap: every record as of the start of journal segment K, in
+  the storage/snapshot.py format.
+- journal-K.log, journal-K+1.log, ...: the writes since, as frames of
+  length (u32), CRC32 (u32) and a JSON list of [table, "put", record] or
+  [table, "del", key] entries. A frame holds the whole writes flushed
+  together, so a batch is replayed whole or not at all.
+
+Writers hand entries to a background flusher and only wait for them under
+the "always" fsync policy, when a write returns once its frame is on disk.
+Writers that arrive while the flusher is busy syncing go out together in
+its next write and fsync (group commit), so fsyncs per second stay bounded
+by the disk, not the request rate. PET_STORE_JOURNAL_FSYNC picks:
+
+- always: durable before the write returns.
+- interval (default): written and fsynced every
+  PET_STORE_JOURNAL_FSYNC_INTERVAL seconds. A crash loses at most that long.
+- off: written every interval and left to the OS to flush. A process crash
+  loses at most the last interval, a machine crash more.
+
+After PET_STORE_JOURNAL_SNAPSHOT_EVERY entries, a background checkpoint
+starts a new segment, writes a snapshot of the records as of that point
+and deletes the older snapshot and segments. Records are never changed
+once stored, so the snapshot is written from a copy of the record lists
+taken in the brief moment all three stores are locked.
+
+A frame cut short or failing its CRC, as left by a crash in the middle of
+a write, ends its segment: recovery cuts it and anything after it off the
+file and logs a warning. New writes go to a new segment.
+"""
+
+import atexit
+import fcntl
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from itertools import count
+
+from storage.memory import MemoryBackend
+from storage.snapshot import Snapshot, fsync_directory, write_snapshot
+from util.logging_config import logger
+
+FSYNC_POLICIES = ("always", "interval", "off")
+# When the journal is fsynced, one of FSYNC_POLICIES
+JOURNAL_FSYNC = os.environ.get("PET_STORE_JOURNAL_FSYNC", "interval")
+# Seconds between background writes under "interval" and "off"
+JOURNAL_FSYNC_INTERVAL = float(
+    os.environ.get("PET_STORE_JOURNAL_FSYNC_INTERVAL", "0.1")
+)
+# Journal entries between snapshots
+JOURNAL_SNAPSHOT_EVERY = int(
+    os.environ.get("PET_STORE_JOURNAL_SNAPSHOT_EVERY", "100000")
+)
+
+FRAME = struct.Struct("<II")
+# Tables in storage order, each with how its records are keyed
+KEYS = {"pets": "id", "users": "username", "orders": "id"}
+# The ID counter of each table's repository
+ID_COUNTERS = {"pets": "pet_ids", "users": "user_ids", "orders": "order_ids"}
+
+
+class JournalError(Exception):
+    """Raised by writes once the journal has failed to write or sync."""
+
+
+def segment_path(directory, segment):
+    return os.path.join(directory, f"journal-{segment:06d}.log")
+
+
+def snapshot_path(directory, segment):
+    return os.path.join(directory, f"snapshot-{segment:06d}.snap")
+
+
+def numbered(directory, prefix, suffix):
+    """Sorted numbers of the files in directory named prefix-N.suffix."""
+    numbers = []
+    for name in os.listdir(directory):
+        number = name[len(prefix) + 1 : -len(suffix) - 1]
+        if name == f"{prefix}-{number}.{suffix}" and number.isdigit():
+            numbers.append(int(number))
+    return sorted(numbers)
+
+
+# json.dumps with options builds a new encoder per call
+ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def encode_frame(entries):
+    payload = ENCODER.encode(entries).encode()
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(path):
+    """
+    The entry lists of the frames in a segment, truncating the file at the
+    first frame cut short or corrupted.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    frames = []
+    offset = 0
+    while offset < len(data):
+        header = data[offset : offset + FRAME.size]
+        if len(header) < FRAME.size:
+            break
+        length, crc = FRAME.unpack(header)
+        payload = data[offset + FRAME.size : offset + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        frames.append(json.loads(payload))
+        offset += FRAME.size + length
+    else:
+        return frames
+    logger.warning(
+        "Journal ends in a torn frame, cutting it off",
+        path=path,
+        offset=offset,
+        dropped_bytes=len(data) - offset,
+    )
+    with open(path, "r+b") as f:
+        f.truncate(offset)
+        os.fsync(f.fileno())
+    return frames
+
+
+class Rotate:
+    """Queued in place of entries to start a new segment."""
+
+    def __init__(self, segment, first_entries):
+        self.segment = segment
+        self.first_entries = first_entries
+
+
+class Journal:
+    """
+    Appends write entries to the current segment from a flusher thread.
+
+    append() only queues entries; the flusher encodes everything queued
+    since its last pass as one frame, writes it, then fsyncs as the policy
+    says.
+    Once writing fails, every later check(), append() and wait() raises
+    JournalError.
+    """
+
+    def __init__(
+        self,
+        directory,
+        segment,
+        fsync=JOURNAL_FSYNC,
+        interval=JOURNAL_FSYNC_INTERVAL,
+        snapshot_every=JOURNAL_SNAPSHOT_EVERY,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown journal fsync policy: {fsync}")
+        self.directory = directory
+        self.segment = segment
+        self.fsync = fsync
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.condition = threading.Condition()
+        self.pending = []
+        # Sequence numbers of the last append and of the last one written
+        # out under the policy
+        self.appended = 0
+        self.flushed = 0
+        self.entries = 0
+        # Set once snapshot_every entries are in the current segment
+        self.full = threading.Event()
+        # Threads blocked in sync(), which the flusher does not keep waiting
+        self.syncing = 0
+        self.error = None
+        self.closing = False
+        self.writes = 0
+        self.syncs = 0
+        self.file = self._open(segment, [])
+        self.thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.thread.start()
+
+    def _open(self, segment, first_entries):
+        f = open(segment_path(self.directory, segment), "ab")
+        if first_entries:
+            f.write(encode_frame(list(first_entries)))
+        f.flush()
+        os.fsync(f.fileno())
+        fsync_directory(self.directory)
+        return f
+
+    def append(self, entries):
+        """Queue one write's entries and return its sequence number."""
+        with self.condition:
+            self.check()
+            self.pending.append(entries)
+            self.appended += 1
+            self.entries += len(entries)
+            if self.entries >= self.snapshot_every:
+                self.full.set()
+            if self.fsync == "always":
+                self.condition.notify_all()
+            return self.appended
+
+    def wait(self, seq):
+        """Under the "always" policy, block until seq is on disk."""
+        if self.fsync != "always":
+            return
+        self.sync(seq)
+
+    def sync(self, seq):
+        """Block until everything up to seq is written out by the policy."""
+        with self.condition:
+            self.syncing += 1
+            self.condition.notify_all()
+            try:
+                while self.flushed < seq:
+                    self.check()
+                    self.condition.wait()
+                self.check()
+            finally:
+                self.syncing -= 1
+
+    def rotate(self, first_entries):
+        """
+        Start a new segment after everything appended so far, with
+        first_entries as its first frame. Returns the new segment number and
+        a sequence number to sync() on before relying on it.
+        """
+        with self.condition:
+            self.check()
+            self.segment += 1
+            self.pending.append(Rotate(self.segment, first_entries))
+            self.appended += 1
+            self.entries = 0
+            self.full.clear()
+            self.condition.notify_all()
+            return self.segment, self.appended
+
+    def close(self):
+        """Write out and fsync everything appended, then stop the flusher."""
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+        if self.error is None:
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+    def check(self):
+        """Raise JournalError if writing has failed."""
+        if self.error is not None:
+            raise JournalError("The journal failed to write") from self.error
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self._wait_for_batch()
+                batch, self.pending = self.pending, []
+                seq = self.appended
+                closing = self.closing
+            try:
+                self._write(batch, sync=self.fsync != "off")
+            except Exception as e:
+                logger.error("Journal write failed", error=str(e))
+                with self.condition:
+                    self.error = e
+                    self.condition.notify_all()
+                return
+            with self.condition:
+                self.flushed = seq
+                self.condition.notify_all()
+            if closing and not batch:
+                return
+
+    def _wait_for_batch(self):
+        if self.fsync == "always":
+            # Writers wake the flusher, and whatever they queue while it
+            # syncs goes out in the next batch
+            while not self.pending and not self.closing:
+                self.condition.wait()
+            return
+        # Otherwise it batches whatever arrives within the interval
+        deadline = time.monotonic() + self.interval
+        while not self.closing and not self.syncing:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.condition.wait(remaining)
+
+    def _write(self, batch, sync):
+        if not batch:
+            return
+        entries = []
+        for item in batch:
+            if isinstance(item, Rotate):
+                self._flush(entries, sync=True)
+                entries = []
+                self.file.close()
+                self.file = self._open(item.segment, item.first_entries)
+            else:
+                entries.extend(item)
+        self._flush(entries, sync)
+
+    def _flush(self, entries, sync):
+        if not entries:
+            return
+        self.file.write(encode_frame(entries))
+        self.file.flush()
+        self.writes += 1
+        if sync:
+            os.fsync(self.file.fileno())
+            self.syncs += 1
+
+
+def recover(directory):
+    """
+    Load the latest snapshot in directory and replay the journal after it.
+
+    Returns the records of each table, at least the next ID of each table,
+    and the segment new writes should go to, or None if the directory holds
+    no snapshot.
+    """
+    snapshots = numbered(directory, "snapshot", "snap")
+    if not snapshots:
+        return None
+    start = snapshots[-1]
+    snapshot = Snapshot(snapshot_path(directory, start))
+    tables = {
+        table: {record[key]: record for record in snapshot.records(table)}
+        for table, key in KEYS.items()
+    }
+    # IDs of records since deleted are never handed out again
+    next_ids = dict.fromkeys(KEYS, 1)
+    segments = [n for n in numbered(directory, "journal", "log") if n >= start]
+    replayed = 0
+    for segment in segments:
+        for entries in read_frames(segment_path(directory, segment)):
+            for table, op, value in entries:
+                if table == "meta":
+                    for name, next_id in value.items():
+                        next_ids[name] = max(next_ids[name], next_id)
+                elif op == "put":
+                    tables[table][value[KEYS[table]]] = value
+                    next_ids[table] = max(next_ids[table], value["id"] + 1)
+                else:
+                    tables[table].pop(value, None)
+            replayed += len(entries)
+    logger.info(
+        "Recovered from journal",
+        directory=directory,
+        snapshot=start,
+        segments=len(segments),
+        entries=replayed,
+    )
+    return tables, next_ids, max([start, *segments]) + 1
+
+
+class JournaledMemoryBackend(MemoryBackend):
+    """
+    A MemoryBackend that journals its writes to directory and is restored
+    from it when created again.
+
+    A new directory is seeded from seed(), a function returning the pets,
+    users and orders as MemoryBackend takes them, and snapshotted right
+    away. Only one process can use a directory at a time.
+    """
+
+    def __init__(
+        self,
+        directory,
+        seed,
+        fsync=JOURNAL_FSYNC,
+        interval=JOURNAL_FSYNC_INTERVAL,
+        snapshot_every=JOURNAL_SNAPSHOT_EVERY,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.lock_file = open(os.path.join(directory, "lock"), "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            raise JournalError(f"{directory} is in use by another process")
+
+        recovered = recover(directory)
+        if recovered is None:
+            tables, next_ids, segment = None, {}, 0
+        else:
+            tables, next_ids, segment = recovered
+        journal = Journal(directory, segment, fsync, interval, snapshot_every)
+        # Serialises checkpoints, which delete what earlier ones wrote
+        self.checkpointing = threading.Lock()
+        if tables is None:
+            super().__init__(*seed(), journal=journal)
+        else:
+            super().__init__(*(t.values() for t in tables.values()), journal=journal)
+            del tables
+        for table, next_id in next_ids.items():
+            repository = getattr(self, table)
+            counter = ID_COUNTERS[table]
+            setattr(
+                repository,
+                counter,
+                count(max(next(getattr(repository, counter)), next_id)),
+            )
+        self.journal = journal
+        # IDs handed out and then deleted are not in any record, so each
+        # segment starts by recording the counters
+        journal.append([("meta", "ids", self.next_ids())])
+        if recovered is None:
+            self.checkpoint()
+
+        self.closed = False
+        self.checkpointer = threading.Thread(
+            target=self._checkpoint_when_full, name="checkpoint", daemon=True
+        )
+        self.checkpointer.start()
+        atexit.register(self.close)
+
+    def next_ids(self):
+        """The ID each table would hand out next, without using it up."""
+        ids = {}
+        for table, counter in ID_COUNTERS.items():
+            repository = getattr(self, table)
+            ids[table] = next_id = next(getattr(repository, counter))
+            setattr(repository, counter, count(next_id))
+        return ids
+
+    def checkpoint(self):
+        """
+        Snapshot every record, then delete the journal and snapshots the new
+        snapshot replaces. Returns the snapshot's path.
+        """
+        with self.checkpointing:
+            return self._checkpoint()
+
+    def _checkpoint(self):
+        start = time.perf_counter()
+        with self.pets.lock, self.users.lock, self.orders.lock:
+            segment, seq = self.journal.rotate([("meta", "ids", self.next_ids())])
+            pets = list(self.pets.pets.values())
+            users = list(self.users.users.values())
+            orders = list(self.orders.orders.values())
+        # The new segment must exist before the old ones can go
+        self.journal.sync(seq)
+        path = snapshot_path(self.directory, segment)
+        write_snapshot(
+            path,
+            map(self.pets.table.unpack, pets),
+            map(self.users.table.unpack, users),
+            map(self.orders.table.unpack, orders),
+            durable=True,
+        )
+        for old in numbered(self.directory, "snapshot", "snap"):
+            if old < segment:
+                os.remove(snapshot_path(self.directory, old))
+        for old in numbered(self.directory, "journal", "log"):
+            if old < segment:
+                os.remove(segment_path(self.directory, old))
+        logger.info(
+            "Journal checkpointed",
+            snapshot=path,
+            records=len(pets) + len(users) + len(orders),
+            elapsed_ms=round((time.perf_counter() - start) * 1e3, 2),
+        )
+        return path
+
+    def _checkpoint_when_full(self):
+        while True:
+            self.journal.full.wait()
+            with self.checkpointing:
+                if self.closed:
+                    return
+                try:
+                    self._checkpoint()
+                except Exception as e:
+                    # The journal still has every write; retry at the next one
+                    logger.error("Journal checkpoint failed", error=str(e))
+                    self.journal.full.clear()
+
+    def close(self):
+        """Write out the journal and release the directory."""
+        # Once no checkpoint is running, none can clear full again
+        with self.checkpointing:
+            if self.closed:
+                return
+            self.closed = True
+            self.journal.full.set()
+        self.checkpointer.join()
+        self.journal.close()
+        self.lock_file.close()
+        atexit.unregister(self.close)
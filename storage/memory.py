@@ -0,0 +1,595 @@
+import heapq
+import os
+import threading
+from contextlib import nullcontext
+from itertools import count, takewhile
+
+from storage.base import (
+    PET_SORTS,
+    Backend,
+    DuplicateKeyError,
+    OrderRepository,
+    PetRepository,
+    UserRepository,
+)
+from storage.records import CompactTable, PlainTable
+from util.sorted_list import SortedList, intersect, unique
+from util.text_index import PrefixIndex, matches, words
+
+EMPTY = SortedList()
+# Whether records are stored packed (see storage/records.py), which takes
+# much less memory, or as the dicts themselves, which makes reads cheaper
+COMPACT_RECORDS = os.environ.get("PET_STORE_COMPACT_RECORDS", "1") == "1"
+
+
+def _check(journal):
+    """
+    Raise if the journal, if any, has failed. Writers check before changing
+    anything, so a write the journal cannot take is never published.
+    """
+    if journal is not None:
+        journal.check()
+
+
+def _append(journal, entries):
+    """
+    Append the entries to the journal, if any, and return the sequence
+    number to _wait() once the writer's lock is released.
+    """
+    if journal is None or not entries:
+        return 0
+    return journal.append(entries)
+
+
+def _wait(journal, seq):
+    if seq:
+        journal.wait(seq)
+
+
+def _category(pet):
+    """The ID and name of the pet's category, None where it has none."""
+    category = pet.get("category") or {}
+    return category.get("id"), category.get("name")
+
+
+class _PetWrite:
+    """
+    What one pet write changes, gathered aside so that none of it is visible
+    before publish(): the new version of each pet it touches, the new posting
+    list of each index key and the name index changes. Later items of a batch
+    see what earlier ones changed.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        # pet ID -> its new record, or None once deleted
+        self.pets = {}
+        # (index attribute, value) -> its new posting list
+        self.lists = {}
+        # (pet ID, old name words, new name words), in order
+        self.names = []
+
+    def get(self, pet_id):
+        if pet_id in self.pets:
+            return self.pets[pet_id]
+        return self.repository._get(pet_id)
+
+    def put(self, pet_id, pet):
+        self.pets[pet_id] = pet
+
+    def _keys(self, index, value):
+        keys = self.lists.get((index, value))
+        if keys is None:
+            keys = getattr(self.repository, index).get(value, EMPTY)
+        return keys
+
+    def index(self, index, value, key):
+        if value is not None:
+            self.lists[index, value] = self._keys(index, value).inserted(key)
+
+    def unindex(self, index, value, key):
+        if value is not None:
+            self.lists[index, value] = self._keys(index, value).removed(key)
+
+    def publish(self):
+        repository = self.repository
+        for pet_id, pet in self.pets.items():
+            if pet is None:
+                del repository.pets[pet_id]
+            else:
+                repository.pets[pet_id] = repository.table.pack(pet)
+        # Only the posting list of each key changed is replaced, in place
+        for (index, value), keys in self.lists.items():
+            by_value = getattr(repository, index)
+            if keys:
+                by_value[value] = keys
+            else:
+                del by_value[value]
+        for pet_id, old_words, new_words in self.names:
+            repository.names.replace(pet_id, old_words, new_words)
+        repository.version += 1
+
+
+class MemoryPetRepository(PetRepository):
+    """
+    Pets in an ID-keyed dict plus status, category ID and category name ->
+    sorted IDs indexes, and a status -> sorted (name, ID) index for listing
+    pets by name.
+
+    Pets are stored packed by a CompactTable (see storage/records.py) and
+    unpacked into a new dict for every read, unless compact is off.
+
+    Reads never take a lock. Records are never changed once stored: an update
+    stores a new record under the same ID, so a reader always sees one whole
+    version of a pet. Posting lists are immutable SortedLists: writers,
+    serialised by a lock, build the next version of each list they change
+    (sharing all but a few of its nodes) and store it under its key in the
+    index dict. A reader that grabs a posting list keeps a consistent view
+    of it for as long as it needs, though lists of different keys can be
+    from either side of a write. The category indexes work the same way;
+    updates never change a pet's category, so only inserts and deletes
+    touch them.
+
+    Pet names are indexed by word in a PrefixIndex for search(), updated by
+    the same writes.
+
+    A record can be newer than the posting list it was found through, so
+    index readers re-check each record before returning it.
+
+    A write is gathered aside in a _PetWrite and only stored and published
+    once it is in the journal (see storage/journal.py), appended while still
+    holding the lock, so the journal lists writes in the order they were
+    applied and a write the journal failed to take is never seen.
+    """
+
+    def __init__(self, init_pets=(), journal=None, compact=COMPACT_RECORDS):
+        self.table = CompactTable("pets") if compact else PlainTable()
+        self.pets = {pet["id"]: self.table.pack(pet) for pet in init_pets}
+        ids_by_status = {}
+        names_by_status = {}
+        ids_by_category_id = {}
+        ids_by_category_name = {}
+        # Names repeat across pets, so each is split into words once
+        name_words = {}
+        names = []
+        for packed in self.pets.values():
+            pet = self.table.unpack(packed)
+            if pet["name"] not in name_words:
+                name_words[pet["name"]] = words(pet["name"])
+            names.append((pet["id"], name_words[pet["name"]]))
+            ids_by_status.setdefault(pet["status"], []).append(pet["id"])
+            names_by_status.setdefault(pet["status"], []).append(
+                (pet["name"], pet["id"])
+            )
+            category_id, category_name = _category(pet)
+            if category_id is not None:
+                ids_by_category_id.setdefault(category_id, []).append(pet["id"])
+            if category_name is not None:
+                ids_by_category_name.setdefault(category_name, []).append(pet["id"])
+        self.pets_by_status = {
+            status: SortedList(ids) for status, ids in ids_by_status.items()
+        }
+        # Entries hold the unique ID, so they need sorting but no dedupe
+        self.pet_names_by_status = {
+            status: SortedList.from_sorted(sorted(names))
+            for status, names in names_by_status.items()
+        }
+        self.pets_by_category_id = {
+            category_id: SortedList(ids)
+            for category_id, ids in ids_by_category_id.items()
+        }
+        self.pets_by_category_name = {
+            category_name: SortedList(ids)
+            for category_name, ids in ids_by_category_name.items()
+        }
+        self.names = PrefixIndex(names)
+        # Bumped each time a write is published
+        self.version = 0
+        self.pet_ids = count(max(self.pets, default=0) + 1)
+        # Serialises writers
+        self.lock = threading.Lock()
+        self.journal = journal
+
+    def _write(self, apply, items):
+        with self.lock:
+            _check(self.journal)
+            write = _PetWrite(self)
+            results = [apply(write, item) for item in items]
+            # Only once the journal has taken the write does it become visible
+            seq = _append(self.journal, self._entries(apply, items, results))
+            write.publish()
+        _wait(self.journal, seq)
+        return results
+
+    def _entries(self, apply, items, results):
+        if self.journal is None:
+            return []
+        if apply == self._delete:
+            return [
+                ("pets", "del", pet_id)
+                for pet_id, deleted in zip(items, results)
+                if deleted
+            ]
+        return [("pets", "put", pet) for pet in results if pet is not None]
+
+    def _insert(self, write, pet_data):
+        pet_id = pet_data["id"] = next(self.pet_ids)
+        write.put(pet_id, pet_data)
+        write.index("pets_by_status", pet_data["status"], pet_id)
+        write.index(
+            "pet_names_by_status", pet_data["status"], (pet_data["name"], pet_id)
+        )
+        category_id, category_name = _category(pet_data)
+        write.index("pets_by_category_id", category_id, pet_id)
+        write.index("pets_by_category_name", category_name, pet_id)
+        write.names.append((pet_id, (), words(pet_data["name"])))
+        return pet_data
+
+    def _update(self, write, update):
+        pet_id, name, status = update
+        pet = write.get(pet_id)
+        if pet is None:
+            return None
+        new_pet = dict(pet)
+        if name is not None:
+            new_pet["name"] = name
+        if status is not None:
+            new_pet["status"] = status
+        write.put(pet_id, new_pet)
+        if new_pet["status"] != pet["status"]:
+            write.unindex("pets_by_status", pet["status"], pet_id)
+            write.index("pets_by_status", new_pet["status"], pet_id)
+        if new_pet["status"] != pet["status"] or new_pet["name"] != pet["name"]:
+            write.unindex("pet_names_by_status", pet["status"], (pet["name"], pet_id))
+            write.index(
+                "pet_names_by_status", new_pet["status"], (new_pet["name"], pet_id)
+            )
+        if new_pet["name"] != pet["name"]:
+            write.names.append((pet_id, words(pet["name"]), words(new_pet["name"])))
+        return new_pet
+
+    def _delete(self, write, pet_id):
+        pet = write.get(pet_id)
+        if pet is None:
+            return False
+        write.put(pet_id, None)
+        write.unindex("pets_by_status", pet["status"], pet_id)
+        write.unindex("pet_names_by_status", pet["status"], (pet["name"], pet_id))
+        category_id, category_name = _category(pet)
+        write.unindex("pets_by_category_id", category_id, pet_id)
+        write.unindex("pets_by_category_name", category_name, pet_id)
+        write.names.append((pet_id, words(pet["name"]), ()))
+        return True
+
+    def _get(self, pet_id):
+        packed = self.pets.get(pet_id)
+        return None if packed is None else self.table.unpack(packed)
+
+    def get(self, pet_id):
+        return self._get(pet_id)
+
+    def insert(self, pet_data):
+        return self._write(self._insert, [pet_data])[0]
+
+    def update(self, pet_id, name=None, status=None):
+        return self._write(self._update, [(pet_id, name, status)])[0]
+
+    def delete(self, pet_id):
+        return self._write(self._delete, [pet_id])[0]
+
+    def insert_many(self, pets_data):
+        return self._write(self._insert, pets_data)
+
+    def update_many(self, updates):
+        return self._write(
+            self._update,
+            [(u["id"], u.get("name"), u.get("status")) for u in updates],
+        )
+
+    def delete_many(self, pet_ids):
+        return self._write(self._delete, pet_ids)
+
+    def find_by_status(self, status, limit=None, cursor=None):
+        pets = []
+        if limit == 0:
+            return pets
+        for pet_id in self.pets_by_status.get(status, EMPTY).irange(cursor):
+            pet = self._get(pet_id)
+            # Skip pets deleted or moved since the list was read
+            if pet is None or pet["status"] != status:
+                continue
+            pets.append(pet)
+            if len(pets) == limit:
+                break
+        return pets
+
+    def find_by_statuses(
+        self, statuses, sort="id", descending=False, limit=None, cursor=None
+    ):
+        if sort not in PET_SORTS:
+            raise ValueError(f"unknown sort {sort!r}")
+        pets = []
+        if limit == 0:
+            return pets
+        statuses = set(statuses)
+        index = self.pets_by_status if sort == "id" else self.pet_names_by_status
+        runs = [
+            keys.irange_desc(cursor) if descending else keys.irange(cursor)
+            for keys in (index.get(status, EMPTY) for status in statuses)
+            if keys
+        ]
+        # A pet moved by a write between reading two of the lists can be in
+        # both, next to itself once merged, so repeats are dropped
+        for key in unique(heapq.merge(*runs, reverse=descending)):
+            pet_id = key if sort == "id" else key[1]
+            pet = self._get(pet_id)
+            # Skip pets deleted, moved or renamed since the list was read
+            if (
+                pet is None
+                or pet["status"] not in statuses
+                or (sort == "name" and pet["name"] != key[0])
+            ):
+                continue
+            pets.append(pet)
+            if len(pets) == limit:
+                break
+        return pets
+
+    def find_by_category(
+        self, category_id=None, category_name=None, status=None, limit=None, cursor=None
+    ):
+        if category_id is None and category_name is None:
+            raise ValueError("a category ID or name is required")
+        pets = []
+        if limit == 0:
+            return pets
+        postings = []
+        for index, value in (
+            (self.pets_by_category_id, category_id),
+            (self.pets_by_category_name, category_name),
+            (self.pets_by_status, status),
+        ):
+            if value is not None:
+                postings.append([index.get(value, EMPTY)])
+        for pet_id in intersect(postings, cursor):
+            pet = self._get(pet_id)
+            # Skip pets deleted or moved since the lists were read
+            if pet is None or (status is not None and pet["status"] != status):
+                continue
+            pets.append(pet)
+            if len(pets) == limit:
+                break
+        return pets
+
+    def search(self, query, limit=None, cursor=None):
+        query_words = words(query)
+        pets = []
+        if not query_words or limit == 0:
+            return pets
+        for pet_id in self.names.keys(query_words, cursor):
+            pet = self._get(pet_id)
+            # Also skips pets deleted or renamed since the index was read
+            if pet is None or not matches(query_words, words(pet["name"])):
+                continue
+            pets.append(pet)
+            if len(pets) == limit:
+                break
+        return pets
+
+    def has_status(self, status):
+        return status in self.pets_by_status
+
+    def has_category(self, category_id=None, category_name=None):
+        return (category_id is None or category_id in self.pets_by_category_id) and (
+            category_name is None or category_name in self.pets_by_category_name
+        )
+
+    def count_by_status(self):
+        # Posting list sizes are the live per-status counts. Writers change
+        # the dict in place, so its items are copied first, in one step.
+        return {status: len(ids) for status, ids in list(self.pets_by_status.items())}
+
+    def recount_by_status(self):
+        inventory = {}
+        # Under the writer lock the records match the published index
+        with self.lock:
+            pets = list(self.pets.values())
+        for pet in map(self.table.unpack, pets):
+            status = pet["status"]
+            inventory[status] = inventory.get(status, 0) + 1
+        return inventory
+
+    def count(self):
+        return len(self.pets)
+
+
+def _name_words(user):
+    return words(user.get("firstName")) + words(user.get("lastName"))
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, init_users=(), journal=None, compact=COMPACT_RECORDS):
+        # Users are keyed by username, which is how every endpoint looks them
+        # up; IDs come from a monotonic counter instead of a max() scan. As
+        # with pets, records are stored packed and replaced rather than
+        # changed, so lookups need no lock.
+        self.table = CompactTable("users") if compact else PlainTable()
+        self.users = {user["username"]: self.table.pack(user) for user in init_users}
+        last_id = 0
+        names = []
+        for user in map(self.table.unpack, self.users.values()):
+            last_id = max(last_id, user["id"])
+            names.append((user["username"], _name_words(user)))
+        self.user_ids = count(last_id + 1)
+        # For search(): usernames in order, so those with a prefix are one
+        # run of it, and first and last names by word
+        self.usernames = SortedList.from_sorted(sorted(self.users))
+        self.names = PrefixIndex(names)
+        # Serialises writers, making the username check and the insert a
+        # single step
+        self.lock = threading.Lock()
+        # Writers journal a change before making it, so one the journal
+        # cannot take is never seen
+        self.journal = journal
+
+    def get(self, username):
+        packed = self.users.get(username)
+        return None if packed is None else self.table.unpack(packed)
+
+    def insert(self, user_data):
+        return self.insert_many([user_data])[0]
+
+    def insert_many(self, users_data):
+        with self.lock:
+            _check(self.journal)
+            usernames = set()
+            for user_data in users_data:
+                username = user_data["username"]
+                if username in self.users or username in usernames:
+                    raise DuplicateKeyError(username)
+                usernames.add(username)
+            for user_data in users_data:
+                user_data["id"] = next(self.user_ids)
+            seq = _append(self.journal, [("users", "put", user) for user in users_data])
+            for user_data in users_data:
+                self.users[user_data["username"]] = self.table.pack(user_data)
+            # The batch is merged into the indexes at once, not user by user
+            self.usernames = self.usernames.inserted_many(sorted(usernames))
+            self.names.add_many(
+                (user_data["username"], _name_words(user_data))
+                for user_data in users_data
+            )
+        _wait(self.journal, seq)
+        return users_data
+
+    def update(self, username, user_data):
+        with self.lock:
+            _check(self.journal)
+            existing_user = self.get(username)
+            if existing_user is None:
+                return None
+            new_user = {**existing_user, **user_data}
+            new_username = new_user["username"]
+            if new_username != username and new_username in self.users:
+                raise DuplicateKeyError(new_username)
+            entries = [("users", "put", new_user)]
+            if new_username != username:
+                entries.insert(0, ("users", "del", username))
+            seq = _append(self.journal, entries)
+            self.users[new_username] = self.table.pack(new_user)
+            if new_username != username:
+                del self.users[username]
+                self._unindex(existing_user)
+                self._index(new_user)
+            else:
+                self.names.replace(
+                    username, _name_words(existing_user), _name_words(new_user)
+                )
+        _wait(self.journal, seq)
+        return new_user
+
+    def delete(self, username):
+        with self.lock:
+            _check(self.journal)
+            deleted = username in self.users
+            seq = _append(self.journal, [("users", "del", username)] if deleted else [])
+            if deleted:
+                self._unindex(self.table.unpack(self.users.pop(username)))
+        _wait(self.journal, seq)
+        return deleted
+
+    def _index(self, user):
+        self.usernames = self.usernames.inserted(user["username"])
+        self.names.add(user["username"], _name_words(user))
+
+    def _unindex(self, user):
+        self.usernames = self.usernames.removed(user["username"])
+        self.names.remove(user["username"], _name_words(user))
+
+    def search(self, query, limit=None, cursor=None):
+        query = query.strip()
+        users = []
+        if not query or limit == 0:
+            return users
+        by_username = self.usernames.irange_from(max(query, cursor or ""))
+        by_username = takewhile(lambda name: name.startswith(query), by_username)
+        query_words = words(query)
+        by_name = self.names.keys(query_words, cursor)
+        for username in unique(heapq.merge(by_username, by_name)):
+            user = self.get(username)
+            # Also skips users changed since the indexes were read
+            if user is None or username == cursor:
+                continue
+            if not username.startswith(query) and not matches(
+                query_words, _name_words(user)
+            ):
+                continue
+            users.append(user)
+            if len(users) == limit:
+                break
+        return users
+
+    def count(self):
+        return len(self.users)
+
+
+class MemoryOrderRepository(OrderRepository):
+    def __init__(self, init_orders=(), journal=None, compact=COMPACT_RECORDS):
+        # Orders keyed by ID. The store routes run in the threadpool, so IDs
+        # come from itertools.count (next() is atomic) and deletes use a
+        # single dict.pop instead of a check followed by a remove. Stored
+        # packed, as pets and users are.
+        self.table = CompactTable("orders") if compact else PlainTable()
+        self.orders = {order["id"]: self.table.pack(order) for order in init_orders}
+        self.order_ids = count(max(self.orders, default=0) + 1)
+        # Writes are journalled before they are made, as for users
+        self.journal = journal
+        # Only needed to journal writes in the order they were applied
+        self.lock = threading.Lock() if journal is not None else nullcontext()
+
+    def get(self, order_id):
+        packed = self.orders.get(order_id)
+        return None if packed is None else self.table.unpack(packed)
+
+    def insert(self, order):
+        with self.lock:
+            _check(self.journal)
+            order["id"] = next(self.order_ids)
+            seq = _append(self.journal, [("orders", "put", order)])
+            self.orders[order["id"]] = self.table.pack(order)
+        _wait(self.journal, seq)
+        return order
+
+    def delete(self, order_id):
+        with self.lock:
+            if self.journal is None:
+                # No lock without a journal, so check and remove in one step
+                return self.orders.pop(order_id, None) is not None
+            _check(self.journal)
+            deleted = order_id in self.orders
+            seq = _append(
+                self.journal, [("orders", "del", order_id)] if deleted else []
+            )
+            if deleted:
+                del self.orders[order_id]
+        _wait(self.journal, seq)
+        return deleted
+
+    def count(self):
+        return len(self.orders)
+
+
+class MemoryBackend(Backend):
+    def __init__(
+        self,
+        init_pets=(),
+        init_users=(),
+        init_orders=(),
+        journal=None,
+        compact=COMPACT_RECORDS,
+    ):
+        super().__init__(
+            MemoryPetRepository(init_pets, journal, compact),
+            MemoryUserRepository(init_users, journal, compact),
+            MemoryOrderRepository(init_orders, journal, compact),
+        )
@@ -0,0 +1,130 @@
+"""
+Compact records for the memory backend.
+
+A record dict costs a hash table per row, and records that came in as JSON
+each hold their own copy of values most rows share, such as a category
+dict or a status string. A CompactTable instead stores each record as one
+tuple: its Layout, then its values in the order of its keys. A Layout is
+shared by every record with the same keys in the same order, and values of
+the snapshot schema's ENUM columns are interned, up to MAX_INTERNED of them,
+so equal ones are a single shared object.
+
+unpack() turns a tuple back into a new dict with the same keys in the same
+order, so a record serialises to the same JSON as the dict it was packed
+from. Records are never changed once stored, so sharing values is safe.
+"""
+
+from storage.snapshot import ENUM, SCHEMAS
+
+# Distinct key orders a table keeps a Layout for. Records with any other
+# keys, which only odd clients send, are stored as the dict itself.
+MAX_LAYOUTS = 256
+# Distinct values a table interns. Interned columns are whatever clients
+# send, and interned values outlive the records holding them, so beyond this
+# new values are stored as they are, unshared.
+MAX_INTERNED = 4096
+
+
+class Layout:
+    """The keys of a record, and a function building its dict from a tuple."""
+
+    __slots__ = ("keys", "interned", "build")
+
+    def __init__(self, keys, interned_fields):
+        self.keys = keys
+        # Positions in a packed tuple of the values to intern
+        self.interned = [i for i, key in enumerate(keys, 1) if key in interned_fields]
+        self.build = _dict_builder(keys)
+
+    # Compared by keys, so tuples packed by different tables compare equal
+    # when their records do
+    def __eq__(self, other):
+        return isinstance(other, Layout) and self.keys == other.keys
+
+    def __hash__(self):
+        return hash(self.keys)
+
+
+class CompactTable:
+    """
+    Packs the records of one table into tuples and back.
+
+    Safe to use from several threads: a Layout or interned value made twice
+    by a race is published once with setdefault().
+    """
+
+    def __init__(self, table):
+        self.interned_fields = {field for field, kind in SCHEMAS[table] if kind == ENUM}
+        self.layouts = {}
+        # (type, value) -> the shared value; dicts are keyed by their items.
+        # Holds at most MAX_INTERNED values, give or take a racing writer.
+        self.values = {}
+        # id() -> each shared value. They are kept alive by values, so no
+        # other object can have their id, and a value that is already the
+        # shared one, as loaded records' values mostly are, is found here
+        # without building its key.
+        self.shared = {}
+
+    def pack(self, record):
+        keys = tuple(record)
+        layout = self.layouts.get(keys)
+        if layout is None:
+            if len(self.layouts) >= MAX_LAYOUTS:
+                return record
+            layout = self.layouts.setdefault(keys, Layout(keys, self.interned_fields))
+        if not layout.interned:
+            return (layout, *record.values())
+        values = [layout, *record.values()]
+        for i in layout.interned:
+            if id(values[i]) not in self.shared:
+                values[i] = self._intern(values[i])
+        return tuple(values)
+
+    @staticmethod
+    def unpack(packed):
+        if type(packed) is dict:
+            return packed
+        return packed[0].build(packed)
+
+    def _intern(self, value):
+        if type(value) is dict:
+            key = (dict, tuple((k, type(v), v) for k, v in value.items()))
+        else:
+            key = (type(value), value)
+        try:
+            shared = self.values.get(key)
+            if shared is None:
+                if len(self.values) >= MAX_INTERNED:
+                    return value
+                shared = self.values.setdefault(key, value)
+        except TypeError:
+            # An unhashable value, such as a list, is kept as it is
+            return value
+        self.shared[id(shared)] = shared
+        return shared
+
+
+class PlainTable:
+    """Stores records as the dicts themselves, for when reads matter most."""
+
+    @staticmethod
+    def pack(record):
+        return record
+
+    @staticmethod
+    def unpack(packed):
+        return packed
+
+
+def _dict_builder(keys):
+    """
+    A function turning a packed tuple into a dict with the given keys.
+
+    Generated like storage.snapshot's record builders, because a dict
+    display is much faster than dict(zip(keys, values)), and every read of
+    a record pays for it.
+    """
+    items = ", ".join(f"{key!r}: packed[{i}]" for i, key in enumerate(keys, 1))
+    namespace = {}
+    exec(f"def build(packed):\n    return {{{items}}}\n", namespace)
+    return namespace["build"]
@@ -0,0 +1,664 @@
+import heapq
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+from storage.base import (
+    PET_SORTS,
+    Backend,
+    DuplicateKeyError,
+    OrderRepository,
+    PetRepository,
+    UserRepository,
+    pet_sort_key,
+)
+from util.text_index import words
+
+# Bumped whenever the schema changes; stored in PRAGMA user_version. A
+# database at version 0 is new and gets the seed data; older versions are
+# brought up to date by MIGRATIONS.
+SCHEMA_VERSION = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pets_status_id ON pets (status, id);
+
+-- Per-status counts kept current by triggers, so the inventory is read
+-- without touching the pets table.
+CREATE TABLE IF NOT EXISTS pet_status_counts (
+    status TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS pets_count_insert AFTER INSERT ON pets BEGIN
+    INSERT INTO pet_status_counts (status, count) VALUES (new.status, 1)
+    ON CONFLICT (status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pets_count_delete AFTER DELETE ON pets BEGIN
+    UPDATE pet_status_counts SET count = count - 1 WHERE status = old.status;
+    DELETE FROM pet_status_counts WHERE status = old.status AND count = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pets_count_update AFTER UPDATE OF status ON pets
+WHEN old.status <> new.status BEGIN
+    UPDATE pet_status_counts SET count = count - 1 WHERE status = old.status;
+    DELETE FROM pet_status_counts WHERE status = old.status AND count = 0;
+    INSERT INTO pet_status_counts (status, count) VALUES (new.status, 1)
+    ON CONFLICT (status) DO UPDATE SET count = count + 1;
+END;
+
+-- User IDs are part of the user document rather than the key, so they come
+-- from a counter row instead of AUTOINCREMENT.
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Version 2: full-text indexes for search. unicode61 splits words as
+# util.text_index does, and the prefix indexes make short prefix queries
+# a lookup instead of a scan of the terms.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE pet_names USING fts5 (
+    name,
+    content = 'pets',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 0',
+    prefix = '1 2 3'
+);
+
+CREATE TRIGGER pet_names_insert AFTER INSERT ON pets BEGIN
+    INSERT INTO pet_names (rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE TRIGGER pet_names_delete AFTER DELETE ON pets BEGIN
+    INSERT INTO pet_names (pet_names, rowid, name)
+    VALUES ('delete', old.id, old.name);
+END;
+
+CREATE TRIGGER pet_names_update AFTER UPDATE OF name ON pets
+WHEN old.name <> new.name BEGIN
+    INSERT INTO pet_names (pet_names, rowid, name)
+    VALUES ('delete', old.id, old.name);
+    INSERT INTO pet_names (rowid, name) VALUES (new.id, new.name);
+END;
+
+INSERT INTO pet_names (pet_names) VALUES ('rebuild');
+
+-- First and last names live in the user document, so this index keeps no
+-- copy of its text; deleting a row means passing the old text back.
+CREATE VIRTUAL TABLE user_names USING fts5 (
+    name,
+    content = '',
+    tokenize = 'unicode61 remove_diacritics 0',
+    prefix = '1 2 3'
+);
+
+CREATE TRIGGER user_names_insert AFTER INSERT ON users BEGIN
+    INSERT INTO user_names (rowid, name)
+    VALUES (new.rowid, user_name(new.data));
+END;
+
+CREATE TRIGGER user_names_delete AFTER DELETE ON users BEGIN
+    INSERT INTO user_names (user_names, rowid, name)
+    VALUES ('delete', old.rowid, user_name(old.data));
+END;
+
+CREATE TRIGGER user_names_update AFTER UPDATE ON users
+WHEN old.data <> new.data BEGIN
+    INSERT INTO user_names (user_names, rowid, name)
+    VALUES ('delete', old.rowid, user_name(old.data));
+    INSERT INTO user_names (rowid, name)
+    VALUES (new.rowid, user_name(new.data));
+END;
+
+INSERT INTO user_names (rowid, name) SELECT rowid, user_name(data) FROM users;
+"""
+
+# Version 3: category indexes for findByCategory. Categories are stored as
+# JSON, so these index the extracted fields; queries must use the same
+# expressions to be able to use them.
+CATEGORY_ID = "json_extract(category, '$.id')"
+CATEGORY_NAME = "json_extract(category, '$.name')"
+CATEGORY_SCHEMA = f"""
+CREATE INDEX pets_category_id ON pets ({CATEGORY_ID}, id);
+CREATE INDEX pets_category_name ON pets ({CATEGORY_NAME}, id);
+"""
+
+# Version 4: pets by status in name order, for findByStatus sorted by name
+STATUS_NAME_SCHEMA = """
+CREATE INDEX pets_status_name_id ON pets (status, name, id);
+"""
+
+# Version 5: order documents hold their ID, so they keep the key order they
+# were placed with. Older ones were stored without it and read back with it
+# first, which is where it goes. Their text is json.dumps() output. Seed
+# orders are stored with their IDs already, so they are left alone.
+ORDER_ID_SCHEMA = """
+UPDATE orders SET data = '{"id": ' || id ||
+    CASE WHEN data = '{}' THEN '}' ELSE ', ' || substr(data, 2) END
+WHERE json_type(data, '$.id') IS NULL;
+"""
+
+# Schema version -> script bringing the version before it up to it
+MIGRATIONS = {
+    2: SEARCH_SCHEMA,
+    3: CATEGORY_SCHEMA,
+    4: STATUS_NAME_SCHEMA,
+    5: ORDER_ID_SCHEMA,
+}
+
+
+def user_name(data):
+    """The first and last names of a stored user document, for user_names."""
+    user = json.loads(data)
+    return " ".join(
+        str(user[field])
+        for field in ("firstName", "lastName")
+        if user.get(field) is not None
+    )
+
+
+def match_expression(query):
+    """An FTS5 query for rows with a word starting with each query word."""
+    query_words = words(query)
+    # Words are letters and digits only, so quoting them is enough
+    return " AND ".join(f'"{word}"*' for word in query_words) or None
+
+
+class ConnectionPool:
+    """
+    Bounded pool of autocommit connections to one WAL-mode database.
+
+    Each connection keeps its own prepared statement cache, so reusing
+    connections is what makes the repositories' fixed SQL strings cheap.
+    Callers block when all connections are in use.
+    """
+
+    def __init__(self, path, size=4):
+        self.path = path
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=5.0,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Used by the user_names triggers, so every connection that writes
+        # users needs it
+        conn.create_function("user_name", 1, user_name, deterministic=True)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if not create:
+            return self.idle.get()
+        try:
+            return self._connect()
+        except Exception:
+            with self.lock:
+                self.created -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self.idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Connection inside a write transaction, committed on success."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def pet_from_row(row):
+    return {
+        "id": row[0],
+        "name": row[1],
+        "category": json.loads(row[2]),
+        "status": row[3],
+    }
+
+
+class SqlitePetRepository(PetRepository):
+    COLUMNS = "id, name, category, status"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def get(self, pet_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f"SELECT {self.COLUMNS} FROM pets WHERE id = ?", (pet_id,)
+            ).fetchone()
+        return pet_from_row(row) if row else None
+
+    @staticmethod
+    def _insert(conn, pet_data):
+        (pet_data["id"],) = conn.execute(
+            "INSERT INTO pets (name, category, status) VALUES (?, ?, ?) RETURNING id",
+            (pet_data["name"], json.dumps(pet_data["category"]), pet_data["status"]),
+        ).fetchone()
+        return pet_data
+
+    def _update(self, conn, pet_id, name, status):
+        row = conn.execute(
+            "UPDATE pets SET name = coalesce(?, name), status = coalesce(?, status) "
+            f"WHERE id = ? RETURNING {self.COLUMNS}",
+            (name, status, pet_id),
+        ).fetchone()
+        return pet_from_row(row) if row else None
+
+    @staticmethod
+    def _delete(conn, pet_id):
+        return conn.execute("DELETE FROM pets WHERE id = ?", (pet_id,)).rowcount > 0
+
+    def insert(self, pet_data):
+        with self.pool.transaction() as conn:
+            return self._insert(conn, pet_data)
+
+    def update(self, pet_id, name=None, status=None):
+        with self.pool.transaction() as conn:
+            return self._update(conn, pet_id, name, status)
+
+    def delete(self, pet_id):
+        with self.pool.transaction() as conn:
+            return self._delete(conn, pet_id)
+
+    def insert_many(self, pets_data):
+        with self.pool.transaction() as conn:
+            return [self._insert(conn, pet_data) for pet_data in pets_data]
+
+    def update_many(self, updates):
+        with self.pool.transaction() as conn:
+            return [
+                self._update(conn, u["id"], u.get("name"), u.get("status"))
+                for u in updates
+            ]
+
+    def delete_many(self, pet_ids):
+        with self.pool.transaction() as conn:
+            return [self._delete(conn, pet_id) for pet_id in pet_ids]
+
+    def find_by_status(self, status, limit=None, cursor=None):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {self.COLUMNS} FROM pets WHERE status = ? AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (
+                    status,
+                    -1 if cursor is None else cursor,
+                    -1 if limit is None else limit,
+                ),
+            ).fetchall()
+        return [pet_from_row(row) for row in rows]
+
+    def find_by_statuses(
+        self, statuses, sort="id", descending=False, limit=None, cursor=None
+    ):
+        if sort not in PET_SORTS:
+            raise ValueError(f"unknown sort {sort!r}")
+        # One query per status reads its (status, ...) index in order, and
+        # the pages are merged, so nothing is sorted after the fact. A single
+        # IN query would have SQLite sort every match before the LIMIT.
+        columns = "id" if sort == "id" else "name, id"
+        direction = " DESC" if descending else ""
+        sql = f"SELECT {self.COLUMNS} FROM pets WHERE status = ?"
+        if cursor is not None:
+            placeholders = "?" if sort == "id" else "?, ?"
+            operator = "<" if descending else ">"
+            sql += f" AND ({columns}) {operator} ({placeholders})"
+            cursor = (cursor,) if sort == "id" else tuple(cursor)
+        order = ", ".join(column + direction for column in columns.split(", "))
+        sql += f" ORDER BY {order} LIMIT ?"
+        runs = []
+        with self.pool.connection() as conn:
+            for status in set(statuses):
+                rows = conn.execute(
+                    sql,
+                    (status, *(cursor or ()), -1 if limit is None else limit),
+                ).fetchall()
+                runs.append([pet_from_row(row) for row in rows])
+        merged = heapq.merge(
+            *runs, key=lambda pet: pet_sort_key(pet, sort), reverse=descending
+        )
+        return list(islice(merged, limit))
+
+    def find_by_category(
+        self, category_id=None, category_name=None, status=None, limit=None, cursor=None
+    ):
+        # Only the given conditions go into the query, so SQLite can use
+        # a category index, ordered by ID within a category, and check the
+        # status of the rows it reads. There are few distinct queries, so
+        # each stays in the statement cache.
+        if category_id is None and category_name is None:
+            raise ValueError("a category ID or name is required")
+        conditions = []
+        params = []
+        for condition, value in (
+            (CATEGORY_ID, category_id),
+            (CATEGORY_NAME, category_name),
+            ("status", status),
+        ):
+            if value is not None:
+                conditions.append(f"{condition} = ?")
+                params.append(value)
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {self.COLUMNS} FROM pets WHERE {' AND '.join(conditions)} "
+                "AND id > ? ORDER BY id LIMIT ?",
+                (
+                    *params,
+                    -1 if cursor is None else cursor,
+                    -1 if limit is None else limit,
+                ),
+            ).fetchall()
+        return [pet_from_row(row) for row in rows]
+
+    def search(self, query, limit=None, cursor=None):
+        expression = match_expression(query)
+        if expression is None:
+            return []
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT pets.id, pets.name, pets.category, pets.status "
+                "FROM pet_names JOIN pets ON pets.id = pet_names.rowid "
+                "WHERE pet_names MATCH ? AND pet_names.rowid > ? "
+                "ORDER BY pet_names.rowid LIMIT ?",
+                (
+                    expression,
+                    -1 if cursor is None else cursor,
+                    -1 if limit is None else limit,
+                ),
+            ).fetchall()
+        return [pet_from_row(row) for row in rows]
+
+    def has_status(self, status):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM pet_status_counts WHERE status = ?", (status,)
+            ).fetchone()
+        return row is not None
+
+    def has_category(self, category_id=None, category_name=None):
+        with self.pool.connection() as conn:
+            for condition, value in (
+                (CATEGORY_ID, category_id),
+                (CATEGORY_NAME, category_name),
+            ):
+                if value is None:
+                    continue
+                row = conn.execute(
+                    f"SELECT 1 FROM pets WHERE {condition} = ? LIMIT 1", (value,)
+                ).fetchone()
+                if row is None:
+                    return False
+        return True
+
+    def count_by_status(self):
+        with self.pool.connection() as conn:
+            return dict(conn.execute("SELECT status, count FROM pet_status_counts"))
+
+    def recount_by_status(self):
+        with self.pool.connection() as conn:
+            return dict(
+                conn.execute("SELECT status, count(*) FROM pets GROUP BY status")
+            )
+
+    def count(self):
+        # The maintained status counts add up to the total without a scan
+        with self.pool.connection() as conn:
+            (total,) = conn.execute(
+                "SELECT coalesce(sum(count), 0) FROM pet_status_counts"
+            ).fetchone()
+        return total
+
+
+class SqliteUserRepository(UserRepository):
+    def __init__(self, pool):
+        self.pool = pool
+
+    def get(self, username):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT data FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def insert(self, user_data):
+        return self.insert_many([user_data])[0]
+
+    def insert_many(self, users_data):
+        if not users_data:
+            return users_data
+        with self.pool.transaction() as conn:
+            (last_id,) = conn.execute(
+                "UPDATE sequences SET value = value + ? WHERE name = 'users' "
+                "RETURNING value",
+                (len(users_data),),
+            ).fetchone()
+            for user_id, user_data in enumerate(
+                users_data, last_id - len(users_data) + 1
+            ):
+                user_data["id"] = user_id
+            try:
+                conn.executemany(
+                    "INSERT INTO users (username, data) VALUES (?, ?)",
+                    [(u["username"], json.dumps(u)) for u in users_data],
+                )
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyError(str(e)) from e
+        return users_data
+
+    def update(self, username, user_data):
+        with self.pool.transaction() as conn:
+            row = conn.execute(
+                "SELECT data FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            if row is None:
+                return None
+            user = json.loads(row[0])
+            user.update(user_data)
+            try:
+                conn.execute(
+                    "UPDATE users SET username = ?, data = ? WHERE username = ?",
+                    (user["username"], json.dumps(user), username),
+                )
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyError(user["username"]) from e
+        return user
+
+    def delete(self, username):
+        with self.pool.transaction() as conn:
+            cursor = conn.execute("DELETE FROM users WHERE username = ?", (username,))
+            return cursor.rowcount > 0
+
+    def search(self, query, limit=None, cursor=None):
+        query = query.strip()
+        if not query:
+            return []
+        limit = -1 if limit is None else limit
+        expression = match_expression(query)
+        with self.pool.connection() as conn:
+            # Usernames with the prefix are one range of the primary key;
+            # the code point after any character bounds it
+            by_username = conn.execute(
+                "SELECT username, data FROM users "
+                "WHERE username >= ? AND username < ? AND username > ? "
+                "ORDER BY username LIMIT ?",
+                (query, query + chr(0x10FFFF), cursor or "", limit),
+            ).fetchall()
+            by_name = []
+            if expression is not None:
+                by_name = conn.execute(
+                    "SELECT users.username, users.data "
+                    "FROM user_names JOIN users ON users.rowid = user_names.rowid "
+                    "WHERE user_names MATCH ? AND users.username > ? "
+                    "ORDER BY users.username LIMIT ?",
+                    (expression, cursor or "", limit),
+                ).fetchall()
+        # A user matching both ways comes once, in username order
+        users = {}
+        for username, data in heapq.merge(by_username, by_name):
+            users.setdefault(username, data)
+        if limit >= 0:
+            users = dict(islice(users.items(), limit))
+        return [json.loads(data) for data in users.values()]
+
+    def count(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT count(*) FROM users").fetchone()[0]
+
+
+class SqliteOrderRepository(OrderRepository):
+    def __init__(self, pool):
+        self.pool = pool
+
+    def get(self, order_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT data FROM orders WHERE id = ?", (order_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def insert(self, order):
+        # The stored document holds the ID too, set where the memory backend
+        # sets it, so both return the same keys in the same order
+        with self.pool.transaction() as conn:
+            (order["id"],) = conn.execute(
+                "INSERT INTO orders (data) VALUES ('{}') RETURNING id"
+            ).fetchone()
+            conn.execute(
+                "UPDATE orders SET data = ? WHERE id = ?",
+                (json.dumps(order), order["id"]),
+            )
+        return order
+
+    def delete(self, order_id):
+        with self.pool.transaction() as conn:
+            cursor = conn.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+            return cursor.rowcount > 0
+
+    def count(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT count(*) FROM orders").fetchone()[0]
+
+
+class SqliteBackend(Backend):
+    def __init__(self, path, pool_size=4, init_pets=(), init_users=(), init_orders=()):
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.transaction() as conn:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version == 0:
+                self._create(conn, init_pets, init_users, init_orders)
+                version = 1
+            self._migrate(conn, version)
+        super().__init__(
+            SqlitePetRepository(self.pool),
+            SqliteUserRepository(self.pool),
+            SqliteOrderRepository(self.pool),
+        )
+
+    @staticmethod
+    def _create(conn, init_pets, init_users, init_orders):
+        # executescript() would commit the open transaction, so the schema
+        # is applied one statement at a time.
+        for statement in split_statements(SCHEMA):
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO pets (id, name, category, status) VALUES (?, ?, ?, ?)",
+            (
+                (p["id"], p["name"], json.dumps(p["category"]), p["status"])
+                for p in init_pets
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO users (username, data) VALUES (?, ?)",
+            ((u["username"], json.dumps(u)) for u in init_users),
+        )
+        conn.execute(
+            "INSERT INTO sequences (name, value) "
+            "SELECT 'users', coalesce(max(json_extract(data, '$.id')), 0) FROM users"
+        )
+        conn.executemany(
+            "INSERT INTO orders (id, data) VALUES (?, ?)",
+            ((o["id"], json.dumps(o)) for o in init_orders),
+        )
+
+    @staticmethod
+    def _migrate(conn, version):
+        # Indexes and triggers added by later versions are built after the
+        # seed data is in, in one pass each rather than per row
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            for statement in split_statements(MIGRATIONS[target]):
+                conn.execute(statement)
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.pool.close()
+
+
+def split_statements(script):
+    """Split a script into complete statements, keeping trigger bodies whole."""
+    statements = []
+    current = ""
+    for line in script.splitlines(keepends=True):
+        if line.lstrip().startswith("--"):
+            continue
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    return statements
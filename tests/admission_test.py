@@ -0,0 +1,159 @@
+import asyncio
+
+import allure
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.admission import AdmissionController, ConcurrencyLimiter, Policy, RateLimiter
+from util.logging_config import logger
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@allure.title("Test that RateLimiter allows a burst and then refills")
+@allure.description(
+    "This test checks that a client may send `burst` requests at once, is "
+    "then told how long to wait, and gets tokens back as time passes, "
+    "independently of other clients."
+)
+def test_rate_limiter_token_bucket():
+    logger.info("Running test: test_rate_limiter_token_bucket")
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=3, clock=clock)
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    assert limiter.acquire("b") == 0
+    clock.now = 1.0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    logger.info("Test passed: test_rate_limiter_token_bucket")
+
+
+@allure.title("Test that RateLimiter keeps a bounded number of clients")
+@allure.description(
+    "This test checks that the least recently seen client's bucket is "
+    "dropped once max_clients buckets are held."
+)
+def test_rate_limiter_max_clients():
+    logger.info("Running test: test_rate_limiter_max_clients")
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2, clock=FakeClock())
+    for client in ("a", "b", "a", "c"):
+        limiter.acquire(client)
+    assert list(limiter.buckets) == ["a", "c"]
+    logger.info("Test passed: test_rate_limiter_max_clients")
+
+
+@allure.title("Test that ConcurrencyLimiter queues, hands over and sheds")
+@allure.description(
+    "This test fills the in-flight slots and the queue, checks that the next "
+    "caller is refused at once, and that released slots go to the waiters "
+    "in arrival order."
+)
+@pytest.mark.asyncio
+async def test_concurrency_limiter():
+    logger.info("Running test: test_concurrency_limiter")
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=2)
+    assert await limiter.acquire()
+    first = asyncio.ensure_future(limiter.acquire())
+    second = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not await limiter.acquire()
+
+    limiter.release()
+    assert await first
+    assert not second.done()
+    limiter.release()
+    assert await second
+    limiter.release()
+    assert limiter.in_flight == 0
+    logger.info("Test passed: test_concurrency_limiter")
+
+
+@allure.title("Test that a cancelled waiter gives up its place")
+@allure.description(
+    "This test cancels a queued request and checks that the limiter neither "
+    "hands it a slot nor leaks one."
+)
+@pytest.mark.asyncio
+async def test_concurrency_limiter_cancelled_waiter():
+    logger.info("Running test: test_concurrency_limiter_cancelled_waiter")
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1)
+    assert await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert not limiter.waiters
+    limiter.release()
+    assert limiter.in_flight == 0
+    logger.info("Test passed: test_concurrency_limiter_cancelled_waiter")
+
+
+def admission_app(controller, gate):
+    app = FastAPI()
+
+    @app.get("/pet/{pet_id}")
+    async def get_pet(pet_id: int):
+        await gate.wait()
+        return {"id": pet_id}
+
+    @app.get("/store/inventory")
+    async def get_inventory():
+        return {}
+
+    app.middleware("http")(controller)
+    return app
+
+
+@allure.title("Test that the admission middleware answers 429 and 503")
+@allure.description(
+    "This test runs the middleware on a small app. A client over its pets "
+    "rate limit gets 429 while the store router is unaffected, and once the "
+    "in-flight slots and queue are taken further requests get 503. Both "
+    "carry Retry-After."
+)
+@pytest.mark.asyncio
+async def test_admission_middleware_rejects():
+    logger.info("Running test: test_admission_middleware_rejects")
+    gate = asyncio.Event()
+    gate.set()
+    controller = AdmissionController(
+        {
+            "pets": Policy(rate_limit=1, burst=2),
+            "store": Policy(max_in_flight=1, max_queue=1),
+        },
+        Policy(),
+    )
+    transport = httpx.ASGITransport(app=admission_app(controller, gate))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [(await client.get("/pet/1")).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        response = await client.get("/pet/1")
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert (await client.get("/store/inventory")).status_code == 200
+
+    gate.clear()
+    controller = AdmissionController({}, Policy(max_in_flight=1, max_queue=1))
+    transport = httpx.ASGITransport(app=admission_app(controller, gate))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        held = [asyncio.ensure_future(client.get(f"/pet/{i}")) for i in range(2)]
+        while not controller.global_limiter.waiters:
+            await asyncio.sleep(0.01)
+        response = await client.get("/pet/3")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        gate.set()
+        assert [(await r).status_code for r in held] == [200, 200]
+    assert controller.rejected[503] == 1
+    assert controller.global_limiter.in_flight == 0
+    logger.info("Test passed: test_admission_middleware_rejects")
@@ -0,0 +1,159 @@
+import random
+import sys
+import threading
+import time
+
+import allure
+
+from storage.memory import MemoryPetRepository, MemoryUserRepository
+from util.logging_config import logger
+
+STATUSES = ["available", "pending", "sold"]
+DURATION = 1.5
+
+
+def run_threads(writers, readers):
+    """Run writer and reader loops concurrently and collect their failures."""
+    errors = []
+    stop = threading.Event()
+
+    def loop(body, seed):
+        rnd = random.Random(seed)
+        try:
+            while not stop.is_set():
+                body(rnd)
+        except Exception as e:
+            errors.append(repr(e))
+            stop.set()
+
+    threads = [
+        threading.Thread(target=loop, args=(body, seed))
+        for seed, body in enumerate(writers + readers)
+    ]
+    interval = sys.getswitchinterval()
+    # Switch threads far more often than usual to provoke interleavings
+    sys.setswitchinterval(1e-5)
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return errors
+
+
+def make_pet(rnd):
+    status = rnd.choice(STATUSES)
+    # name always starts with the status, so a torn record is detectable
+    return {"name": f"{status}-{rnd.random()}", "category": {}, "status": status}
+
+
+@allure.title("Stress test for lock-free pet reads under concurrent writes")
+@allure.description(
+    "This test runs writer threads that insert, update and delete pets while "
+    "reader threads page through the status index and read records, and "
+    "checks that every read is consistent and the index matches the records "
+    "afterwards."
+)
+def test_pet_repository_concurrent_reads_and_writes():
+    logger.info("Running test: test_pet_repository_concurrent_reads_and_writes")
+    pets = MemoryPetRepository()
+    pets.insert_many([make_pet(random.Random(i)) for i in range(2000)])
+
+    def writer(rnd):
+        pet_id = rnd.randint(1, 3000)
+        action = rnd.random()
+        if action < 0.4:
+            new = make_pet(rnd)
+            pets.update(pet_id, name=new["name"], status=new["status"])
+        elif action < 0.6:
+            pets.delete(pet_id)
+        elif action < 0.8:
+            pets.insert(make_pet(rnd))
+        else:
+            pets.update_many(
+                [
+                    {"id": rnd.randint(1, 3000), **make_pet(rnd)}
+                    for _ in range(rnd.randint(1, 20))
+                ]
+            )
+
+    def page_reader(rnd):
+        status = rnd.choice(STATUSES)
+        cursor = None
+        while True:
+            page = pets.find_by_status(status, limit=50, cursor=cursor)
+            ids = [pet["id"] for pet in page]
+            assert ids == sorted(set(ids)), "page out of order"
+            assert all(p["id"] > (cursor or 0) for p in page), "cursor not honoured"
+            for pet in page:
+                assert pet["status"] == status, "pet with wrong status returned"
+                assert pet["name"].startswith(pet["status"]), "torn pet record"
+            if len(page) < 50:
+                return
+            cursor = ids[-1]
+
+    def point_reader(rnd):
+        pet = pets.get(rnd.randint(1, 3000))
+        if pet is not None:
+            assert pet["name"].startswith(pet["status"]), "torn pet record"
+        counts = pets.count_by_status()
+        assert all(count > 0 for count in counts.values()), "empty status listed"
+
+    errors = run_threads(
+        [writer, writer], [page_reader, page_reader, point_reader, point_reader]
+    )
+    assert errors == []
+
+    assert pets.count_by_status() == pets.recount_by_status()
+    for status, ids in pets.pets_by_status.items():
+        assert list(ids) == sorted(
+            pet_id
+            for pet_id, pet in pets.pets.items()
+            if pets.table.unpack(pet)["status"] == status
+        )
+    logger.info("Test passed: test_pet_repository_concurrent_reads_and_writes")
+
+
+@allure.title("Stress test for lock-free user reads under concurrent renames")
+@allure.description(
+    "This test renames and updates users from several threads while readers "
+    "look them up, and checks that usernames stay unique and records whole."
+)
+def test_user_repository_concurrent_renames():
+    logger.info("Running test: test_user_repository_concurrent_renames")
+    users = MemoryUserRepository()
+    users.insert_many(
+        [
+            {"username": f"user{i}", "firstName": "0", "lastName": "0"}
+            for i in range(200)
+        ]
+    )
+
+    def writer(rnd):
+        username = f"user{rnd.randrange(200)}"
+        if rnd.random() < 0.5:
+            tag = str(rnd.random())
+            users.update(username, {"firstName": tag, "lastName": tag})
+        else:
+            try:
+                users.update(username, {"username": f"user{rnd.randrange(200)}"})
+            except Exception as e:
+                assert type(e).__name__ == "DuplicateKeyError"
+
+    def reader(rnd):
+        user = users.get(f"user{rnd.randrange(200)}")
+        if user is not None:
+            assert user["firstName"] == user["lastName"], "torn user record"
+
+    errors = run_threads([writer, writer], [reader, reader, reader])
+    assert errors == []
+    assert len(users.users) == 200
+    assert all(
+        name == users.table.unpack(user)["username"]
+        for name, user in users.users.items()
+    )
+    logger.info("Test passed: test_user_repository_concurrent_renames")
@@ -0,0 +1,72 @@
+import json
+from collections import Counter
+from itertools import islice
+
+import allure
+
+from data.generate import STATUS_WEIGHTS, generate, write_jsonl
+from storage.snapshot import Snapshot, write_snapshot
+from util.logging_config import logger
+from util.passwords import verify_password
+
+
+def dataset(seed, pets=200, users=20, orders=50):
+    return [list(table) for table in generate(pets, users, orders, seed, iterations=1)]
+
+
+@allure.title("Test that the generator is deterministic")
+@allure.description(
+    "This test checks that the same seed gives the same records, that another "
+    "seed gives different ones, and that one table's size does not change "
+    "another table's records."
+)
+def test_generate_is_deterministic():
+    logger.info("Running test: test_generate_is_deterministic")
+    assert dataset(1) == dataset(1)
+    assert dataset(1) != dataset(2)
+    assert dataset(1, orders=10)[:2] == dataset(1, orders=50)[:2]
+    assert dataset(1, pets=100)[0] == dataset(1, pets=200)[0][:100]
+    logger.info("Test passed: test_generate_is_deterministic")
+
+
+@allure.title("Test the shape and distributions of generated data")
+@allure.description(
+    "This test checks unique IDs and usernames, that orders reference "
+    "generated pets, that statuses roughly follow their weights and that "
+    "the shared user password verifies."
+)
+def test_generate_records():
+    logger.info("Running test: test_generate_records")
+    pets, users, orders = dataset(7, pets=5000, users=100, orders=500)
+    assert [pet["id"] for pet in pets] == list(range(1, 5001))
+    assert len({user["username"] for user in users}) == 100
+    assert all(1 <= order["pet_id"] <= 5000 for order in orders)
+    statuses = Counter(pet["status"] for pet in pets)
+    for status, weight in STATUS_WEIGHTS.items():
+        assert abs(statuses[status] / 5000 - weight) < 0.03
+    categories = Counter(pet["category"]["name"] for pet in pets)
+    assert categories.most_common(1)[0][0] == "Dogs"
+    assert verify_password("password", users[0]["password"])
+    logger.info("Test passed: test_generate_records")
+
+
+@allure.title("Test writing generated data as JSONL and as a snapshot")
+@allure.description(
+    "This test writes the same generated tables as JSONL files and as a "
+    "snapshot, and checks both read back as the generated records."
+)
+def test_generate_outputs(tmp_path):
+    logger.info("Running test: test_generate_outputs")
+    expected = dataset(3)
+    counts = write_jsonl(str(tmp_path), generate(200, 20, 50, 3, iterations=1))
+    assert counts == {"pets": 200, "users": 20, "orders": 50}
+    with open(tmp_path / "pets.jsonl") as f:
+        assert [json.loads(line) for line in islice(f, 5)] == expected[0][:5]
+
+    path = str(tmp_path / "seed.snap")
+    write_snapshot(path, *generate(200, 20, 50, 3, iterations=1))
+    snapshot = Snapshot(path)
+    assert [list(snapshot.pets()), list(snapshot.users()), list(snapshot.orders())] == (
+        expected
+    )
+    logger.info("Test passed: test_generate_outputs")
@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import allure
+import pytest
+
+from storage import create_backend
+from storage.journal import (
+    JournaledMemoryBackend,
+    JournalError,
+    numbered,
+    segment_path,
+)
+from util.logging_config import logger
+
+CATEGORY = {"id": 1, "name": "Dogs"}
+
+
+def seed():
+    pets = [
+        {"id": i, "name": f"Pet {i}", "category": CATEGORY, "status": "available"}
+        for i in range(1, 4)
+    ]
+    users = [{"id": 1, "username": "journal_user", "firstName": "Jo"}]
+    orders = [{"id": 1, "pet_id": 1, "quantity": 1, "status": "placed"}]
+    return pets, users, orders
+
+
+def open_backend(directory, **kwargs):
+    return JournaledMemoryBackend(str(directory), seed, **kwargs)
+
+
+def state(backend):
+    return (
+        dict(backend.pets.pets),
+        dict(backend.users.users),
+        dict(backend.orders.orders),
+        backend.pets.count_by_status(),
+    )
+
+
+@allure.title("Test that every kind of write is recovered from the journal")
+@allure.description(
+    "This test makes inserts, updates, renames and deletes in all three "
+    "stores, reopens the directory and checks the stores match, including "
+    "that IDs of deleted records are not handed out again."
+)
+def test_journal_recovers_writes(tmp_path):
+    logger.info("Running test: test_journal_recovers_writes")
+    backend = open_backend(tmp_path)
+    pets = backend.pets.insert_many(
+        [{"name": "New", "category": CATEGORY, "status": "pending"} for _ in range(3)]
+    )
+    backend.pets.update(1, status="sold")
+    backend.pets.update_many([{"id": 2, "name": "Renamed"}])
+    backend.pets.delete_many([3, pets[-1]["id"], 999])
+    backend.users.insert({"username": "second", "firstName": "Sec"})
+    backend.users.update("journal_user", {"username": "moved"})
+    backend.users.delete("second")
+    order = backend.orders.insert({"pet_id": 2, "quantity": 2, "notes": ["odd"]})
+    backend.orders.delete(1)
+    expected = state(backend)
+    backend.close()
+
+    recovered = open_backend(tmp_path)
+    assert state(recovered) == expected
+    assert recovered.orders.get(order["id"])["notes"] == ["odd"]
+    assert recovered.pets.insert({"name": "Next", "status": "available"})["id"] == (
+        pets[-1]["id"] + 1
+    )
+    assert recovered.users.insert({"username": "third"})["id"] == 3
+    recovered.close()
+    logger.info("Test passed: test_journal_recovers_writes")
+
+
+@allure.title("Test that recovery stops at a torn journal frame")
+@allure.description(
+    "This test cuts the last frame of the journal short, as a crash in the "
+    "middle of a write would, and checks that every earlier write is "
+    "recovered and that new writes still work and survive a restart."
+)
+def test_journal_torn_tail(tmp_path):
+    logger.info("Running test: test_journal_torn_tail")
+    # Each write is flushed as its own frame before the next one
+    backend = open_backend(tmp_path, fsync="always")
+    backend.pets.update(1, name="Kept")
+    backend.pets.update(2, name="Torn")
+    backend.close()
+
+    path = segment_path(str(tmp_path), numbered(str(tmp_path), "journal", "log")[-1])
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    recovered = open_backend(tmp_path)
+    assert recovered.pets.get(1)["name"] == "Kept"
+    assert recovered.pets.get(2)["name"] == "Pet 2"
+    recovered.pets.update(3, name="After")
+    recovered.close()
+
+    reopened = open_backend(tmp_path)
+    assert reopened.pets.get(1)["name"] == "Kept"
+    assert reopened.pets.get(3)["name"] == "After"
+    reopened.close()
+    logger.info("Test passed: test_journal_torn_tail")
+
+
+@allure.title("Test that checkpoints compact the journal")
+@allure.description(
+    "This test writes past the snapshot threshold, checks that a checkpoint "
+    "replaced the older snapshot and segments, and that the stores recover "
+    "from the new snapshot."
+)
+def test_journal_checkpoint(tmp_path):
+    logger.info("Running test: test_journal_checkpoint")
+    backend = open_backend(tmp_path, snapshot_every=10)
+    for i in range(25):
+        backend.pets.update(1 + i % 3, name=f"Name {i}")
+    backend.pets.delete(3)
+    backend.checkpoint()
+    expected = state(backend)
+    backend.close()
+
+    directory = str(tmp_path)
+    snapshots = numbered(directory, "snapshot", "snap")
+    assert len(snapshots) == 1 and snapshots[0] >= 2
+    assert numbered(directory, "journal", "log")[0] == snapshots[0]
+    recovered = open_backend(tmp_path)
+    assert state(recovered) == expected
+    assert recovered.pets.insert({"name": "Next", "status": "sold"})["id"] == 4
+    recovered.close()
+    logger.info("Test passed: test_journal_checkpoint")
+
+
+@allure.title("Test the always fsync policy and directory locking")
+@allure.description(
+    "This test checks that under the always policy a write returns only "
+    "once it is on disk, that concurrent writers all recover, that an "
+    "unknown policy or a journal for SQLite is rejected, and that a second "
+    "backend cannot open a directory in use."
+)
+def test_journal_always_policy(tmp_path):
+    logger.info("Running test: test_journal_always_policy")
+    backend = open_backend(tmp_path, fsync="always")
+    backend.pets.update(1, name="Durable")
+    assert backend.journal.flushed == backend.journal.appended
+
+    def add_orders(worker):
+        for i in range(50):
+            backend.orders.insert({"pet_id": 1, "quantity": worker * 100 + i})
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(add_orders, range(8)))
+    assert backend.journal.syncs <= backend.journal.appended
+
+    with pytest.raises(JournalError):
+        open_backend(tmp_path)
+    backend.close()
+    recovered = open_backend(tmp_path)
+    assert recovered.pets.get(1)["name"] == "Durable"
+    assert recovered.orders.count() == 1 + 8 * 50
+    recovered.close()
+
+    with pytest.raises(ValueError):
+        open_backend(tmp_path, fsync="sometimes")
+    with pytest.raises(ValueError):
+        create_backend("sqlite", journal=str(tmp_path))
+    logger.info("Test passed: test_journal_always_policy")
+
+
+def visible(backend):
+    return (
+        *state(backend),
+        backend.pets.search("pet"),
+        backend.pets.find_by_statuses(["available", "sold"], sort="name"),
+        backend.pets.find_by_category(category_id=1),
+        backend.users.search("jo"),
+    )
+
+
+@allure.title("Test that a write the journal cannot take is never seen")
+@allure.description(
+    "This test fails the journal just before writers append to it, and then "
+    "for good, and checks that each kind of write raises JournalError and "
+    "leaves every record and index as it was."
+)
+def test_journal_failure_leaves_stores_unchanged(tmp_path, monkeypatch):
+    logger.info("Running test: test_journal_failure_leaves_stores_unchanged")
+    backend = open_backend(tmp_path)
+    expected = visible(backend)
+    writes = [
+        lambda: backend.pets.insert_many(
+            [{"name": "Lost", "category": CATEGORY, "status": "sold"}]
+        ),
+        lambda: backend.pets.update_many(
+            [{"id": 1, "name": "Lost", "status": "sold"}, {"id": 1, "name": "Twice"}]
+        ),
+        lambda: backend.pets.delete_many([1, 2]),
+        lambda: backend.users.insert({"username": "lost", "firstName": "Jo"}),
+        lambda: backend.users.update("journal_user", {"username": "moved"}),
+        lambda: backend.users.delete("journal_user"),
+        lambda: backend.orders.insert({"pet_id": 1, "quantity": 1}),
+        lambda: backend.orders.delete(1),
+    ]
+
+    def fail(entries):
+        raise JournalError("The journal failed to write")
+
+    # The journal fails after a writer has checked it
+    monkeypatch.setattr(backend.journal, "append", fail)
+    for write in writes:
+        with pytest.raises(JournalError):
+            write()
+        assert visible(backend) == expected
+    monkeypatch.undo()
+
+    # Once it has failed, writers do not even start
+    backend.journal.error = OSError("No space left on device")
+    for write in writes:
+        with pytest.raises(JournalError):
+            write()
+        assert visible(backend) == expected
+    backend.journal.error = None
+    backend.close()
+    logger.info("Test passed: test_journal_failure_leaves_stores_unchanged")
+
+
+@allure.title("Test that readers never see a write the journal failed to take")
+@allure.description(
+    "This test reads pets by ID, status and name from another thread while "
+    "writers fail to append to the journal, and checks the reader never "
+    "sees any of the failed pets or changes."
+)
+def test_journal_failure_is_never_read(tmp_path, monkeypatch):
+    logger.info("Running test: test_journal_failure_is_never_read")
+    backend = open_backend(tmp_path)
+    pets = backend.pets
+
+    def fail(entries):
+        # Gives a reader time to find the write if it were already visible
+        time.sleep(0.001)
+        raise JournalError("The journal failed to write")
+
+    monkeypatch.setattr(backend.journal, "append", fail)
+    seen = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            seen.extend(pets.find_by_status("lost"))
+            seen.extend(pets.search("lost"))
+            seen.extend(pet for pet in map(pets.get, range(4, 8)) if pet)
+            seen.extend(pet for pet in map(pets.get, (1, 2)) if pet["name"] == "Lost")
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for _ in range(100):
+            with pytest.raises(JournalError):
+                pets.insert({"name": "Lost", "category": CATEGORY, "status": "lost"})
+            with pytest.raises(JournalError):
+                pets.update(1, name="Lost", status="lost")
+            with pytest.raises(JournalError):
+                pets.delete(2)
+    finally:
+        stop.set()
+        reader.join()
+    assert seen == []
+    assert pets.get(2) is not None
+    monkeypatch.undo()
+    backend.close()
+    logger.info("Test passed: test_journal_failure_is_never_read")
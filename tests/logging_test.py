@@ -0,0 +1,74 @@
+import io
+import logging
+import queue
+
+import allure
+
+from util.logging_config import BatchingQueueListener, BoundedQueueHandler, logger
+
+
+def make_record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+@allure.title("Test that a full log queue drops records")
+@allure.description(
+    "This test ensures that the queue handler never blocks on a full queue "
+    "with the drop policy and counts what it dropped."
+)
+def test_bounded_queue_handler_drops_when_full():
+    logger.info("Running test: test_bounded_queue_handler_drops_when_full")
+    log_queue = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue, overflow="drop")
+    for i in range(5):
+        handler.emit(make_record(f"message {i}"))
+    assert log_queue.qsize() == 2
+    assert handler.dropped == 3
+    logger.info("Test passed: test_bounded_queue_handler_drops_when_full")
+
+
+@allure.title("Test that the log writer flushes queued records")
+@allure.description(
+    "This test ensures that the background writer drains the queue in batches "
+    "and writes every record before it stops."
+)
+def test_batching_queue_listener_writes_all_records():
+    logger.info("Running test: test_batching_queue_listener_writes_all_records")
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    log_queue = queue.Queue(maxsize=100)
+    writer = BatchingQueueListener(log_queue, [target], batch_size=8)
+    handler = BoundedQueueHandler(log_queue, overflow="block", block_timeout=1.0)
+    writer.start()
+    for i in range(50):
+        handler.emit(make_record(f"message {i}"))
+    writer.stop()
+    assert stream.getvalue().splitlines() == [f"message {i}" for i in range(50)]
+    assert handler.dropped == 0
+    logger.info("Test passed: test_batching_queue_listener_writes_all_records")
+
+
+@allure.title("Test that the log writer skips a record it cannot format")
+@allure.description(
+    "This test ensures that a record whose message cannot be formatted is "
+    "reported to the handler and dropped alone, and that the writer keeps "
+    "writing the records after it."
+)
+def test_batching_queue_listener_skips_bad_record():
+    logger.info("Running test: test_batching_queue_listener_skips_bad_record")
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    errors = []
+    target.handleError = errors.append
+    log_queue = queue.Queue(maxsize=100)
+    writer = BatchingQueueListener(log_queue, [target], batch_size=8)
+    bad = logging.LogRecord("test", logging.INFO, __file__, 1, "%d", ("x",), None)
+    writer.start()
+    log_queue.put(bad)
+    log_queue.put(make_record("after"))
+    writer.stop()
+    assert stream.getvalue().splitlines() == ["after"]
+    assert errors == [bad]
+    logger.info("Test passed: test_batching_queue_listener_skips_bad_record")
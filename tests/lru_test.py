@@ -0,0 +1,44 @@
+import allure
+
+from util.logging_config import logger
+from util.lru import LRUCache
+
+
+@allure.title("Test that LRUCache evicts the least recently used entry")
+@allure.description(
+    "This test fills a small cache past its size and checks that the entry "
+    "read least recently is the one evicted."
+)
+def test_lru_cache_eviction():
+    logger.info("Running test: test_lru_cache_eviction")
+    cache = LRUCache(2)
+    cache.put("a", 1, cache.generation)
+    cache.put("b", 2, cache.generation)
+    assert cache.get("a") == 1
+    cache.put("c", 3, cache.generation)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+    logger.info("Test passed: test_lru_cache_eviction")
+
+
+@allure.title("Test that LRUCache drops values loaded before an invalidation")
+@allure.description(
+    "This test checks that invalidate() removes the entry and that a value "
+    "loaded under an older generation is not cached."
+)
+def test_lru_cache_invalidation():
+    logger.info("Running test: test_lru_cache_invalidation")
+    cache = LRUCache(10)
+    cache.put("a", "old", cache.generation)
+    generation = cache.generation
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    # A reader that started before the invalidation must not store its value
+    cache.put("a", "old", generation)
+    assert cache.get("a") is None
+    cache.put("a", "new", cache.generation)
+    assert cache.get("a") == "new"
+    logger.info("Test passed: test_lru_cache_invalidation")
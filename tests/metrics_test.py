@@ -0,0 +1,72 @@
+import allure
+import httpx
+
+from util.logging_config import logger
+from util.metrics import MetricsWriter, RequestMetrics
+
+
+def parse_samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+@allure.title("Test that RequestMetrics fills cumulative histogram buckets")
+@allure.description(
+    "This test records a few latencies and checks the exposed bucket counts, "
+    "sum, count and per-status counters."
+)
+def test_request_metrics_histogram():
+    logger.info("Running test: test_request_metrics_histogram")
+    metrics = RequestMetrics(buckets=(0.01, 0.1))
+    metrics.observe("GET", "/pet/{pet_id}", 200, 0.005)
+    metrics.observe("GET", "/pet/{pet_id}", 200, 0.05)
+    metrics.observe("GET", "/pet/{pet_id}", 404, 0.5)
+    writer = MetricsWriter()
+    metrics.write(writer)
+    samples = parse_samples(writer.text())
+
+    labels = 'method="GET",route="/pet/{pet_id}"'
+    name = "pet_store_request_duration_seconds"
+    assert samples[f'{name}_bucket{{{labels},le="0.01"}}'] == 1
+    assert samples[f'{name}_bucket{{{labels},le="0.1"}}'] == 2
+    assert samples[f'{name}_bucket{{{labels},le="+Inf"}}'] == 3
+    assert samples[f"{name}_count{{{labels}}}"] == 3
+    assert samples[f"{name}_sum{{{labels}}}"] == 0.555
+    assert samples[f'pet_store_requests_total{{{labels},status="200"}}'] == 2
+    assert samples[f'pet_store_requests_total{{{labels},status="404"}}'] == 1
+    logger.info("Test passed: test_request_metrics_histogram")
+
+
+@allure.title("Test the /metrics endpoint")
+@allure.description(
+    "This test makes requests to the server and checks that /metrics serves "
+    "the Prometheus text format with per-route counters by route template, "
+    "in-flight gauges and store sizes."
+)
+def test_metrics_endpoint(base_url):
+    logger.info("Running test: test_metrics_endpoint")
+    before = parse_samples(httpx.get(f"{base_url}/metrics").text)
+    assert httpx.get(f"{base_url}/pet/1").status_code == 200
+    assert httpx.get(f"{base_url}/pet/999999").status_code == 404
+
+    response = httpx.get(f"{base_url}/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE pet_store_request_duration_seconds histogram" in response.text
+    samples = parse_samples(response.text)
+
+    labels = 'method="GET",route="/pet/{pet_id}"'
+    for status in (200, 404):
+        key = f'pet_store_requests_total{{{labels},status="{status}"}}'
+        assert samples[key] == before.get(key, 0) + 1
+    # Only the /metrics request itself is still being handled
+    assert samples['pet_store_requests_in_flight{router="pets"}'] == 0
+    assert samples['pet_store_requests_in_flight{router="other"}'] == 1
+    for store in ("pets", "users", "orders"):
+        assert samples[f'pet_store_records{{store="{store}"}}'] >= 0
+    assert "pet_store_sessions" in samples
+    logger.info("Test passed: test_metrics_endpoint")
@@ -0,0 +1,47 @@
+import allure
+
+from util.logging_config import logger
+from util.passwords import PasswordHasher, hash_password, verify_password
+
+
+@allure.title("Test that password hashes verify only the right password")
+@allure.description(
+    "This test checks that a hash records its cost, is salted, verifies the "
+    "password it was made from and nothing else, and that plaintext stored "
+    "before hashing still verifies."
+)
+def test_hash_and_verify_password():
+    logger.info("Running test: test_hash_and_verify_password")
+    stored = hash_password("hunter2", iterations=1_000)
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert "hunter2" not in stored
+    assert stored != hash_password("hunter2", iterations=1_000)
+    assert verify_password("hunter2", stored)
+    assert not verify_password("hunter3", stored)
+    # Sending the stored hash as the password must not work either
+    assert not verify_password(stored, stored)
+    assert verify_password("legacy", "legacy")
+    assert not verify_password("legacy2", "legacy")
+    logger.info("Test passed: test_hash_and_verify_password")
+
+
+@allure.title("Test that PasswordHasher works through its process pool")
+@allure.description(
+    "This test hashes and verifies passwords in a one-process pool and "
+    "checks the results match hashing on the calling thread."
+)
+def test_password_hasher_pool():
+    logger.info("Running test: test_password_hasher_pool")
+    hasher = PasswordHasher(iterations=1_000, workers=1)
+    try:
+        hashes = hasher.hash_many([f"password{i}" for i in range(10)])
+        assert all(verify_password(f"password{i}", h) for i, h in enumerate(hashes))
+        stored = hasher.hash("secret")
+        assert hasher.verify("secret", stored)
+        assert not hasher.verify("not secret", stored)
+    finally:
+        hasher.close()
+    inline = PasswordHasher(iterations=1_000, workers=0)
+    assert inline.verify("secret", inline.hash("secret"))
+    assert inline.pool is None
+    logger.info("Test passed: test_password_hasher_pool")
@@ -219,3 +219,349 @@ def test_delete_pet_success(base_url):
         response.status_code == 404
     ), f"Unexpected status code: {response.status_code}"
     logger.info("Test passed: test_delete_pet_success")
+
+
+@allure.title("Test that status lookups follow pet status changes")
+@allure.description(
+    "This test ensures that findByStatus reflects add, update and delete of a pet."
+)
+def test_find_pets_by_status_follows_updates(base_url):
+    logger.info("Running test: test_find_pets_by_status_follows_updates")
+    new_pet_data = {
+        "name": "Nibbles",
+        "category": {"id": 5, "name": "Rodents"},
+        "status": "reserved",
+    }
+    response = httpx.post(f"{base_url}/pet", json=new_pet_data)
+    assert (
+        response.status_code == 201
+    ), f"Unexpected status code: {response.status_code}"
+    pet_id = response.json()["id"]
+
+    response = httpx.get(f"{base_url}/pet/findByStatus?status=reserved")
+    assert [pet["id"] for pet in response.json()] == [pet_id]
+
+    response = httpx.post(f"{base_url}/pet/{pet_id}", data={"status": "quarantine"})
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(f"{base_url}/pet/findByStatus?status=reserved")
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(f"{base_url}/pet/findByStatus?status=quarantine")
+    assert [pet["name"] for pet in response.json()] == ["Nibbles"]
+
+    response = httpx.delete(f"{base_url}/pet/{pet_id}")
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(f"{base_url}/pet/findByStatus?status=quarantine")
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+    logger.info("Test passed: test_find_pets_by_status_follows_updates")
+
+
+@allure.title("Test for paginating and streaming pets by status")
+@allure.description(
+    "This test walks findByStatus page by page with the returned cursor and "
+    "checks that the streamed result matches the pages."
+)
+def test_find_pets_by_status_pagination(base_url):
+    logger.info("Running test: test_find_pets_by_status_pagination")
+    pet_ids = []
+    for i in range(5):
+        new_pet_data = {
+            "name": f"Paged {i}",
+            "category": {"id": 6, "name": "Fish"},
+            "status": "paged",
+        }
+        response = httpx.post(f"{base_url}/pet", json=new_pet_data)
+        pet_ids.append(response.json()["id"])
+
+    seen = []
+    params = {"status": "paged", "limit": 2}
+    while True:
+        response = httpx.get(f"{base_url}/pet/findByStatus", params=params)
+        assert (
+            response.status_code == 200
+        ), f"Unexpected status code: {response.status_code}"
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(pet["id"] for pet in page)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == pet_ids
+
+    response = httpx.get(
+        f"{base_url}/pet/findByStatus",
+        params={"status": "paged", "stream": "true", "limit": 2},
+    )
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert [pet["id"] for pet in response.json()] == pet_ids
+
+    response = httpx.get(
+        f"{base_url}/pet/findByStatus",
+        params={"status": "paged", "stream": "true", "cursor": pet_ids[2]},
+    )
+    assert [pet["id"] for pet in response.json()] == pet_ids[3:]
+
+    for pet_id in pet_ids:
+        httpx.delete(f"{base_url}/pet/{pet_id}")
+    logger.info("Test passed: test_find_pets_by_status_pagination")
+
+
+@allure.title("Test for finding pets of several statuses sorted by name")
+@allure.description(
+    "This test asks findByStatus for pets of two statuses sorted by name in "
+    "descending order, pages through them with the returned cursor, streams "
+    "the same listing and checks invalid sort and cursor values."
+)
+def test_find_pets_by_statuses_sorted(base_url):
+    logger.info("Running test: test_find_pets_by_statuses_sorted")
+    pets = [("Émile", "sorted-a"), ("Alpha", "sorted-b"), ("Alpha", "sorted-a")]
+    pet_ids = []
+    for name, status in pets:
+        new_pet_data = {"name": name, "category": {"id": 6}, "status": status}
+        response = httpx.post(f"{base_url}/pet", json=new_pet_data)
+        pet_ids.append(response.json()["id"])
+    expected = [pet_ids[0], pet_ids[2], pet_ids[1]]
+
+    seen = []
+    params = {
+        "status": ["sorted-a", "sorted-b", "sorted-none"],
+        "sort": "name",
+        "order": "desc",
+        "limit": 1,
+    }
+    while True:
+        response = httpx.get(f"{base_url}/pet/findByStatus", params=params)
+        assert (
+            response.status_code == 200
+        ), f"Unexpected status code: {response.status_code}"
+        seen.extend(pet["id"] for pet in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == expected
+
+    params = {"status": ["sorted-b", "sorted-a"], "stream": "true", "limit": 2}
+    response = httpx.get(f"{base_url}/pet/findByStatus", params=params)
+    assert [pet["id"] for pet in response.json()] == sorted(pet_ids)
+    for params in (
+        {"status": "sorted-a", "sort": "status"},
+        {"status": "sorted-a", "cursor": "x"},
+        {"status": "sorted-a", "sort": "name", "cursor": "12"},
+    ):
+        response = httpx.get(f"{base_url}/pet/findByStatus", params=params)
+        assert (
+            response.status_code == 422
+        ), f"Unexpected status code: {response.status_code}"
+
+    for pet_id in pet_ids:
+        httpx.delete(f"{base_url}/pet/{pet_id}")
+    logger.info("Test passed: test_find_pets_by_statuses_sorted")
+
+
+@allure.title("Test for searching pets by name")
+@allure.description(
+    "This test searches pets by name word prefixes, pages through the "
+    "results with the returned cursor and checks that renames and deletes "
+    "are reflected."
+)
+def test_search_pets(base_url):
+    logger.info("Running test: test_search_pets")
+    names = ["Zorblat Major", "zorblat minor", "Little Zorbie", "Quux"]
+    pet_ids = []
+    for name in names:
+        new_pet_data = {
+            "name": name,
+            "category": {"id": 1, "name": "Dogs"},
+            "status": "available",
+        }
+        response = httpx.post(f"{base_url}/pet", json=new_pet_data)
+        pet_ids.append(response.json()["id"])
+
+    seen = []
+    params = {"q": "ZORB", "limit": 2}
+    while True:
+        response = httpx.get(f"{base_url}/pet/search", params=params)
+        assert (
+            response.status_code == 200
+        ), f"Unexpected status code: {response.status_code}"
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(pet["id"] for pet in page)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == pet_ids[:3]
+
+    response = httpx.get(f"{base_url}/pet/search", params={"q": "zorblat mi"})
+    assert [pet["name"] for pet in response.json()] == ["zorblat minor"]
+    response = httpx.get(f"{base_url}/pet/search", params={"q": ""})
+    assert (
+        response.status_code == 422
+    ), f"Unexpected status code: {response.status_code}"
+
+    httpx.post(f"{base_url}/pet/{pet_ids[3]}", data={"name": "Zorbo"})
+    httpx.delete(f"{base_url}/pet/{pet_ids[0]}")
+    response = httpx.get(f"{base_url}/pet/search", params={"q": "zorb"})
+    assert [pet["id"] for pet in response.json()] == pet_ids[1:]
+
+    for pet_id in pet_ids[1:]:
+        httpx.delete(f"{base_url}/pet/{pet_id}")
+    logger.info("Test passed: test_search_pets")
+
+
+@allure.title("Test for finding pets by category")
+@allure.description(
+    "This test finds pets by category ID and name, with and without a "
+    "status, pages through the results with the returned cursor and checks "
+    "the errors for a missing or unknown category."
+)
+def test_find_pets_by_category(base_url):
+    logger.info("Running test: test_find_pets_by_category")
+    category = {"id": 4242, "name": "Axolotls"}
+    statuses = ["available", "sold", "available"]
+    pet_ids = []
+    for i, status in enumerate(statuses):
+        new_pet_data = {"name": f"Axel {i}", "category": category, "status": status}
+        response = httpx.post(f"{base_url}/pet", json=new_pet_data)
+        pet_ids.append(response.json()["id"])
+
+    seen = []
+    params = {"category_id": 4242, "limit": 2}
+    while True:
+        response = httpx.get(f"{base_url}/pet/findByCategory", params=params)
+        assert (
+            response.status_code == 200
+        ), f"Unexpected status code: {response.status_code}"
+        seen.extend(pet["id"] for pet in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == pet_ids
+
+    response = httpx.get(
+        f"{base_url}/pet/findByCategory",
+        params={"category_name": "Axolotls", "status": "available"},
+    )
+    assert [pet["id"] for pet in response.json()] == [pet_ids[0], pet_ids[2]]
+    response = httpx.get(f"{base_url}/pet/findByCategory", params={"status": "sold"})
+    assert (
+        response.status_code == 400
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(
+        f"{base_url}/pet/findByCategory",
+        params={"category_id": 4242, "category_name": "Dogs"},
+    )
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+
+    for pet_id in pet_ids:
+        httpx.delete(f"{base_url}/pet/{pet_id}")
+    response = httpx.get(
+        f"{base_url}/pet/findByCategory", params={"category_name": "Axolotls"}
+    )
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+    logger.info("Test passed: test_find_pets_by_category")
+
+
+@allure.title("Test for batch create, update and delete of pets")
+@allure.description(
+    "This test applies batches of pet changes and checks the per-item results, "
+    "including entries that reference a missing pet."
+)
+def test_pet_batch_operations(base_url):
+    logger.info("Running test: test_pet_batch_operations")
+    new_pets = [
+        {
+            "name": f"Batch {i}",
+            "category": {"id": 7, "name": "Birds"},
+            "status": "batched",
+        }
+        for i in range(3)
+    ]
+    response = httpx.post(f"{base_url}/pet/batch", json=new_pets)
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    results = response.json()
+    assert [result["status"] for result in results] == [201, 201, 201]
+    pet_ids = [result["pet"]["id"] for result in results]
+    assert [result["pet"]["name"] for result in results] == [
+        "Batch 0",
+        "Batch 1",
+        "Batch 2",
+    ]
+
+    updates = [
+        {"id": pet_ids[0], "name": "Batch 0 Updated", "status": "batched"},
+        {"id": 999, "name": "Ghost Pet", "status": "batched"},
+    ]
+    response = httpx.put(f"{base_url}/pet/batch", json=updates)
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    results = response.json()
+    assert results[0]["status"] == 200
+    assert results[0]["pet"]["name"] == "Batch 0 Updated"
+    assert results[1] == {"id": 999, "status": 404, "detail": "Pet not found"}
+
+    response = httpx.put(f"{base_url}/pet/batch", json=[{"id": "not a number"}])
+    assert (
+        response.status_code == 422
+    ), f"Unexpected status code: {response.status_code}"
+
+    response = httpx.post(f"{base_url}/pet/batchDelete", json=pet_ids + [999])
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert [result["status"] for result in response.json()] == [200, 200, 200, 404]
+    response = httpx.get(f"{base_url}/pet/findByStatus?status=batched")
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+    logger.info("Test passed: test_pet_batch_operations")
+
+
+@allure.title("Test conditional GET of a pet")
+@allure.description(
+    "This test checks that a pet carries an ETag, that If-None-Match with it "
+    "returns 304 and that an update moves the ETag."
+)
+def test_get_pet_conditional(base_url):
+    logger.info("Running test: test_get_pet_conditional")
+    pet_data = {"name": "Etag", "category": {"id": 1}, "status": "etagged"}
+    pet_id = httpx.post(f"{base_url}/pet", json=pet_data).json()["id"]
+    response = httpx.get(f"{base_url}/pet/{pet_id}")
+    etag = response.headers["ETag"]
+
+    response = httpx.get(f"{base_url}/pet/{pet_id}", headers={"If-None-Match": etag})
+    assert (
+        response.status_code == 304
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.content == b""
+
+    httpx.post(f"{base_url}/pet/{pet_id}", data={"name": "Etag Renamed"})
+    response = httpx.get(f"{base_url}/pet/{pet_id}", headers={"If-None-Match": etag})
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json()["name"] == "Etag Renamed"
+    assert response.headers["ETag"] != etag
+
+    httpx.delete(f"{base_url}/pet/{pet_id}")
+    response = httpx.get(f"{base_url}/pet/{pet_id}", headers={"If-None-Match": "*"})
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+    logger.info("Test passed: test_get_pet_conditional")
@@ -0,0 +1,94 @@
+import os
+import pstats
+import time
+
+import allure
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI
+
+from util.logging_config import logger
+from util.profiling import ProfiledRoute, ProfilingMiddleware, RequestProfiler
+
+
+def busy_sync_lookup():
+    return sum(range(10_000))
+
+
+async def busy_async_lookup():
+    return sum(range(10_000))
+
+
+def profiled_app(profiler):
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/sync/{item_id}")
+    def get_sync(item_id: int):
+        return {"id": item_id, "total": busy_sync_lookup()}
+
+    @router.get("/async/{item_id}")
+    async def get_async(item_id: int):
+        return {"id": item_id, "total": await busy_async_lookup()}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    return app
+
+
+@allure.title("Test that a request with the profiling token is profiled")
+@allure.description(
+    "This test sends requests with and without the X-Profile token and checks "
+    "that only the first are profiled, that work done in the threadpool by a "
+    "sync route is in the profile, and that the summary is written."
+)
+@pytest.mark.asyncio
+async def test_profile_on_header(tmp_path):
+    logger.info("Running test: test_profile_on_header")
+    profiler = RequestProfiler(rate=0, token="secret", directory=str(tmp_path))
+    transport = httpx.ASGITransport(app=profiled_app(profiler))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/sync/1")
+        assert response.status_code == 200
+        assert "x-profile-id" not in response.headers
+        assert not os.listdir(tmp_path)
+
+        for path in ("/sync/1", "/async/2"):
+            response = await client.get(path, headers={"X-Profile": "secret"})
+            assert response.status_code == 200
+            assert response.headers["x-profile-id"]
+
+    profiles = sorted(name for name in os.listdir(tmp_path) if "GET" in name)
+    assert len(profiles) == 2
+    assert "sync_item_id" in profiles[0] or "sync_item_id" in profiles[1]
+    assert (tmp_path / "summary.txt").read_text()
+    summary = pstats.Stats(str(tmp_path / "summary.prof"))
+    functions = {name for _, _, name in summary.stats}
+    assert {"busy_sync_lookup", "busy_async_lookup"} <= functions
+    logger.info("Test passed: test_profile_on_header")
+
+
+@allure.title("Test that sampled profiles are capped at the configured count")
+@allure.description(
+    "This test profiles every request and checks that only the newest "
+    "`keep` per-request profiles stay on disk."
+)
+@pytest.mark.asyncio
+async def test_profile_sampling_keeps_newest(tmp_path):
+    logger.info("Running test: test_profile_sampling_keeps_newest")
+    profiler = RequestProfiler(rate=1, token=None, directory=str(tmp_path), keep=2)
+    transport = httpx.ASGITransport(app=profiled_app(profiler))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        ids = []
+        for i in range(4):
+            response = await client.get(f"/async/{i}")
+            ids.append(response.headers["x-profile-id"])
+            time.sleep(0.001)
+
+    profiles = [name for name in os.listdir(tmp_path) if name.endswith(".prof")]
+    profiles.remove("summary.prof")
+    assert len(profiles) == 2
+    assert {name.rsplit("-", 1)[1][: -len(".prof")] for name in profiles} == set(
+        ids[2:]
+    )
+    logger.info("Test passed: test_profile_sampling_keeps_newest")
@@ -0,0 +1,84 @@
+import json
+
+import allure
+
+from storage import records
+from storage.records import MAX_LAYOUTS, CompactTable
+from util.logging_config import logger
+
+
+@allure.title("Test that compact records serialise like the dicts they came from")
+@allure.description(
+    "This test packs pet, user and order records with keys in various orders "
+    "and checks that unpacking gives a new dict with the same JSON."
+)
+def test_compact_round_trip():
+    logger.info("Running test: test_compact_round_trip")
+    records = {
+        "pets": [
+            {"id": 1, "name": "Buddy", "category": {"id": 1, "name": "Dogs"}},
+            {"status": "sold", "id": 2, "name": "Kitty", "tags": [{"id": 1}]},
+            {"id": 3, "name": None, "photoUrls": [], "status": "pending"},
+        ],
+        "users": [{"username": "ada", "email": "ada@example.com", "userStatus": 1}],
+        "orders": [{"id": 1, "petId": 2, "quantity": 1, "complete": False}],
+    }
+    for table, rows in records.items():
+        compact = CompactTable(table)
+        for row in rows:
+            packed = compact.pack(row)
+            unpacked = compact.unpack(packed)
+            assert unpacked is not row
+            assert json.dumps(unpacked) == json.dumps(row)
+    logger.info("Test passed: test_compact_round_trip")
+
+
+@allure.title("Test that compact records share equal status and category values")
+@allure.description(
+    "This test packs pets parsed from JSON, checks that their equal categories "
+    "and statuses become one object, that unhashable values are kept as they "
+    "are and that records beyond MAX_LAYOUTS key orders are kept as dicts."
+)
+def test_compact_interning_and_fallback():
+    logger.info("Running test: test_compact_interning_and_fallback")
+    compact = CompactTable("pets")
+    line = '{"id": 1, "category": {"id": 1, "name": "Dogs"}, "status": "sold"}'
+    first, second = (compact.pack(json.loads(line)) for _ in range(2))
+    assert first[0] is second[0]
+    assert first[2] is second[2]
+    assert first[3] is second[3]
+    # Equal records packed by different tables still compare equal
+    assert first == CompactTable("pets").pack(json.loads(line))
+
+    odd = {"id": 2, "category": [1, 2], "status": "sold"}
+    assert compact.unpack(compact.pack(odd)) == odd
+
+    for i in range(MAX_LAYOUTS):
+        compact.pack({f"field{i}": i})
+    record = {"id": 3, "unusual": True}
+    assert compact.pack(record) is record
+    assert compact.unpack(record) is record
+    logger.info("Test passed: test_compact_interning_and_fallback")
+
+
+@allure.title("Test that a table interns a bounded number of values")
+@allure.description(
+    "This test packs pets with more distinct statuses than MAX_INTERNED and "
+    "checks that the table stops interning new values at the limit, while "
+    "values interned before it are still shared and every record reads back "
+    "unchanged."
+)
+def test_compact_interning_is_bounded(monkeypatch):
+    logger.info("Running test: test_compact_interning_is_bounded")
+    monkeypatch.setattr(records, "MAX_INTERNED", 8)
+    compact = CompactTable("pets")
+    pets = [{"id": i, "status": f"status {i}"} for i in range(100)]
+    packed = [compact.pack(pet) for pet in pets]
+    assert len(compact.values) == 8
+    assert len(compact.shared) == 8
+    assert [compact.unpack(p) for p in packed] == pets
+
+    again = json.loads('{"id": 100, "status": "status 0"}')
+    assert compact.pack(again)[2] is packed[0][2]
+    assert len(compact.values) == 8
+    logger.info("Test passed: test_compact_interning_is_bounded")
@@ -0,0 +1,76 @@
+import allure
+
+from util.logging_config import logger
+from util.sessions import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@allure.title("Test that sessions expire after their TTL")
+@allure.description(
+    "This test checks with a fake clock that a session is accepted until its "
+    "TTL passes, is rejected right after even before a sweep, and that the "
+    "sweep then drops it from the table."
+)
+def test_sessions_expire():
+    logger.info("Running test: test_sessions_expire")
+    clock = FakeClock()
+    sessions = SessionStore(ttl=10, clock=clock, background=False)
+    token = sessions.create("vex")
+    clock.now += 5
+    later = sessions.create("vax")
+    assert sessions.get(token) == "vex"
+
+    clock.now += 4.9
+    assert sessions.sweep() == 0
+    assert sessions.get(token) == "vex"
+    clock.now += 0.1
+    assert sessions.get(token) is None
+    assert len(sessions) == 2
+
+    assert sessions.sweep() == 1
+    assert len(sessions) == 1
+    assert sessions.get(later) == "vax"
+    clock.now += 5
+    assert sessions.sweep() == 1
+    assert len(sessions) == 0
+    assert sessions.wheel == {}
+    logger.info("Test passed: test_sessions_expire")
+
+
+@allure.title("Test that revoked sessions are rejected and skipped by the sweep")
+@allure.description(
+    "This test revokes sessions, checks a token can only be revoked once, "
+    "that the sweeper passes over revoked tokens still in the wheel and that "
+    "revoking a user ends all of its sessions and only those."
+)
+def test_sessions_revoke():
+    logger.info("Running test: test_sessions_revoke")
+    clock = FakeClock()
+    sessions = SessionStore(ttl=10, clock=clock, background=False)
+    tokens = [sessions.create(f"user{i}") for i in range(5)]
+    assert len(set(tokens)) == 5
+    assert sessions.revoke(tokens[0]) == "user0"
+    assert sessions.revoke(tokens[0]) is None
+    assert sessions.get(tokens[0]) is None
+    assert sessions.revoke("not a token") is None
+
+    clock.now += 10
+    assert sessions.revoke(tokens[1]) is None
+    assert sessions.sweep() == 3
+    assert len(sessions) == 0
+    assert sessions.tokens == {}
+
+    tokens = [sessions.create("vex") for _ in range(3)]
+    other = sessions.create("vax")
+    assert sessions.revoke_user("vex") == 3
+    assert all(sessions.get(token) is None for token in tokens)
+    assert sessions.get(other) == "vax"
+    assert sessions.revoke_user("vex") == 0
+    logger.info("Test passed: test_sessions_revoke")
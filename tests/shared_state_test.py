@@ -0,0 +1,108 @@
+import os
+import random
+import subprocess
+import sys
+import time
+
+import allure
+import httpx
+import pytest
+
+from api import state
+from util.logging_config import logger
+
+
+def start_workers(port, workers):
+    env = {**os.environ, "PET_STORE_LOG_MODE": "off", "PET_STORE_BACKEND": "memory"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "api.serve", "--workers", str(workers)]
+        + ["--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(60):
+        try:
+            if httpx.get(f"{base_url}/docs", timeout=1.0).status_code == 200:
+                return process, base_url
+        except httpx.RequestError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("Workers failed to start")
+
+
+@allure.title("Test that several workers share one store")
+@allure.description(
+    "This test runs the API with api.serve in two workers and checks that "
+    "changes made through any worker are seen by every request."
+)
+def test_workers_share_state():
+    logger.info("Running test: test_workers_share_state")
+    process, base_url = start_workers(random.randint(10000, 60000), 2)
+    try:
+        pet_data = {"name": "Shared", "category": {"id": 1}, "status": "shared"}
+        pet_ids = [
+            httpx.post(f"{base_url}/pet", json=pet_data).json()["id"] for _ in range(5)
+        ]
+        # Distinct IDs from one counter, whichever worker served the request
+        assert len(set(pet_ids)) == 5
+
+        # Each request opens a new connection, so they spread over workers
+        for pet_id in pet_ids:
+            response = httpx.get(f"{base_url}/pet/{pet_id}")
+            assert (
+                response.status_code == 200
+            ), f"Unexpected status code: {response.status_code}"
+        inventory = httpx.get(f"{base_url}/store/inventory").json()
+        assert inventory["shared"] == 5
+
+        for pet_id in pet_ids:
+            httpx.delete(f"{base_url}/pet/{pet_id}")
+        for pet_id in pet_ids:
+            response = httpx.get(f"{base_url}/pet/{pet_id}")
+            assert (
+                response.status_code == 404
+            ), f"Unexpected status code: {response.status_code}"
+            assert response.json()["detail"] == "Pet not found"
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    logger.info("Test passed: test_workers_share_state")
+
+
+@allure.title("Test that workers only get proxies to the state process's stores")
+@allure.description(
+    "This test checks that with a state address set, shared() returns the "
+    "manager's proxy without building the store, refuses to connect without "
+    "an auth key, and that a state-only server will not start without one."
+)
+def test_workers_never_build_stores(monkeypatch):
+    logger.info("Running test: test_workers_never_build_stores")
+
+    class Manager:
+        def pet_store(self):
+            return "proxy"
+
+    def build():
+        raise AssertionError("A worker built a store")
+
+    monkeypatch.setattr(state, "STATE_ADDRESS", "127.0.0.1:8765")
+    monkeypatch.setattr(state, "STATE_AUTHKEY", None)
+    with pytest.raises(ValueError):
+        state.shared("pet_store", build)
+    monkeypatch.setattr(state, "STATE_AUTHKEY", "secret")
+    monkeypatch.setattr(state, "_manager", Manager())
+    assert state.shared("pet_store", build) == "proxy"
+
+    env = {**os.environ, "PET_STORE_LOG_MODE": "off"}
+    env.pop("PET_STORE_STATE_AUTHKEY", None)
+    result = subprocess.run(
+        [sys.executable, "-m", "api.serve", "--state-only"],
+        env=env,
+        capture_output=True,
+        timeout=60,
+    )
+    assert result.returncode != 0
+    assert b"PET_STORE_STATE_AUTHKEY" in result.stderr
+    logger.info("Test passed: test_workers_never_build_stores")
@@ -0,0 +1,140 @@
+import json
+
+import allure
+import pytest
+
+from storage import create_backend
+from storage.snapshot import Snapshot, SnapshotError, write_snapshot
+from util.logging_config import logger
+
+CATEGORY = {"id": 1, "name": "Dogs"}
+
+
+def sample_records(n):
+    pets = [
+        {"id": i, "name": f"Pet {i}", "category": CATEGORY, "status": "available"}
+        for i in range(1, n + 1)
+    ]
+    users = [
+        {
+            "id": 7,
+            "username": "snapshot_user",
+            "firstName": "Snap",
+            "lastName": "Shot",
+            "email": "snap@example.com",
+            "password": "pbkdf2_sha256$1$c2FsdA==$aGFzaA==",
+            "phone": "555-0000",
+            "userStatus": 0,
+        }
+    ]
+    orders = [
+        {
+            "id": 3,
+            "pet_id": 1,
+            "quantity": 2,
+            "shipDate": "2024-12-23T10:00:00Z",
+            "status": "placed",
+            "complete": True,
+        }
+    ]
+    return pets, users, orders
+
+
+@allure.title("Test that a snapshot reads back the records written")
+@allure.description(
+    "This test writes pets over several blocks plus a user and an order, and "
+    "checks that every table reads back equal, with shared enum values."
+)
+def test_snapshot_round_trip(tmp_path):
+    logger.info("Running test: test_snapshot_round_trip")
+    path = str(tmp_path / "seed.snap")
+    pets, users, orders = sample_records(10)
+    counts = write_snapshot(path, iter(pets), users, orders, block_size=3)
+    assert counts == {"pets": 10, "users": 1, "orders": 1}
+
+    snapshot = Snapshot(path)
+    assert snapshot.counts == counts
+    # Tables are independent, so they can be read in any order
+    assert list(snapshot.orders()) == orders
+    loaded = list(snapshot.pets())
+    assert loaded == pets
+    assert loaded[0]["category"] is loaded[2]["category"]
+    assert list(snapshot.users()) == users
+    logger.info("Test passed: test_snapshot_round_trip")
+
+
+@allure.title("Test seeding a backend from a snapshot")
+@allure.description(
+    "This test seeds memory and SQLite backends from a snapshot and checks "
+    "the records, the status index and that new IDs follow the seeded ones."
+)
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_create_backend_from_snapshot(tmp_path, monkeypatch, kind):
+    logger.info(f"Running test: test_create_backend_from_snapshot with {kind}")
+    path = str(tmp_path / "seed.snap")
+    write_snapshot(path, *sample_records(5))
+    monkeypatch.setattr("storage.SQLITE_PATH", str(tmp_path / "seed.db"))
+
+    backend = create_backend(kind, snapshot=path, journal=None)
+    assert backend.pets.count() == 5
+    assert backend.pets.count_by_status() == {"available": 5}
+    assert backend.users.get("snapshot_user")["id"] == 7
+    assert backend.orders.get(3)["complete"] is True
+    assert backend.users.insert({"username": "next_user"})["id"] == 8
+    assert backend.orders.insert({"pet_id": 2})["id"] == 4
+    if kind == "sqlite":
+        backend.close()
+    logger.info(f"Test passed: test_create_backend_from_snapshot with {kind}")
+
+
+@allure.title("Test that records outside the schema survive a snapshot")
+@allure.description(
+    "This test writes records with missing or extra fields, values of other "
+    "types and strings with NUL, and checks they read back unchanged next "
+    "to ordinary records."
+)
+def test_snapshot_odd_records(tmp_path):
+    logger.info("Running test: test_snapshot_odd_records")
+    path = str(tmp_path / "odd.snap")
+    pets, users, orders = sample_records(3)
+    pets[1] = {**pets[1], "name": "bad\0name"}
+    pets[2] = {**pets[2], "tags": ["calm"]}
+    orders.append({"id": 4, "pet_id": 2})
+    orders.append({**orders[0], "id": 5, "quantity": "two"})
+    write_snapshot(path, pets, users, orders)
+
+    snapshot = Snapshot(path)
+    assert list(snapshot.pets()) == pets
+    assert list(snapshot.orders()) == orders
+    logger.info("Test passed: test_snapshot_odd_records")
+
+
+@allure.title("Test that enum values keep their key order through a snapshot")
+@allure.description(
+    "This test writes pets whose categories have keys out of sorted order and "
+    "checks that each pet reads back serialising to the same JSON."
+)
+def test_snapshot_keeps_key_order(tmp_path):
+    logger.info("Running test: test_snapshot_keeps_key_order")
+    path = str(tmp_path / "order.snap")
+    pets, users, orders = sample_records(2)
+    pets[0] = {**pets[0], "category": {"name": "Dogs", "id": 1}}
+    pets[1] = {**pets[1], "category": {"name": "Cats", "id": 2, "extra": True}}
+    write_snapshot(path, pets, users, orders)
+
+    loaded = list(Snapshot(path).pets())
+    assert [json.dumps(pet) for pet in loaded] == [json.dumps(pet) for pet in pets]
+    logger.info("Test passed: test_snapshot_keeps_key_order")
+
+
+@allure.title("Test that invalid snapshots are rejected")
+@allure.description(
+    "This test checks that a file that is not a snapshot raises SnapshotError."
+)
+def test_snapshot_rejects_invalid(tmp_path):
+    logger.info("Running test: test_snapshot_rejects_invalid")
+    path = tmp_path / "not.snap"
+    path.write_bytes(b"{}" * 64)
+    with pytest.raises(SnapshotError):
+        Snapshot(str(path))
+    logger.info("Test passed: test_snapshot_rejects_invalid")
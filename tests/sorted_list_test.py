@@ -0,0 +1,100 @@
+import random
+
+import allure
+
+from util.logging_config import logger
+from util.sorted_list import SortedList, intersect
+
+
+@allure.title("Test that SortedList matches a sorted set")
+@allure.description(
+    "This test applies random inserts and removes to a SortedList with small "
+    "buckets and nodes, so that both split and empty, compares it with a plain "
+    "sorted set after every step and checks that earlier versions stay "
+    "unchanged."
+)
+def test_sorted_list_matches_sorted_set():
+    logger.info("Running test: test_sorted_list_matches_sorted_set")
+    rnd = random.Random(7)
+    values = SortedList(rnd.sample(range(1000), 100), load=4, fanout=2)
+    expected = set(values)
+    for _ in range(2000):
+        value = rnd.randrange(1000)
+        previous, previous_items = values, list(values)
+        choice = rnd.random()
+        if choice < 0.1:
+            batch = sorted(rnd.sample(range(1000), 20))
+            values = values.inserted_many(batch)
+            expected.update(batch)
+        elif choice < 0.55:
+            values = values.inserted(value)
+            expected.add(value)
+        else:
+            values = values.removed(value)
+            expected.discard(value)
+        assert len(values) == len(expected)
+        # Older versions are never modified by later updates
+        assert list(previous) == previous_items
+    assert list(values) == sorted(expected)
+    for after in (None, -1, 0, 500, 999):
+        start = -1 if after is None else after
+        assert list(values.irange(after)) == [v for v in sorted(expected) if v > start]
+        assert [v for bucket in values.ibuckets(after) for v in bucket] == list(
+            values.irange(after)
+        )
+    for before in (None, -1, 0, 500, 999, 1000):
+        end = 1000 if before is None else before
+        assert list(values.irange_desc(before)) == [
+            v for v in sorted(expected, reverse=True) if v < end
+        ]
+    for start in (-1, 0, 500, 999, 1000):
+        above = [v for v in sorted(expected) if v >= start]
+        assert list(values.irange_from(start)) == above
+        last = values.bucket_last(start)
+        assert last == (None if not above else max(values.between(start, last)))
+        for end in (start - 1, start, 600, 1000, None):
+            between = [v for v in above if end is None or v <= end]
+            assert values.between(start, end) == between
+            assert values.count_between(start, end) == len(between)
+    assert values.between(None, 500) == [v for v in sorted(expected) if v <= 500]
+    for after in (None, -1, 0, 500, 999):
+        above = list(values.irange(after))
+        assert values.first_after(after) == (above[0] if above else None)
+    assert all(value in values for value in expected)
+    assert 1000 not in values
+    for value in sorted(expected, key=lambda _: rnd.random()):
+        values = values.removed(value)
+        expected.discard(value)
+        assert list(values) == sorted(expected)
+        assert values.count_between(None, None) == len(expected)
+    assert not values and values.first_after(None) is None
+    logger.info("Test passed: test_sorted_list_matches_sorted_set")
+
+
+@allure.title("Test that intersect() matches set intersection")
+@allure.description(
+    "This test intersects groups of random lists of very different sizes "
+    "and checks the result against sets, starting after several values."
+)
+def test_intersect_matches_sets():
+    logger.info("Running test: test_intersect_matches_sets")
+    rnd = random.Random(11)
+    for _ in range(50):
+        groups = [
+            [
+                SortedList(rnd.sample(range(5000), rnd.choice((5, 200, 3000))), load=8)
+                for _ in range(rnd.randint(1, 3))
+            ]
+            for _ in range(rnd.randint(1, 3))
+        ]
+        expected = set.intersection(
+            *(set().union(*map(set, group)) for group in groups)
+        )
+        for after in (None, 0, 2500):
+            start = -1 if after is None else after
+            assert list(intersect(groups, after)) == sorted(
+                v for v in expected if v > start
+            )
+    assert list(intersect([])) == []
+    assert list(intersect([[SortedList([1])], []])) == []
+    logger.info("Test passed: test_intersect_matches_sets")
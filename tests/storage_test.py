@@ -0,0 +1,378 @@
+import allure
+import pytest
+
+from storage.base import DuplicateKeyError, pet_sort_key
+from storage.memory import MemoryBackend
+from storage.sqlite import SCHEMA_VERSION, SqliteBackend
+from util.etag import json_body
+from util.logging_config import logger
+
+SEED_PETS = [
+    {
+        "id": 1,
+        "name": "Buddy",
+        "category": {"id": 1, "name": "Dogs"},
+        "status": "available",
+    },
+    {
+        "id": 2,
+        "name": "Whiskers",
+        "category": {"id": 2, "name": "Cats"},
+        "status": "pending",
+    },
+]
+SEED_USERS = [
+    {
+        "id": 1,
+        "username": "vex",
+        "firstName": "Vex",
+        "lastName": "Vessar",
+        "password": "pw",
+    },
+]
+SEED_ORDERS = [{"id": 1, "pet_id": 1, "quantity": 1, "status": "placed"}]
+
+
+@pytest.fixture(params=["memory", "memory-dicts", "sqlite"])
+def storage_backend(request, tmp_path):
+    seeds = ([dict(p) for p in SEED_PETS], [dict(u) for u in SEED_USERS], SEED_ORDERS)
+    if request.param.startswith("memory"):
+        compact = request.param == "memory"
+        yield MemoryBackend(
+            *[[dict(r) for r in rows] for rows in seeds], compact=compact
+        )
+    else:
+        backend = SqliteBackend(str(tmp_path / "store.db"), 2, *seeds)
+        yield backend
+        backend.close()
+
+
+@allure.title("Test pet repository operations on every backend")
+@allure.description(
+    "This test runs the same pet operations against each storage backend and "
+    "checks results, status pagination and status counts."
+)
+def test_pet_repository(storage_backend):
+    logger.info("Running test: test_pet_repository")
+    pets = storage_backend.pets
+    assert pets.get(1)["name"] == "Buddy"
+    assert pets.get(999) is None
+
+    new_pet = pets.insert(
+        {"name": "Max", "category": {"id": 3, "name": "Lizards"}, "status": "available"}
+    )
+    assert new_pet["id"] == 3
+    assert pets.get(3)["category"] == {"id": 3, "name": "Lizards"}
+    assert [p["id"] for p in pets.find_by_status("available")] == [1, 3]
+    assert [p["id"] for p in pets.find_by_status("available", 1, 1)] == [3]
+
+    assert pets.update(1, status="sold")["status"] == "sold"
+    assert pets.update(1, name="Buddy Updated")["name"] == "Buddy Updated"
+    assert pets.update(999, name="Ghost") is None
+    assert pets.count_by_status() == {"available": 1, "pending": 1, "sold": 1}
+
+    assert pets.delete(2) is True
+    assert pets.delete(2) is False
+    assert not pets.has_status("pending")
+    assert pets.count_by_status() == pets.recount_by_status()
+
+    results = pets.update_many(
+        [{"id": 1, "name": "A", "status": "x"}, {"id": 999, "name": "B", "status": "x"}]
+    )
+    assert results[0]["name"] == "A" and results[1] is None
+    assert pets.delete_many([1, 999]) == [True, False]
+    logger.info("Test passed: test_pet_repository")
+
+
+@allure.title("Test user repository operations on every backend")
+@allure.description(
+    "This test checks username uniqueness, renames and ID allocation on each "
+    "storage backend."
+)
+def test_user_repository(storage_backend):
+    logger.info("Running test: test_user_repository")
+    users = storage_backend.users
+    assert users.get("vex")["firstName"] == "Vex"
+
+    created = users.insert_many([{"username": "scanlan"}, {"username": "pike"}])
+    assert [u["id"] for u in created] == [2, 3]
+    with pytest.raises(DuplicateKeyError):
+        users.insert({"username": "vex"})
+    with pytest.raises(DuplicateKeyError):
+        users.insert_many([{"username": "grog"}, {"username": "grog"}])
+    assert users.get("grog") is None
+
+    renamed = users.update("pike", {"username": "pike_trickfoot"})
+    assert renamed["id"] == 3
+    assert users.get("pike") is None
+    assert users.get("pike_trickfoot")["id"] == 3
+    with pytest.raises(DuplicateKeyError):
+        users.update("scanlan", {"username": "vex"})
+    assert users.update("nobody", {"username": "nobody"}) is None
+
+    assert users.delete("scanlan") is True
+    assert users.delete("scanlan") is False
+    assert users.insert({"username": "grog"})["id"] == 4
+    logger.info("Test passed: test_user_repository")
+
+
+@allure.title("Test order repository operations on every backend")
+@allure.description("This test checks order insert, get and delete on each backend.")
+def test_order_repository(storage_backend):
+    logger.info("Running test: test_order_repository")
+    orders = storage_backend.orders
+    assert orders.get(1)["status"] == "placed"
+    order = orders.insert({"id": 77, "pet_id": 2, "quantity": 3})
+    assert order["id"] == 2
+    assert orders.get(2) == {"id": 2, "pet_id": 2, "quantity": 3}
+    assert orders.delete(2) is True
+    assert orders.get(2) is None
+    assert orders.delete(2) is False
+    logger.info("Test passed: test_order_repository")
+
+
+@allure.title("Test that every backend returns the same order body")
+@allure.description(
+    "This test places the same orders, with and without an ID of their own, "
+    "on the memory and SQLite backends and checks that each is read back as "
+    "the same JSON bytes, key order included, as GET /store/order sends."
+)
+def test_order_bodies_match_across_backends(tmp_path):
+    logger.info("Running test: test_order_bodies_match_across_backends")
+    memory = MemoryBackend([], [], [dict(o) for o in SEED_ORDERS])
+    sqlite = SqliteBackend(str(tmp_path / "store.db"), 2, [], [], SEED_ORDERS)
+    placed = [
+        {"pet_id": 2, "quantity": 3, "complete": False},
+        {"quantity": 1, "id": 77, "status": "approved"},
+    ]
+    for backend in (memory, sqlite):
+        for order in placed:
+            backend.orders.insert(dict(order))
+    for order_id in (1, 2, 3):
+        body = json_body(memory.orders.get(order_id))
+        assert json_body(sqlite.orders.get(order_id)) == body
+    assert list(sqlite.orders.get(3)) == ["quantity", "id", "status"]
+    sqlite.close()
+    logger.info("Test passed: test_order_bodies_match_across_backends")
+
+
+@allure.title("Test that the SQLite backend keeps data across restarts")
+@allure.description(
+    "This test reopens a SQLite database and checks that data written before "
+    "is still there and the seed data is not applied twice."
+)
+def test_sqlite_backend_persists(tmp_path):
+    logger.info("Running test: test_sqlite_backend_persists")
+    path = str(tmp_path / "store.db")
+    backend = SqliteBackend(path, 2, SEED_PETS, SEED_USERS, SEED_ORDERS)
+    backend.pets.delete(1)
+    pet_id = backend.pets.insert({"name": "Kiki", "category": {}, "status": "sold"})[
+        "id"
+    ]
+    backend.close()
+
+    backend = SqliteBackend(path, 2, SEED_PETS, SEED_USERS, SEED_ORDERS)
+    assert backend.pets.get(1) is None
+    assert backend.pets.get(pet_id)["name"] == "Kiki"
+    assert backend.pets.count_by_status() == {"pending": 1, "sold": 1}
+    backend.close()
+    logger.info("Test passed: test_sqlite_backend_persists")
+
+
+@allure.title("Test name search on every backend")
+@allure.description(
+    "This test searches pets by name and users by username and name on each "
+    "backend, checking word prefix matching, paging and that the indexes "
+    "follow single and batch inserts, renames and deletes."
+)
+def test_search(storage_backend):
+    logger.info("Running test: test_search")
+    pets = storage_backend.pets
+    users = storage_backend.users
+    new_pets = pets.insert_many(
+        [
+            {"name": "Buddy Junior", "category": {}, "status": "sold"},
+            {"name": "little-bud", "category": {}, "status": "sold"},
+        ]
+    )
+    ids = [pet["id"] for pet in new_pets]
+    assert [p["id"] for p in pets.search("BUD")] == [1, *ids]
+    assert [p["id"] for p in pets.search("bud jun")] == [ids[0]]
+    assert [p["id"] for p in pets.search("bud", limit=1, cursor=1)] == [ids[0]]
+    assert pets.search("uddy") == [] and pets.search(" -- ") == []
+    pets.update(1, name="Rex")
+    pets.delete(ids[1])
+    assert [p["id"] for p in pets.search("bud")] == [ids[0]]
+    assert [p["id"] for p in pets.search("re")] == [1]
+
+    # A batch is indexed at once, both under new words and known ones
+    users.insert_many(
+        [
+            {"username": "zed", "firstName": "Anna", "lastName": "Vexley"},
+            {"username": "vexing", "firstName": "Ann", "lastName": "Smith"},
+        ]
+    )
+    assert [u["username"] for u in users.search("vex")] == ["vex", "vexing", "zed"]
+    assert [u["username"] for u in users.search("ann smi")] == ["vexing"]
+    assert [u["username"] for u in users.search("vex", 2, "vex")] == [
+        "vexing",
+        "zed",
+    ]
+    users.update("zed", {"username": "amy", "lastName": "Jones"})
+    users.delete("vexing")
+    assert [u["username"] for u in users.search("vex")] == ["vex"]
+    assert [u["username"] for u in users.search("jon")] == ["amy"]
+    logger.info("Test passed: test_search")
+
+
+@allure.title("Test listing pets of several statuses in order on every backend")
+@allure.description(
+    "This test lists pets with any of several statuses by ID and by name, "
+    "both ways, page by page on each backend, and checks that the order "
+    "follows renames and status changes."
+)
+def test_find_by_statuses(storage_backend):
+    logger.info("Running test: test_find_by_statuses")
+    pets = storage_backend.pets
+    pets.insert_many(
+        [
+            {"name": name, "category": {}, "status": status}
+            for name, status in [
+                ("Ace", "sold"),
+                ("Buddy", "pending"),
+                ("Zed", "available"),
+                ("Ace", "available"),
+            ]
+        ]
+    )
+    statuses = ["available", "sold", "pending", "sold"]
+    expected = {
+        ("id", False): [1, 2, 3, 4, 5, 6],
+        ("id", True): [6, 5, 4, 3, 2, 1],
+        # Buddy (1), Whiskers (2), Ace (3), Buddy (4), Zed (5), Ace (6)
+        ("name", False): [3, 6, 1, 4, 2, 5],
+        ("name", True): [5, 2, 4, 1, 6, 3],
+    }
+    for (sort, descending), ids in expected.items():
+        assert [
+            p["id"] for p in pets.find_by_statuses(statuses, sort, descending)
+        ] == ids
+        paged = []
+        cursor = None
+        while True:
+            page = pets.find_by_statuses(statuses, sort, descending, 4, cursor)
+            paged.extend(p["id"] for p in page)
+            if len(page) < 4:
+                break
+            cursor = pet_sort_key(page[-1], sort)
+        assert paged == ids
+    assert [p["id"] for p in pets.find_by_statuses(["sold"], "name")] == [3]
+    assert pets.find_by_statuses(["missing"]) == []
+    with pytest.raises(ValueError):
+        pets.find_by_statuses(statuses, "status")
+
+    pets.update(5, name="Abe", status="sold")
+    pets.update(2, status="lost")
+    assert [p["id"] for p in pets.find_by_statuses(statuses, "name")] == [
+        5,
+        3,
+        6,
+        1,
+        4,
+    ]
+    logger.info("Test passed: test_find_by_statuses")
+
+
+@allure.title("Test finding pets by category on every backend")
+@allure.description(
+    "This test finds pets by category ID, name and status together on each "
+    "backend, checking paging and that the indexes follow inserts, status "
+    "changes and deletes."
+)
+def test_find_by_category(storage_backend):
+    logger.info("Running test: test_find_by_category")
+    pets = storage_backend.pets
+    dogs = {"id": 1, "name": "Dogs"}
+    ids = [
+        pet["id"]
+        for pet in pets.insert_many(
+            [
+                {"name": "Rex", "category": dogs, "status": "sold"},
+                {"name": "Fido", "category": dogs, "status": "available"},
+                {"name": "Nameless", "category": {"id": 1}, "status": "sold"},
+                {"name": "Plain", "category": {}, "status": "sold"},
+            ]
+        )
+    ]
+    assert [p["id"] for p in pets.find_by_category(1)] == [1, *ids[:3]]
+    assert [p["id"] for p in pets.find_by_category(category_name="Dogs")] == [
+        1,
+        *ids[:2],
+    ]
+    assert [p["id"] for p in pets.find_by_category(1, "Dogs", "available")] == [
+        1,
+        ids[1],
+    ]
+    assert [p["id"] for p in pets.find_by_category(1, status="sold")] == [
+        ids[0],
+        ids[2],
+    ]
+    assert [p["id"] for p in pets.find_by_category(1, limit=2, cursor=1)] == ids[:2]
+    assert pets.find_by_category(2, "Dogs") == []
+    assert pets.has_category(1, "Dogs") and pets.has_category(category_name="Cats")
+    assert not pets.has_category(1, "Lizards") and not pets.has_category(9)
+    with pytest.raises(ValueError):
+        pets.find_by_category(status="sold")
+
+    pets.update(ids[0], status="available")
+    pets.delete(1)
+    assert [p["id"] for p in pets.find_by_category(1, status="available")] == ids[:2]
+    pets.delete(2)
+    assert not pets.has_category(category_name="Cats")
+    logger.info("Test passed: test_find_by_category")
+
+
+@allure.title("Test that SQLite databases from before search are migrated")
+@allure.description(
+    "This test turns a database back into schema version 1, without the "
+    "search, category and status name indexes and with order documents "
+    "stored without their IDs, and checks that reopening it adds and fills "
+    "the indexes and puts each order's ID first in its document."
+)
+def test_sqlite_search_migration(tmp_path):
+    logger.info("Running test: test_sqlite_search_migration")
+    path = str(tmp_path / "store.db")
+    backend = SqliteBackend(path, 2, SEED_PETS, SEED_USERS, SEED_ORDERS)
+    with backend.pool.transaction() as conn:
+        conn.execute("DROP TABLE pet_names")
+        conn.execute("DROP TABLE user_names")
+        for (trigger,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE '%names%'"
+        ).fetchall():
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP INDEX pets_category_id")
+        conn.execute("DROP INDEX pets_category_name")
+        conn.execute("DROP INDEX pets_status_name_id")
+        conn.execute("UPDATE orders SET data = json_remove(data, '$.id')")
+        conn.execute("PRAGMA user_version = 1")
+    backend.close()
+
+    backend = SqliteBackend(path, 2)
+    assert [p["name"] for p in backend.pets.search("whi")] == ["Whiskers"]
+    assert [u["username"] for u in backend.users.search("vess")] == ["vex"]
+    assert [p["name"] for p in backend.pets.find_by_category(2, "Cats")] == ["Whiskers"]
+    assert [
+        p["name"]
+        for p in backend.pets.find_by_statuses(["available", "pending"], "name", True)
+    ] == ["Whiskers", "Buddy"]
+    assert json_body(backend.orders.get(1)) == json_body(SEED_ORDERS[0])
+    with backend.pool.connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone() == (SCHEMA_VERSION,)
+        assert conn.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE name IN ('pets_category_id', 'pets_category_name', "
+            "'pets_status_name_id')"
+        ).fetchone() == (3,)
+    backend.close()
+    logger.info("Test passed: test_sqlite_search_migration")
@@ -118,3 +118,122 @@ def test_get_inventory_success(base_url):
     assert inventory["pending"] == 1, "Incorrect count for 'pending' status"
     assert inventory["sold"] == 1, "Incorrect count for 'sold' status"
     logger.info("Test passed: test_get_inventory_success")
+
+
+@allure.title("Test for order IDs and repeated deletes")
+@allure.description(
+    "This test places two orders, checks they get distinct increasing IDs "
+    "and that deleting the same order twice returns 404 the second time."
+)
+def test_order_ids_and_double_delete(base_url):
+    logger.info("Running test: test_order_ids_and_double_delete")
+    order_data = {
+        "pet_id": 2,
+        "quantity": 1,
+        "shipDate": "2024-12-30T10:00:00Z",
+        "status": "placed",
+        "complete": False,
+    }
+    first = httpx.post(f"{base_url}/store/order", json=order_data).json()
+    second = httpx.post(f"{base_url}/store/order", json=order_data).json()
+    assert second["id"] > first["id"]
+
+    response = httpx.get(f"{base_url}/store/order/{second['id']}")
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json() == second
+
+    response = httpx.delete(f"{base_url}/store/order/{second['id']}")
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.delete(f"{base_url}/store/order/{second['id']}")
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json()["detail"] == "Order not found"
+    logger.info("Test passed: test_order_ids_and_double_delete")
+
+
+@allure.title("Test that inventory follows pet mutations")
+@allure.description(
+    "This test adds, updates and deletes a pet and checks the inventory "
+    "counters move with it."
+)
+def test_inventory_follows_pet_mutations(base_url):
+    logger.info("Running test: test_inventory_follows_pet_mutations")
+    inventory = httpx.get(f"{base_url}/store/inventory").json()
+    assert "backordered" not in inventory
+
+    pet_data = {
+        "name": "Pickles",
+        "category": {"id": 1, "name": "Dogs"},
+        "status": "backordered",
+    }
+    pet_id = httpx.post(f"{base_url}/pet", json=pet_data).json()["id"]
+    inventory = httpx.get(f"{base_url}/store/inventory").json()
+    assert inventory["backordered"] == 1
+
+    httpx.post(f"{base_url}/pet/{pet_id}", data={"status": "returned"})
+    inventory = httpx.get(f"{base_url}/store/inventory").json()
+    assert "backordered" not in inventory
+    assert inventory["returned"] == 1
+
+    response = httpx.delete(f"{base_url}/pet/{pet_id}")
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(f"{base_url}/store/inventory")
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert "returned" not in response.json()
+    logger.info("Test passed: test_inventory_follows_pet_mutations")
+
+
+@allure.title("Test conditional GET of orders and inventory")
+@allure.description(
+    "This test checks that orders and the inventory carry an ETag, that "
+    "If-None-Match with it returns 304 and that a pet change moves the "
+    "inventory ETag."
+)
+def test_conditional_get_order_and_inventory(base_url):
+    logger.info("Running test: test_conditional_get_order_and_inventory")
+    order_data = {"pet_id": 1, "quantity": 1, "status": "placed", "complete": False}
+    order = httpx.post(f"{base_url}/store/order", json=order_data).json()
+    response = httpx.get(f"{base_url}/store/order/{order['id']}")
+    etag = response.headers["ETag"]
+    response = httpx.get(
+        f"{base_url}/store/order/{order['id']}", headers={"If-None-Match": etag}
+    )
+    assert (
+        response.status_code == 304
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    httpx.delete(f"{base_url}/store/order/{order['id']}")
+    response = httpx.get(
+        f"{base_url}/store/order/{order['id']}", headers={"If-None-Match": etag}
+    )
+    assert (
+        response.status_code == 404
+    ), f"Unexpected status code: {response.status_code}"
+
+    etag = httpx.get(f"{base_url}/store/inventory").headers["ETag"]
+    response = httpx.get(
+        f"{base_url}/store/inventory", headers={"If-None-Match": f'W/{etag}, "x"'}
+    )
+    assert (
+        response.status_code == 304
+    ), f"Unexpected status code: {response.status_code}"
+    pet_data = {"name": "Etag", "category": {"id": 1}, "status": "etagged"}
+    pet_id = httpx.post(f"{base_url}/pet", json=pet_data).json()["id"]
+    response = httpx.get(f"{base_url}/store/inventory", headers={"If-None-Match": etag})
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json()["etagged"] == 1
+    assert response.headers["ETag"] != etag
+    httpx.delete(f"{base_url}/pet/{pet_id}")
+    logger.info("Test passed: test_conditional_get_order_and_inventory")
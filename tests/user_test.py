@@ -218,3 +218,259 @@ async def test_create_users_with_array(base_url):
         assert response.json()["message"] == "1 users created successfully"
         assert len(response.json()["users"]) == 1
     logger.info("Test passed: test_create_users_with_array")
+
+
+@allure.title("Test for creating a user with a taken username")
+@allure.description(
+    "This test ensures that a second user with an existing username is rejected."
+)
+def test_create_user_duplicate_username(base_url):
+    logger.info("Running test: test_create_user_duplicate_username")
+    user_data = {
+        "username": "keyleth_ashari",
+        "firstName": "Keyleth",
+        "lastName": "Impostor",
+        "email": "impostor@example.com",
+        "password": "impostorpass",
+        "phone": "000-000-0000",
+    }
+    response = httpx.post(f"{base_url}/user", json=user_data)
+    logger.debug(f"Response status code: {response.status_code}")
+    logger.debug(f"Response content: {response.text}")
+    assert (
+        response.status_code == 409
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json()["detail"] == "Username already exists"
+
+    response = httpx.get(f"{base_url}/user/keyleth_ashari")
+    assert response.json()["lastName"] == "Ashari"
+    logger.info("Test passed: test_create_user_duplicate_username")
+
+
+@allure.title("Test for creating a large batch of users")
+@allure.description(
+    "This test checks that a bulk create assigns unique IDs and every user "
+    "is reachable by username afterwards."
+)
+def test_create_users_bulk(base_url):
+    logger.info("Running test: test_create_users_bulk")
+    users_data = [
+        {
+            "username": f"bulk_user_{i}",
+            "firstName": "Bulk",
+            "lastName": f"User{i}",
+            "email": f"bulk_user_{i}@example.com",
+            "password": f"bulkpass{i}",
+            "phone": "444-444-4444",
+        }
+        for i in range(500)
+    ]
+    response = httpx.post(f"{base_url}/user/createWithList", json=users_data)
+    logger.debug(f"Response status code: {response.status_code}")
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    created = response.json()["users"]
+    assert len({user["id"] for user in created}) == 500
+
+    response = httpx.get(
+        f"{base_url}/user/login",
+        params={"username": "bulk_user_499", "password": "bulkpass499"},
+    )
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    logger.info("Test passed: test_create_users_bulk")
+
+
+@allure.title("Test conditional GET of a user")
+@allure.description(
+    "This test checks that If-None-Match returns 304 for an unchanged user "
+    "and that a user recreated under the same username gets a new ETag."
+)
+def test_get_user_conditional(base_url):
+    logger.info("Running test: test_get_user_conditional")
+    user_data = {
+        "username": "etag_user",
+        "firstName": "Etag",
+        "lastName": "User",
+        "email": "etag_user@example.com",
+        "password": "etagpass",
+        "phone": "555-555-5555",
+    }
+    httpx.post(f"{base_url}/user", json=user_data)
+    etag = httpx.get(f"{base_url}/user/etag_user").headers["ETag"]
+    response = httpx.get(f"{base_url}/user/etag_user", headers={"If-None-Match": etag})
+    assert (
+        response.status_code == 304
+    ), f"Unexpected status code: {response.status_code}"
+
+    httpx.delete(f"{base_url}/user/etag_user")
+    httpx.post(f"{base_url}/user", json={**user_data, "lastName": "Again"})
+    response = httpx.get(f"{base_url}/user/etag_user", headers={"If-None-Match": etag})
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json()["lastName"] == "Again"
+    httpx.delete(f"{base_url}/user/etag_user")
+    logger.info("Test passed: test_get_user_conditional")
+
+
+@allure.title("Test that passwords are stored hashed and never returned")
+@allure.description(
+    "This test creates a user, checks that no response includes the password "
+    "and that login still accepts the right password and only that one."
+)
+def test_user_password_is_hashed(base_url):
+    logger.info("Running test: test_user_password_is_hashed")
+    user_data = {
+        "username": "hashed_user",
+        "firstName": "Hashed",
+        "lastName": "User",
+        "email": "hashed_user@example.com",
+        "password": "correct horse",
+        "phone": "555-555-5555",
+    }
+    response = httpx.post(f"{base_url}/user", json=user_data)
+    assert (
+        response.status_code == 201
+    ), f"Unexpected status code: {response.status_code}"
+    assert "password" not in response.json()
+    response = httpx.get(f"{base_url}/user/hashed_user")
+    assert "password" not in response.json()
+
+    response = httpx.get(
+        f"{base_url}/user/login",
+        params={"username": "hashed_user", "password": "correct horse"},
+    )
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(
+        f"{base_url}/user/login",
+        params={"username": "hashed_user", "password": "correct horse "},
+    )
+    assert (
+        response.status_code == 401
+    ), f"Unexpected status code: {response.status_code}"
+    httpx.delete(f"{base_url}/user/hashed_user")
+    logger.info("Test passed: test_user_password_is_hashed")
+
+
+@allure.title("Test that login issues a session token that logout revokes")
+@allure.description(
+    "This test logs in, checks a token comes back, logs out with it as a "
+    "bearer token and checks the same token cannot be used again."
+)
+def test_login_session_token(base_url):
+    logger.info("Running test: test_login_session_token")
+    response = httpx.get(
+        f"{base_url}/user/login",
+        params={"username": "keyleth_ashari", "password": "securepass"},
+    )
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    token = response.json()["token"]
+    assert response.json()["expires_in"] > 0
+
+    headers = {"Authorization": f"Bearer {token}"}
+    response = httpx.get(f"{base_url}/user/logout", headers=headers)
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json()["username"] == "keyleth_ashari"
+    response = httpx.get(f"{base_url}/user/logout", headers=headers)
+    assert (
+        response.status_code == 401
+    ), f"Unexpected status code: {response.status_code}"
+    assert response.json()["detail"] == "Invalid or expired session"
+    logger.info("Test passed: test_login_session_token")
+
+
+@allure.title("Test that deleting a user ends its sessions")
+@allure.description(
+    "This test logs a new user in, deletes the user and checks that its "
+    "session token is no longer accepted."
+)
+def test_delete_user_revokes_sessions(base_url):
+    logger.info("Running test: test_delete_user_revokes_sessions")
+    user_data = {
+        "username": "session_ender",
+        "firstName": "Session",
+        "lastName": "Ender",
+        "email": "ender@example.com",
+        "password": "endpass",
+        "phone": "555-0100",
+    }
+    response = httpx.post(f"{base_url}/user", json=user_data)
+    assert (
+        response.status_code == 201
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(
+        f"{base_url}/user/login",
+        params={"username": "session_ender", "password": "endpass"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+    response = httpx.delete(f"{base_url}/user/session_ender")
+    assert (
+        response.status_code == 200
+    ), f"Unexpected status code: {response.status_code}"
+    response = httpx.get(f"{base_url}/user/logout", headers=headers)
+    assert (
+        response.status_code == 401
+    ), f"Unexpected status code: {response.status_code}"
+    logger.info("Test passed: test_delete_user_revokes_sessions")
+
+
+@allure.title("Test for searching users by username and name")
+@allure.description(
+    "This test searches users by username prefix and by first and last name "
+    "word prefixes, pages through the results with the returned cursor and "
+    "checks that passwords are not returned."
+)
+def test_search_users(base_url):
+    logger.info("Running test: test_search_users")
+    people = [
+        ("quorra_one", "Quorra", "Adams"),
+        ("quorra_two", "Beth", "Quorrason"),
+        ("zeta_user", "Quorra", "Smith"),
+        ("other_user", "Beth", "Smith"),
+    ]
+    for username, first_name, last_name in people:
+        user_data = {
+            "username": username,
+            "firstName": first_name,
+            "lastName": last_name,
+            "email": f"{username}@example.com",
+            "password": "securepassword",
+            "phone": "123-456-7890",
+        }
+        response = httpx.post(f"{base_url}/user", json=user_data)
+        assert (
+            response.status_code == 201
+        ), f"Unexpected status code: {response.status_code}"
+
+    seen = []
+    params = {"q": "quorra", "limit": 2}
+    while True:
+        response = httpx.get(f"{base_url}/user/search", params=params)
+        assert (
+            response.status_code == 200
+        ), f"Unexpected status code: {response.status_code}"
+        page = response.json()
+        assert len(page) <= 2
+        assert all("password" not in user for user in page)
+        seen.extend(user["username"] for user in page)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == ["quorra_one", "quorra_two", "zeta_user"]
+
+    response = httpx.get(f"{base_url}/user/search", params={"q": "quorra sm"})
+    assert [user["username"] for user in response.json()] == ["zeta_user"]
+
+    for username, _, _ in people:
+        httpx.delete(f"{base_url}/user/{username}")
+    logger.info("Test passed: test_search_users")
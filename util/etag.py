@@ -0,0 +1,77 @@
+import json
+import os
+import time
+from itertools import count
+
+from fastapi import Request, Response
+
+# Serialized bodies each store keeps per entity, see LRUCache
+BODY_CACHE_SIZE = int(os.environ.get("PET_STORE_BODY_CACHE_SIZE", "10000"))
+
+
+class VersionTable:
+    """
+    Version numbers for entities, used as ETags.
+
+    Stores bump a key after each write to it. Every bump takes the next
+    value of one counter, so a key never gets a version it had before, even
+    when it is deleted and created again. Keys that were never bumped are at
+    version 0. The epoch is part of every tag so tags from an earlier run of
+    the server never match.
+
+    Writers bump after they write and readers read the version before the
+    record. A reader racing a write may label the new record with the old
+    version, which only costs the client one more full response.
+    """
+
+    def __init__(self):
+        self.epoch = f"{time.time_ns():x}"
+        self.versions = {}
+        self.counter = count(1)
+
+    def bump(self, key):
+        self.versions[key] = next(self.counter)
+
+    def forget(self, key):
+        self.versions.pop(key, None)
+
+    def etag(self, key):
+        return f'"{self.epoch}-{self.versions.get(key, 0)}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header lists the ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def json_body(content) -> bytes:
+    """Content encoded the same way JSONResponse encodes it."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def conditional_body_response(request: Request, etag: str, body: bytes) -> Response:
+    """304 if the client already has this version, else the JSON body."""
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+def conditional_response(request: Request, etag: str, content) -> Response:
+    """304 if the client already has this version, else content as JSON."""
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    body = json_body(content)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
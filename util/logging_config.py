@@ -1,16 +1,163 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+
 import structlog
 
+# Logging mode:
+#   sync  - handlers write on the calling thread (default)
+#   queue - records are handed to a background writer thread
+#   off   - nothing below CRITICAL is rendered or written
+LOG_MODE = os.environ.get("PET_STORE_LOG_MODE", "sync")
+# Queue mode tuning
+LOG_QUEUE_SIZE = int(os.environ.get("PET_STORE_LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.environ.get("PET_STORE_LOG_BATCH_SIZE", "256"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("PET_STORE_LOG_FLUSH_INTERVAL", "0.5"))
+# What to do when the queue is full: "drop" the record or "block" the caller
+# for up to LOG_BLOCK_TIMEOUT seconds before dropping it.
+LOG_OVERFLOW = os.environ.get("PET_STORE_LOG_OVERFLOW", "drop")
+LOG_BLOCK_TIMEOUT = float(os.environ.get("PET_STORE_LOG_BLOCK_TIMEOUT", "0.05"))
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a bounded queue that counts records it had to drop."""
+
+    def __init__(self, log_queue, overflow="drop", block_timeout=0.05):
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        # Records are dropped on any logging thread
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def prepare(self, record):
+        # Unlike QueueHandler, leave formatting to the writer thread. The
+        # record stays in this process, so nothing has to be made picklable.
+        return record
+
+
+class BatchingQueueListener(threading.Thread):
+    """
+    Background writer draining the log queue.
+
+    Takes up to batch_size records at a time, writes them to each handler's
+    stream in a single call and flushes once per batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, log_queue, handlers, batch_size=256, flush_interval=0.5):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if record is self._STOP:
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    stop = True
+                    break
+                batch.append(record)
+            self.write(batch)
+            if stop:
+                return
+
+    def write(self, batch):
+        for handler in self.handlers:
+            lines = []
+            for record in batch:
+                if record.levelno < handler.level:
+                    continue
+                # A record that cannot be formatted is reported and skipped,
+                # so it neither loses the rest of the batch nor ends the thread
+                try:
+                    lines.append(handler.format(record))
+                except Exception:
+                    handler.handleError(record)
+            if not lines:
+                continue
+            handler.acquire()
+            try:
+                handler.stream.write("\n".join(lines) + "\n")
+                handler.flush()
+            except Exception:
+                handler.handleError(batch[0])
+            finally:
+                handler.release()
+
+    def stop(self):
+        self.queue.put(self._STOP)
+        self.join()
+
+
+os.makedirs("logs", exist_ok=True)
+handlers = [
+    logging.StreamHandler(sys.stdout),
+    logging.FileHandler("logs/pet_store.log", encoding="utf-8"),
+]
+queue_handler = None
+log_writer = None
+
+if LOG_MODE == "queue":
+    # Rendering the structlog event dict is the expensive part of a log call,
+    # so in queue mode it happens in the writer thread as well.
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processor=structlog.dev.ConsoleRenderer(colors=False),
+        fmt="%(asctime)s [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(log_queue, LOG_OVERFLOW, LOG_BLOCK_TIMEOUT)
+    log_writer = BatchingQueueListener(
+        log_queue, handlers, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL
+    )
+    log_writer.start()
+    atexit.register(log_writer.stop)
+    handlers = [queue_handler]
+    # Tracebacks have to be captured while the exception is still current
+    renderers = [
+        structlog.processors.format_exc_info,
+        structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+    ]
+else:
+    renderers = [structlog.dev.ConsoleRenderer(colors=False)]
+
 # Standard Python logger setup
 logging.basicConfig(
-    level=logging.INFO,
+    level=logging.CRITICAL if LOG_MODE == "off" else logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("logs/pet_store.log", encoding="utf-8"),
-    ],
+    handlers=handlers,
 )
 
 # Reduce logging level for third-party libraries
@@ -20,8 +167,10 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 # structlog setting
 structlog.configure(
     processors=[
+        # Drop disabled levels before anything is rendered
+        structlog.stdlib.filter_by_level,
         structlog.processors.StackInfoRenderer(),
-        structlog.dev.ConsoleRenderer(colors=False),
+        *renderers,
     ],
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
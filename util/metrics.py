@@ -0,0 +1,178 @@
+"""
+Request counters and latency histograms in the Prometheus text format.
+
+Everything is recorded on the event loop thread, which every request passes
+through, so counters are plain ints and dicts with no locking. A request
+costs two clock reads, a bisect into the bucket bounds and a few dict
+lookups. Requests are keyed by route template (`/pet/{pet_id}`) rather than
+path so the number of series stays fixed.
+"""
+
+import os
+import time
+from bisect import bisect_left
+
+# Whether requests are recorded at all
+METRICS_ENABLED = os.environ.get("PET_STORE_METRICS", "on") != "off"
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+# Route label of requests that matched no route, such as 404s for random paths
+UNMATCHED = "unmatched"
+# Router label of paths outside every router, such as /metrics itself
+OTHER = "other"
+
+
+class RouteStats:
+    __slots__ = ("buckets", "total", "statuses")
+
+    def __init__(self, size):
+        # Requests per bucket, not cumulative; the last one is +Inf
+        self.buckets = [0] * (size + 1)
+        self.total = 0.0
+        self.statuses = {}
+
+
+def format_labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsWriter:
+    """Builds a Prometheus text exposition one metric family at a time."""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, **labels):
+        if labels:
+            name = f"{name}{{{format_labels(labels)}}}"
+        self.lines.append(f"{name} {format_value(value)}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+class RequestMetrics:
+    """Per-route request counts, status codes, latencies and in-flight gauges."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, enabled=METRICS_ENABLED):
+        self.bounds = tuple(buckets)
+        self.enabled = enabled
+        # (method, route) -> RouteStats
+        self.routes = {}
+        # Router name -> requests being handled
+        self.in_flight = {}
+
+    def observe(self, method, route, status, seconds):
+        key = (method, route)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats(len(self.bounds))
+        stats.buckets[bisect_left(self.bounds, seconds)] += 1
+        stats.total += seconds
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def write(self, writer):
+        """Add the request metrics to a MetricsWriter. Call on the event loop."""
+        writer.family(
+            "pet_store_requests_total",
+            "counter",
+            "Requests handled, by route and status code.",
+        )
+        for (method, route), stats in self.routes.items():
+            for status, count in stats.statuses.items():
+                writer.sample(
+                    "pet_store_requests_total",
+                    count,
+                    method=method,
+                    route=route,
+                    status=status,
+                )
+
+        name = "pet_store_request_duration_seconds"
+        writer.family(name, "histogram", "Time to handle a request, by route.")
+        for (method, route), stats in self.routes.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + ("+Inf",), stats.buckets):
+                cumulative += count
+                writer.sample(
+                    f"{name}_bucket", cumulative, method=method, route=route, le=bound
+                )
+            writer.sample(f"{name}_sum", stats.total, method=method, route=route)
+            writer.sample(f"{name}_count", cumulative, method=method, route=route)
+
+        writer.family(
+            "pet_store_requests_in_flight",
+            "gauge",
+            "Requests being handled, by router.",
+        )
+        for router, count in self.in_flight.items():
+            writer.sample("pet_store_requests_in_flight", count, router=router)
+
+
+class MetricsMiddleware:
+    """
+    Records every HTTP request into a RequestMetrics.
+
+    A plain ASGI middleware rather than an @app.middleware("http") one,
+    which would add a task and a response stream wrapper to every request.
+    The route template is read from the scope after the app has run, where
+    the router left it.
+    """
+
+    def __init__(self, app, metrics, router_for):
+        self.app = app
+        self.metrics = metrics
+        # Maps a path to the router name the in-flight gauge is kept under
+        self.router_for = router_for
+
+    async def __call__(self, scope, receive, send):
+        metrics = self.metrics
+        if scope["type"] != "http" or not metrics.enabled:
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        router = self.router_for(scope["path"]) or OTHER
+        in_flight = metrics.in_flight
+        in_flight[router] = in_flight.get(router, 0) + 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight[router] -= 1
+            route = scope.get("route")
+            metrics.observe(
+                scope["method"],
+                route.path if route is not None else UNMATCHED,
+                status,
+                elapsed,
+            )
@@ -0,0 +1,111 @@
+"""
+Password hashing with PBKDF2-HMAC-SHA256 from the standard library.
+
+Hashes are stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>", so a hash
+keeps verifying after the cost setting changes. Anything else is taken as a
+plaintext password stored before hashing, such as in an older SQLite
+database, and compared as is until the user's password is next set.
+"""
+
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+ALGORITHM = "pbkdf2_sha256"
+# Cost of one hash or verification; doubling it doubles login CPU time
+PASSWORD_ITERATIONS = int(os.environ.get("PET_STORE_PASSWORD_ITERATIONS", "100000"))
+# Processes hashing and verifying; 0 does the work on the calling thread
+PASSWORD_WORKERS = int(
+    os.environ.get("PET_STORE_PASSWORD_WORKERS", str(os.cpu_count() or 1))
+)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def hash_password(password, iterations=PASSWORD_ITERATIONS, salt=None):
+    # A fixed salt is only for reproducible test data
+    salt = secrets.token_bytes(16) if salt is None else salt
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password, stored):
+    algorithm, sep, rest = stored.partition("$")
+    if algorithm != ALGORITHM or not sep:
+        return hmac.compare_digest(password.encode(), stored.encode())
+    iterations, salt, digest = rest.split("$")
+    computed = hashlib.pbkdf2_hmac(
+        "sha256", password.encode(), base64.b64decode(salt), int(iterations)
+    )
+    return hmac.compare_digest(computed, base64.b64decode(digest))
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords in a bounded process pool.
+
+    Callers block until their result is ready, but the hashing itself runs
+    in other processes, so logins from many threads use every core instead
+    of queueing on the GIL. At most max_pending jobs are queued for the pool
+    at once; further callers wait for a slot. The pool is started on first
+    use.
+    """
+
+    def __init__(
+        self, iterations=PASSWORD_ITERATIONS, workers=PASSWORD_WORKERS, max_pending=None
+    ):
+        self.iterations = iterations
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(max_pending or 4 * max(workers, 1))
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None:
+                # Forking a server with running threads is unsafe, so the
+                # workers are spawned
+                self.pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self.pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        with self.slots:
+            return self._pool().submit(fn, *args).result()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.iterations)
+
+    def hash_many(self, passwords):
+        if not self.workers:
+            return [hash_password(password, self.iterations) for password in passwords]
+        chunksize = max(1, len(passwords) // (4 * self.workers))
+        with self.slots:
+            return list(
+                self._pool().map(
+                    hash_password,
+                    passwords,
+                    repeat(self.iterations),
+                    chunksize=chunksize,
+                )
+            )
+
+    def verify(self, password, stored):
+        return self._run(verify_password, password, stored)
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
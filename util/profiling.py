@@ -0,0 +1,199 @@
+"""
+Sampled per-request profiling with cProfile.
+
+Off unless PET_STORE_PROFILE_RATE is above 0, which profiles that fraction of
+requests, or PET_STORE_PROFILE_TOKEN is set, which profiles any request
+sending the token in an X-Profile header. Each profile is written to
+PET_STORE_PROFILE_DIR as a .prof file for pstats or snakeviz, named after
+the time, route and duration, and the newest PET_STORE_PROFILE_KEEP are
+kept. Every profile is also added to summary.prof and summary.txt, the
+hottest functions over all profiled requests so far.
+
+cProfile only sees the thread it runs in. Async routes, request validation
+and response serialisation run on the event loop and are covered by a
+profiler there. Sync routes run in the threadpool, so routers use
+ProfiledRoute, which profiles the endpoint in its worker thread and hands
+the result back to the request. One request is profiled at a time per
+process. The event loop profile also sees whatever else the loop runs
+meanwhile, such as other async requests.
+"""
+
+import asyncio
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from util.logging_config import logger
+
+# Fraction of requests profiled, 0 to 1
+PROFILE_RATE = float(os.environ.get("PET_STORE_PROFILE_RATE", "0"))
+# Requests with this value in an X-Profile header are always profiled
+PROFILE_TOKEN = os.environ.get("PET_STORE_PROFILE_TOKEN") or None
+# Where profiles and the summary are written
+PROFILE_DIR = os.environ.get("PET_STORE_PROFILE_DIR", "profiles")
+# Per-request profiles kept before the oldest is deleted
+PROFILE_KEEP = int(os.environ.get("PET_STORE_PROFILE_KEEP", "100"))
+# Functions listed in summary.txt
+SUMMARY_LINES = 40
+
+HEADER = b"x-profile"
+ID_HEADER = b"x-profile-id"
+
+# Profiles of threadpool work done for the request being profiled, if any
+thread_profiles = ContextVar("thread_profiles", default=None)
+
+
+def profiled_in_thread(endpoint):
+    """Wrap a sync endpoint to profile it when its request is profiled."""
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profiles = thread_profiles.get()
+        if profiles is None:
+            return endpoint(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(endpoint, *args, **kwargs)
+        finally:
+            profiles.append(profile)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose sync endpoints can be profiled in the threadpool."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = profiled_in_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def profile_name(profile_id, method, route, elapsed):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    return f"{stamp}-{method}-{slug}-{elapsed:.0f}ms-{profile_id}"
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes out their profiles."""
+
+    def __init__(
+        self,
+        rate=PROFILE_RATE,
+        token=PROFILE_TOKEN,
+        directory=PROFILE_DIR,
+        keep=PROFILE_KEEP,
+    ):
+        self.rate = rate
+        self.token = token.encode() if token else None
+        self.directory = directory
+        self.keep = keep
+        self.busy = False
+        self.saved = deque()
+        self.summary = None
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0 or self.token is not None
+
+    def wanted(self, scope):
+        """Whether to profile this request. Call on the event loop."""
+        if self.busy:
+            return False
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == HEADER and value == self.token:
+                    return True
+        return self.rate > 0 and random.random() < self.rate
+
+    def save(self, name, profile, others):
+        """Write one request's profile and fold it into the summary."""
+        stats = pstats.Stats(profile)
+        for other in others:
+            stats.add(other)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}.prof")
+        stats.dump_stats(path)
+        with self.lock:
+            self.saved.append(path)
+            while len(self.saved) > self.keep:
+                try:
+                    os.remove(self.saved.popleft())
+                except FileNotFoundError:
+                    pass
+            if self.summary is None:
+                self.summary = stats
+            else:
+                self.summary.add(stats)
+            self.summary.dump_stats(os.path.join(self.directory, "summary.prof"))
+            text = io.StringIO()
+            self.summary.stream = text
+            self.summary.sort_stats("tottime").print_stats(SUMMARY_LINES)
+            self.summary.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+        with open(os.path.join(self.directory, "summary.txt"), "w") as f:
+            f.write(text.getvalue())
+        return path
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests a RequestProfiler picks.
+
+    A profiled response carries an X-Profile-Id header naming its file. The
+    profile is written in the threadpool after the response has been sent.
+    """
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if scope["type"] != "http" or not profiler.wanted(scope):
+            return await self.app(scope, receive, send)
+
+        profile_id = f"{time.time_ns():x}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((ID_HEADER, profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler.busy = True
+        others = []
+        token = thread_profiles.set(others)
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.disable()
+            elapsed = (time.perf_counter() - start) * 1e3
+            thread_profiles.reset(token)
+            profiler.busy = False
+
+        route = scope.get("route")
+        name = profile_name(
+            profile_id,
+            scope["method"],
+            route.path if route is not None else scope["path"],
+            elapsed,
+        )
+        path = await run_in_threadpool(profiler.save, name, profile, others)
+        logger.info("Request profiled", path=path, elapsed_ms=round(elapsed, 2))
@@ -0,0 +1,42 @@
+import threading
+import time
+
+import httpx
+from uvicorn import run
+
+from util.logging_config import logger
+
+
+def start_server_thread(app, port, host="127.0.0.1", log_level="info", attempts=10):
+    """
+    Run the app with uvicorn.run in a daemon thread and wait for it to be ready.
+
+    Returns the base URL of the server.
+    """
+
+    def run_server():
+        logger.info("Starting server", server_port=port)
+        try:
+            run(app, host=host, port=port, log_level=log_level, loop="asyncio")
+        except Exception as e:
+            logger.error("Failed to start server", error=str(e))
+            raise
+
+    server_thread = threading.Thread(target=run_server, daemon=True)
+    server_thread.start()
+    logger.info("Server thread started", port=port)
+
+    # Wait for server to be ready
+    base_url = f"http://{host}:{port}"
+    server_url = f"{base_url}/docs"
+    for attempt in range(attempts):
+        try:
+            response = httpx.get(server_url, timeout=1.0)
+            if response.status_code == 200:
+                logger.info("Server is up and running", url=server_url)
+                return base_url
+        except httpx.RequestError:
+            logger.warning("Attempt to connect to server failed", attempt=attempt + 1)
+            time.sleep(0.5)
+    logger.error("Server didn't start", url=server_url)
+    raise RuntimeError("Mock server failed to start")
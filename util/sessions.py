@@ -0,0 +1,132 @@
+import math
+import os
+import secrets
+import threading
+import time
+
+# Seconds a login session stays valid
+SESSION_TTL = float(os.environ.get("PET_STORE_SESSION_TTL", "3600"))
+# Sessions dropped per lock hold while sweeping, so logins never wait long
+SWEEP_CHUNK = 1000
+
+
+class SessionStore:
+    """
+    Session tokens with a fixed time to live, expired by a timer wheel.
+
+    Sessions live in a dict keyed by token as (username, expiry tick), where
+    a tick is `resolution` seconds. Each token is also appended to the wheel
+    bucket of its expiry tick, so the sweeper only visits buckets that have
+    come due and the tokens in them, never the whole table. A revoked token
+    stays in its bucket until then and is skipped. Expiry is rounded up to a
+    whole tick and get() checks it too, so a session is never accepted past
+    its expiry even before the sweeper reaches it. The tokens of each
+    user's live sessions are kept too, so revoke_user() ends them all.
+
+    Reads take no lock; create, revoke and the sweeper serialise on one.
+    """
+
+    def __init__(
+        self, ttl=SESSION_TTL, resolution=1.0, clock=time.monotonic, background=True
+    ):
+        self.ttl = ttl
+        self.resolution = resolution
+        self.clock = clock
+        self.background = background
+        self.sessions = {}
+        self.wheel = {}
+        # username -> set of the tokens of its live sessions
+        self.tokens = {}
+        # Every bucket up to and including this tick has been swept
+        self.swept = self._tick()
+        # Sessions created in the same tick share one int for their expiry
+        self.last_expires = None
+        self.sweeper = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def _tick(self):
+        return int(self.clock() // self.resolution)
+
+    def create(self, username):
+        """Start a session for the user and return its token."""
+        token = secrets.token_urlsafe(16)
+        expires = math.ceil((self.clock() + self.ttl) / self.resolution)
+        with self.lock:
+            if expires == self.last_expires:
+                expires = self.last_expires
+            else:
+                self.last_expires = expires
+            self.sessions[token] = (username, expires)
+            tokens = self.tokens.get(username)
+            if tokens is None:
+                tokens = self.tokens[username] = set()
+            tokens.add(token)
+            bucket = self.wheel.get(expires)
+            if bucket is None:
+                bucket = self.wheel[expires] = []
+            bucket.append(token)
+            if self.background and self.sweeper is None:
+                self.sweeper = threading.Thread(
+                    target=self._sweep_forever, name="session-sweeper", daemon=True
+                )
+                self.sweeper.start()
+        return token
+
+    def get(self, token):
+        """The username of a live session, or None."""
+        session = self.sessions.get(token)
+        if session is None or session[1] <= self._tick():
+            return None
+        return session[0]
+
+    def revoke(self, token):
+        """End the session. Returns its username, or None if it was not live."""
+        with self.lock:
+            session = self.sessions.pop(token, None)
+            if session is not None:
+                self._forget(session[0], token)
+        if session is None or session[1] <= self._tick():
+            return None
+        return session[0]
+
+    def revoke_user(self, username):
+        """End every session of the user. Returns how many there were."""
+        with self.lock:
+            tokens = self.tokens.pop(username, ())
+            for token in tokens:
+                del self.sessions[token]
+        return len(tokens)
+
+    def _forget(self, username, token):
+        # Called with the lock held
+        tokens = self.tokens[username]
+        tokens.discard(token)
+        if not tokens:
+            del self.tokens[username]
+
+    def sweep(self):
+        """Drop the sessions of every bucket that has come due."""
+        now = self._tick()
+        dropped = 0
+        while self.swept < now:
+            with self.lock:
+                self.swept += 1
+                tokens = self.wheel.pop(self.swept, ())
+            for start in range(0, len(tokens), SWEEP_CHUNK):
+                with self.lock:
+                    for token in tokens[start : start + SWEEP_CHUNK]:
+                        # Tokens are never reissued, so one still present is
+                        # the session this bucket expires
+                        session = self.sessions.pop(token, None)
+                        if session is not None:
+                            self._forget(session[0], token)
+                            dropped += 1
+        return dropped
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.resolution)
+            self.sweep()
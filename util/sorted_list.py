@@ -0,0 +1,496 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+# When intersecting, a group with this many times more values in a range
+# than there are candidates left is probed per candidate instead of read whole
+PROBE_RATIO = 16
+# Largest number of values a leaf bucket of a SortedList is built with, and
+# of children an inner node is built with; splits let both grow to twice this
+LOAD = 128
+FANOUT = 64
+
+
+class SortedList:
+    """
+    Immutable sorted collection of unique values stored as a B+ tree.
+
+    Values sit in leaf buckets of up to 2 * load values, under nodes of up to
+    2 * fanout children that keep each child's largest value and size.
+    inserted() and removed() return a new list that shares every node but
+    the ones on the path to the bucket they touch, so an update copies one
+    bucket plus a few small nodes, however many values the list holds.
+    Because no list is ever changed after it is built, readers can iterate a
+    list while writers publish newer versions, without any locking. Used for
+    index posting lists that have to be read in key order.
+    """
+
+    def __init__(self, values=(), load=LOAD, fanout=FANOUT):
+        self._fill(sorted(set(values)), load, fanout)
+
+    @classmethod
+    def from_sorted(cls, values, load=LOAD, fanout=FANOUT):
+        """A list of values that are already sorted and unique."""
+        sorted_list = cls.__new__(cls)
+        sorted_list._fill(values, load, fanout)
+        return sorted_list
+
+    def _fill(self, values, load, fanout):
+        self.load = load
+        self.fanout = fanout
+        nodes = [values[i : i + load] for i in range(0, len(values), load)]
+        self.root = _root(nodes, fanout)
+        self.size = len(values)
+
+    def _derive(self, root, size):
+        derived = SortedList.__new__(SortedList)
+        derived.load = self.load
+        derived.fanout = self.fanout
+        derived.root = root
+        derived.size = size
+        return derived
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __iter__(self):
+        for bucket in _buckets(self.root):
+            yield from bucket
+
+    def __contains__(self, value):
+        bucket = self._bucket(value, bisect_left)
+        return bucket is not None and bucket[bisect_left(bucket, value)] == value
+
+    def _bucket(self, value, find):
+        """
+        The bucket holding the first value find() places value before, or
+        None if there is none.
+        """
+        node = self.root
+        while type(node) is _Node:
+            pos = find(node.maxes, value)
+            if pos == len(node.maxes):
+                return None
+            node = node.children[pos]
+        # Only a root bucket can be wholly below value
+        if node is None or find(node, value) == len(node):
+            return None
+        return node
+
+    def _buckets(self, value, find):
+        """Buckets from the one _bucket() finds onwards, in order."""
+        if value is None:
+            return _buckets(self.root)
+        return _buckets_from(self.root, value, find)
+
+    def inserted(self, value):
+        """A list that also contains value."""
+        if self.root is None:
+            return SortedList.from_sorted([value], self.load, self.fanout)
+        nodes = _insert_one(self.root, value, self.load, self.fanout)
+        if nodes is None:
+            return self
+        root = nodes[0] if len(nodes) == 1 else _Node(nodes)
+        return self._derive(root, self.size + 1)
+
+    def inserted_many(self, values):
+        """A list that also contains every value of the sorted list values."""
+        if not values:
+            return self
+        if self.root is None:
+            return SortedList.from_sorted(list(unique(values)), self.load, self.fanout)
+        nodes = _insert(self.root, values, self.load, self.fanout)
+        if nodes is None:
+            return self
+        root = _root(nodes, self.fanout)
+        return self._derive(root, _size(root))
+
+    def removed(self, value):
+        """A list without value."""
+        if self.root is None:
+            return self
+        root = _remove_one(self.root, value)
+        if root is self.root:
+            return self
+        # A root left with one child is replaced by it
+        while type(root) is _Node and len(root.children) == 1:
+            root = root.children[0]
+        return self._derive(root, self.size - 1)
+
+    def irange(self, after=None):
+        """Iterate values in order, starting after the given value."""
+        buckets = self._buckets(after, bisect_right)
+        for bucket in buckets:
+            yield from (
+                bucket if after is None else bucket[bisect_right(bucket, after) :]
+            )
+            break
+        for bucket in buckets:
+            yield from bucket
+
+    def irange_desc(self, before=None):
+        """Iterate values in descending order, starting below the given value."""
+        for bucket in _buckets_before(self.root, before):
+            if before is not None and bucket[-1] >= before:
+                yield from reversed(bucket[: bisect_left(bucket, before)])
+            else:
+                yield from reversed(bucket)
+
+    def ibuckets(self, after=None):
+        """Like irange(), but yield the values as lists, a bucket at a time."""
+        buckets = self._buckets(after, bisect_right)
+        for bucket in buckets:
+            yield bucket if after is None else bucket[bisect_right(bucket, after) :]
+            break
+        yield from buckets
+
+    def irange_from(self, start):
+        """Iterate values in order, starting at the first not below start."""
+        buckets = self._buckets(start, bisect_left)
+        for bucket in buckets:
+            yield from bucket[bisect_left(bucket, start) :]
+            break
+        for bucket in buckets:
+            yield from bucket
+
+    def first_after(self, value):
+        """The smallest value above the given one, or None."""
+        if value is None:
+            return next(_buckets(self.root), [None])[0]
+        bucket = self._bucket(value, bisect_right)
+        return None if bucket is None else bucket[bisect_right(bucket, value)]
+
+    def bucket_last(self, value):
+        """
+        The largest value of the bucket the given value falls in, or None if
+        it is above every value.
+        """
+        bucket = self._bucket(value, bisect_left)
+        return None if bucket is None else bucket[-1]
+
+    def between(self, first, last):
+        """
+        The values from first to last, both included, as a list. None for
+        either leaves that end open.
+        """
+        values = []
+        begin = 0
+        for bucket in self._buckets(first, bisect_left):
+            if first is not None:
+                begin = bisect_left(bucket, first)
+                first = None
+            if last is not None and bucket[-1] > last:
+                values += bucket[begin : bisect_right(bucket, last)]
+                break
+            values += bucket[begin:]
+            begin = 0
+        return values
+
+    def count_between(self, first, last):
+        """The number of values from first to last, both included."""
+        end = self.size if last is None else self._rank(last, bisect_right)
+        start = 0 if first is None else self._rank(first, bisect_left)
+        return max(0, end - start)
+
+    def _rank(self, value, find):
+        """How many values find() places value after."""
+        rank = 0
+        node = self.root
+        while type(node) is _Node:
+            pos = find(node.maxes, value)
+            rank += sum(node.sizes[:pos])
+            if pos == len(node.maxes):
+                return rank
+            node = node.children[pos]
+        return rank if node is None else rank + find(node, value)
+
+
+class _Node:
+    """An inner node of a SortedList: its children, their maxes and sizes."""
+
+    __slots__ = ("children", "maxes", "sizes")
+
+    def __init__(self, children, maxes=None, sizes=None):
+        self.children = children
+        self.maxes = [_max(child) for child in children] if maxes is None else maxes
+        self.sizes = [_size(child) for child in children] if sizes is None else sizes
+
+
+def _max(node):
+    return node.maxes[-1] if type(node) is _Node else node[-1]
+
+
+def _size(node):
+    return sum(node.sizes) if type(node) is _Node else len(node)
+
+
+def _root(nodes, fanout):
+    """The root of a tree with the given nodes, left to right, at its bottom."""
+    if not nodes:
+        return None
+    while len(nodes) > 1:
+        nodes = [_Node(nodes[i : i + fanout]) for i in range(0, len(nodes), fanout)]
+    return nodes[0]
+
+
+def _insert(node, values, load, fanout):
+    """
+    The nodes replacing node once the sorted values are added to it, more
+    than one if it had to split, or None if it held them all already.
+    """
+    if type(node) is not _Node:
+        if len(values) == 1:
+            value = values[0]
+            idx = bisect_left(node, value)
+            if idx < len(node) and node[idx] == value:
+                return None
+            bucket = node.copy()
+            bucket.insert(idx, value)
+        else:
+            bucket = list(unique(heapq.merge(node, values)))
+            if len(bucket) == len(node):
+                return None
+        if len(bucket) <= 2 * load:
+            return [bucket]
+        return [bucket[i : i + load] for i in range(0, len(bucket), load)]
+    # Each child's share of the values, as (position, new nodes)
+    changes = []
+    start = 0
+    last = len(node.children) - 1
+    while start < len(values):
+        # Values above every max go to the last child
+        pos = min(bisect_left(node.maxes, values[start]), last)
+        end = len(values) if pos == last else bisect_right(values, node.maxes[pos])
+        nodes = _insert(node.children[pos], values[start:end], load, fanout)
+        if nodes is not None:
+            changes.append((pos, nodes))
+        start = end
+    if not changes:
+        return None
+    children = node.children.copy()
+    maxes = node.maxes.copy()
+    sizes = node.sizes.copy()
+    # From the right, so earlier positions stay put
+    for pos, nodes in reversed(changes):
+        children[pos : pos + 1] = nodes
+        maxes[pos : pos + 1] = map(_max, nodes)
+        sizes[pos : pos + 1] = map(_size, nodes)
+    if len(children) <= 2 * fanout:
+        return [_Node(children, maxes, sizes)]
+    return [
+        _Node(children[i : i + fanout], maxes[i : i + fanout], sizes[i : i + fanout])
+        for i in range(0, len(children), fanout)
+    ]
+
+
+def _insert_one(root, value, load, fanout):
+    """
+    Like _insert() for a single value, without recursion: the nodes
+    replacing root once value is added, or None if it held it already.
+    """
+    # The inner nodes down to value's bucket, with the position taken in each
+    path = []
+    node = root
+    while type(node) is _Node:
+        # Values above every max go to the last child
+        pos = min(bisect_left(node.maxes, value), len(node.maxes) - 1)
+        path.append((node, pos))
+        node = node.children[pos]
+    idx = bisect_left(node, value)
+    if idx < len(node) and node[idx] == value:
+        return None
+    bucket = node.copy()
+    bucket.insert(idx, value)
+    nodes = _halves(bucket, 2 * load)
+    for parent, pos in reversed(path):
+        children = parent.children.copy()
+        maxes = parent.maxes
+        sizes = parent.sizes.copy()
+        if len(nodes) == 1:
+            children[pos] = nodes[0]
+            # Unchanged lists are shared, as nothing changes them
+            if value > maxes[pos]:
+                maxes = maxes.copy()
+                maxes[pos] = value
+            sizes[pos] += 1
+            nodes = [_Node(children, maxes, sizes)]
+            continue
+        maxes = maxes.copy()
+        children[pos : pos + 1] = nodes
+        maxes[pos : pos + 1] = map(_max, nodes)
+        sizes[pos : pos + 1] = map(_size, nodes)
+        nodes = [
+            _Node(*parts)
+            for parts in zip(
+                _halves(children, 2 * fanout),
+                _halves(maxes, 2 * fanout),
+                _halves(sizes, 2 * fanout),
+            )
+        ]
+    return nodes
+
+
+def _halves(values, most):
+    """values as one list if it holds at most most, else split in two."""
+    if len(values) <= most:
+        return [values]
+    half = len(values) // 2
+    return [values[:half], values[half:]]
+
+
+def _remove_one(root, value):
+    """
+    The root of the tree without value: root itself if it does not hold
+    value, or None if nothing is left.
+    """
+    # The inner nodes down to value's bucket, with the position taken in each
+    path = []
+    node = root
+    while type(node) is _Node:
+        pos = bisect_left(node.maxes, value)
+        if pos == len(node.maxes):
+            return root
+        path.append((node, pos))
+        node = node.children[pos]
+    idx = bisect_left(node, value)
+    if idx == len(node) or node[idx] != value:
+        return root
+    new = None
+    if len(node) > 1:
+        new = node.copy()
+        del new[idx]
+    for parent, pos in reversed(path):
+        children = parent.children.copy()
+        maxes = parent.maxes
+        sizes = parent.sizes.copy()
+        if new is None:
+            if len(children) == 1:
+                continue
+            del children[pos]
+            maxes = maxes.copy()
+            del maxes[pos]
+            del sizes[pos]
+        else:
+            children[pos] = new
+            # Unchanged lists are shared, as nothing changes them
+            if maxes[pos] == value:
+                maxes = maxes.copy()
+                maxes[pos] = _max(new)
+            sizes[pos] -= 1
+        new = _Node(children, maxes, sizes)
+    return new
+
+
+def _buckets(node):
+    """Every bucket under node, in order."""
+    if type(node) is _Node:
+        for child in node.children:
+            yield from _buckets(child)
+    elif node is not None:
+        yield node
+
+
+def _buckets_from(node, value, find):
+    """The buckets under node from the first whose max find() places value at."""
+    if type(node) is not _Node:
+        # Only a root bucket can be wholly below value
+        if node is not None and find(node, value) < len(node):
+            yield node
+        return
+    pos = find(node.maxes, value)
+    if pos == len(node.maxes):
+        return
+    yield from _buckets_from(node.children[pos], value, find)
+    for child in node.children[pos + 1 :]:
+        yield from _buckets(child)
+
+
+def _buckets_before(node, before):
+    """
+    The buckets under node holding values below before, or every one if it
+    is None, last first.
+    """
+    if type(node) is not _Node:
+        if node is not None and (before is None or node[0] < before):
+            yield node
+        return
+    pos = len(node.maxes) if before is None else bisect_left(node.maxes, before)
+    if pos < len(node.maxes):
+        yield from _buckets_before(node.children[pos], before)
+    for child in reversed(node.children[:pos]):
+        yield from _buckets_before(child, None)
+
+
+def unique(values):
+    """Drop repeats from values that come in order."""
+    last = None
+    for value in values:
+        if value != last:
+            yield value
+            last = value
+
+
+def intersect(groups, after=None):
+    """
+    Values in at least one list of every group, in order and each once,
+    starting after the given value. Each group is a list of SortedLists,
+    such as the posting lists of every word with some prefix.
+
+    The groups are intersected one range of values at a time. Each range
+    starts at the first value every group has reached, so runs of values
+    only some groups have are skipped after a lookup per list, and ends with
+    the bucket of some list, so it spans at most one bucket of each. The
+    rest is set operations in C, starting from the group with the fewest
+    values in the range.
+    """
+    if not groups or not all(groups):
+        return
+    if len(groups) == 1:
+        if len(groups[0]) == 1:
+            yield from groups[0][0].irange(after)
+        else:
+            yield from unique(heapq.merge(*(keys.irange(after) for keys in groups[0])))
+        return
+    lists = list(chain.from_iterable(groups))
+    # Every value up to done has been yielded or ruled out
+    done = after
+    while True:
+        firsts = [_first_after(group, done) for group in groups]
+        if None in firsts:
+            return
+        low = max(firsts)
+        ends = (values.bucket_last(low) for values in lists)
+        # Some list holds low, so some end is not None
+        high = min(end for end in ends if end is not None)
+        sizes = [
+            sum(values.count_between(low, high) for values in group) for group in groups
+        ]
+        order = sorted(range(len(groups)), key=sizes.__getitem__)
+        found = set(
+            chain.from_iterable(
+                values.between(low, high) for values in groups[order[0]]
+            )
+        )
+        for i in order[1:]:
+            if not found:
+                break
+            group = groups[i]
+            if sizes[i] > PROBE_RATIO * len(found) * len(group):
+                found = {
+                    value for value in found if any(value in values for values in group)
+                }
+            else:
+                found.intersection_update(
+                    chain.from_iterable(values.between(low, high) for values in group)
+                )
+        yield from sorted(found)
+        done = high
+
+
+def _first_after(group, after):
+    """The smallest value above after in any list of group, or None."""
+    found = (values.first_after(after) for values in group)
+    return min((value for value in found if value is not None), default=None)
@@ -0,0 +1,114 @@
+import re
+
+from util.sorted_list import SortedList, intersect
+
+# A word is a run of letters and digits, as SQLite's unicode61 tokenizer
+# splits text, so both backends match the same records
+WORD = re.compile(r"[^\W_]+")
+
+
+def words(text):
+    """The lower-cased words of text."""
+    if text is None:
+        return []
+    return WORD.findall(str(text).lower())
+
+
+def matches(query_words, record_words):
+    """Whether every query word is the start of some word of the record."""
+    return all(
+        any(word.startswith(query_word) for word in record_words)
+        for query_word in query_words
+    )
+
+
+class PrefixIndex:
+    """
+    Inverted index from words to the keys of records containing them, for
+    finding records by word prefix in key order.
+
+    terms is a SortedList of every indexed word, so the words with a prefix
+    are one contiguous run of it, and postings maps each word to a SortedList
+    of keys. Both hold immutable lists that writers replace rather than
+    change, so readers need no lock: at worst they see a key whose record no
+    longer matches, and re-check records, as index readers of the status
+    index do. Writers must be serialised by the caller.
+    """
+
+    def __init__(self, entries=()):
+        """Index (key, words) pairs, each key once."""
+        # Records often share their words, so keys are grouped by them and
+        # each group is added to a word's keys with one extend
+        keys_by_words = {}
+        for key, record_words in entries:
+            keys_by_words.setdefault(tuple(record_words), []).append(key)
+        keys_by_word = {}
+        for record_words, keys in keys_by_words.items():
+            for word in set(record_words):
+                keys_by_word.setdefault(word, []).extend(keys)
+        # Each group is a sorted run, which sorting merges cheaply
+        self.postings = {
+            word: SortedList.from_sorted(sorted(keys))
+            for word, keys in keys_by_word.items()
+        }
+        self.terms = SortedList(self.postings)
+
+    def add(self, key, record_words):
+        self.replace(key, (), record_words)
+
+    def add_many(self, entries):
+        """
+        Index (key, words) pairs of keys not indexed yet, with one update
+        per word rather than one per key.
+        """
+        keys_by_word = {}
+        for key, record_words in entries:
+            for word in set(record_words):
+                keys_by_word.setdefault(word, []).append(key)
+        new_words = []
+        for word, keys in keys_by_word.items():
+            keys.sort()
+            if word in self.postings:
+                self.postings[word] = self.postings[word].inserted_many(keys)
+            else:
+                self.postings[word] = SortedList.from_sorted(keys)
+                new_words.append(word)
+        self.terms = self.terms.inserted_many(sorted(new_words))
+
+    def remove(self, key, record_words):
+        self.replace(key, record_words, ())
+
+    def replace(self, key, old_words, new_words):
+        old_words, new_words = set(old_words), set(new_words)
+        for word in new_words - old_words:
+            keys = self.postings.get(word)
+            if keys is None:
+                self.postings[word] = SortedList([key])
+                self.terms = self.terms.inserted(word)
+            else:
+                self.postings[word] = keys.inserted(key)
+        for word in old_words - new_words:
+            keys = self.postings[word].removed(key)
+            if keys:
+                self.postings[word] = keys
+            else:
+                del self.postings[word]
+                self.terms = self.terms.removed(word)
+
+    def _postings(self, prefix):
+        """The keys of each word starting with prefix."""
+        postings = []
+        for word in self.terms.irange_from(prefix):
+            if not word.startswith(prefix):
+                break
+            keys = self.postings.get(word)
+            if keys is not None:
+                postings.append(keys)
+        return postings
+
+    def keys(self, prefixes, after=None):
+        """
+        Keys of records with a word starting with each prefix, in order and
+        each once, starting after the given key.
+        """
+        return intersect([self._postings(prefix) for prefix in set(prefixes)], after)